@@ -27,3 +27,9 @@ def docs_live(session):
     session.run(
         "sphinx-autobuild", "-b", "html", "docs/", "build/docs", *session.posargs
     )
+
+
+@nox.session(reuse_venv=True)
+def bench(session):
+    session.install("-e", ".", silent=True)
+    session.run("python", "tests/bench_suite.py", *session.posargs)
@@ -7,33 +7,203 @@ import shlex
 import sys
 from pathlib import Path
 
-import colorama
-import uvicorn
+from sphinx_autobuild import __version__
+from sphinx_autobuild.executor import EXECUTORS
 
-# This isn't public API, but there aren't many better options
-from sphinx.cmd.build import get_parser as sphinx_get_parser
-from starlette.applications import Starlette
-from starlette.middleware import Middleware
-from starlette.routing import Mount, WebSocketRoute
-from starlette.staticfiles import StaticFiles
+# Other imports are deferred until the arguments have been parsed,
+# so that ``--version`` and argument errors are reported quickly.
 
-from sphinx_autobuild import __version__
-from sphinx_autobuild.build import Builder
-from sphinx_autobuild.filter import IgnoreFilter
-from sphinx_autobuild.middleware import JavascriptInjectorMiddleware
-from sphinx_autobuild.server import RebuildServer
-from sphinx_autobuild.utils import find_free_port, open_browser, show_message
+AUTOBUILD_OPTIONS = "autobuild options"
+
+#: Where build metrics are served, with ``--metrics``.
+METRICS_PATH = "/_autobuild/metrics"
 
 
 def main(argv=()):
     """Actual application logic."""
-    colorama.just_fix_windows_console()
-
     if not argv:
         # entry point functions don't receive args
         argv = sys.argv[1:]
+    argv = list(argv)
+
+    if _uses_projects_file(argv):
+        _main_projects(argv)
+        return
+
+    args, build_args = _parse_args(argv)
+    _check_args(args)
+
+    import colorama
+
+    from sphinx_autobuild.utils import find_free_port, open_browser
+
+    colorama.just_fix_windows_console()
+
+    host_name = args.host
+    port_num = args.port or find_free_port()
+    url_host = f"{host_name}:{port_num}"
+
+    builder, app = _create_project(args, build_args, url_host, polling=_polling(args))
+
+    if args.open_browser:
+        open_browser(url_host, args.delay)
+
+    _serve(app, host_name, port_num, [builder])
+
+
+def _main_projects(argv):
+    """Serve the projects listed in a projects file."""
+    args = _get_projects_parser().parse_args(argv)
+
+    from sphinx_autobuild.projects import ProjectConfigError, load_projects
+
+    try:
+        projects = load_projects(args.projects)
+    except ProjectConfigError as e:
+        raise SystemExit(str(e)) from None
+    parsed = []
+    for project in projects:
+        project_args, build_args = _parse_args(project.args)
+        _check_args(project_args)
+        parsed.append((project, project_args, build_args))
+
+    import colorama
+
+    from sphinx_autobuild.utils import find_free_port, open_browser
+
+    colorama.just_fix_windows_console()
+
+    host_name = args.host
+    port_num = args.port or find_free_port()
+    url_host = f"{host_name}:{port_num}"
+
+    builders, app = _create_projects_app(
+        parsed,
+        url_host,
+        max_concurrent_builds=args.max_concurrent_builds,
+        polling=_polling(args),
+    )
+
+    if args.open_browser:
+        open_browser(url_host, args.delay)
+
+    _serve(app, host_name, port_num, builders)
+
+
+def _create_projects_app(parsed, url_host, *, max_concurrent_builds=1, polling=None):
+    """Create the builders, and an application serving every project.
+
+    *parsed* holds a project, its parsed arguments,
+    and its arguments for sphinx-build, for each project.
+    """
+    import asyncio
+
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+
+    from sphinx_autobuild.projects import ProjectGroup
+
+    build_limit = asyncio.Semaphore(max_concurrent_builds)
+    builders = []
+    servers = []
+    routes = []
+    for project, project_args, build_args in parsed:
+        builder, app = _create_project(
+            project_args,
+            build_args,
+            url_host,
+            prefix=project.prefix,
+            shared_watcher=True,
+            build_limit=build_limit,
+        )
+        builders.append(builder)
+        servers.append(app.state.watcher)
+        routes.append(Mount(project.prefix, app=app, name=project.name))
+    group = ProjectGroup(
+        servers, [project for project, _, _ in parsed], polling=polling
+    )
+    app = Starlette(
+        routes=[Route("/", group.index, name="index"), *routes],
+        lifespan=group.lifespan,
+    )
+    return builders, app
 
-    args, build_args = _parse_args(list(argv))
+
+def _polling(args):
+    """Return the settings for detecting changes by polling, if enabled."""
+    if not args.poll:
+        return None
+
+    from sphinx_autobuild.polling import Polling
+
+    return Polling(args.poll_interval, args.poll_max_interval)
+
+
+#: Options that keep state in the builder between builds.
+#: With a process executor, each build runs on a copy of the builder,
+#: so that state would be lost.
+_STATEFUL_OPTIONS = (
+    "warm_worker",
+    "cancel_superseded",
+    "atomic_output",
+    "doctree_cache",
+    "pre_build_on",
+    "post_build_on",
+)
+
+
+def _check_args(args):
+    stateful = [option for option in _STATEFUL_OPTIONS if getattr(args, option)]
+    if args.executor == "process" and stateful:
+        option = stateful[0].replace("_", "-")
+        msg = f"--{option} cannot be used with --executor=process"
+        raise SystemExit(msg)
+    if args.resume and args.no_initial_build:
+        msg = "--resume cannot be used with --no-initial"
+        raise SystemExit(msg)
+    for option in "max_worker_builds", "max_worker_rss":
+        if getattr(args, option) is not None and not args.warm_worker:
+            msg = f"--{option.replace('_', '-')} requires --warm-worker"
+            raise SystemExit(msg)
+    if args.build_prefix and args.warm_worker:
+        # The warm worker does not run sphinx-build through the prefix.
+        msg = "--build-prefix cannot be used with --warm-worker"
+        raise SystemExit(msg)
+
+
+def _serve(app, host_name, port_num, builders):
+    import uvicorn
+
+    from sphinx_autobuild.utils import show_message
+
+    show_message("Waiting to detect changes...")
+    try:
+        uvicorn.run(app, host=host_name, port=port_num, log_level="warning")
+    except KeyboardInterrupt:
+        show_message("Server ceasing operations. Cheerio!")
+    finally:
+        for builder in builders:
+            builder.close()
+
+
+def _create_project(args, build_args, url_host, *, prefix="", **app_options):
+    """Create the builder and the application for a single project."""
+    import json
+
+    import sphinx
+
+    from sphinx_autobuild.build import Builder
+    from sphinx_autobuild.cache import ResponseCache
+    from sphinx_autobuild.doctree_cache import DoctreeCache
+    from sphinx_autobuild.filter import IgnoreFilter
+    from sphinx_autobuild.generations import OutputGenerations
+    from sphinx_autobuild.gitignore import GitIgnore
+    from sphinx_autobuild.hashing import ContentIndex
+    from sphinx_autobuild.hooks import Hook
+    from sphinx_autobuild.metrics import BuildMetrics
+    from sphinx_autobuild.precompress import Precompressor
+    from sphinx_autobuild.resources import MIB, MemoryReporter
+    from sphinx_autobuild.snapshot import SourceSnapshot
 
     src_dir = Path(args.sourcedir)
     out_dir = Path(args.outdir)
@@ -44,17 +214,49 @@ def main(argv=()):
         serve_dir = out_dir / args.make_mode_builder
         serve_dir.mkdir(parents=True, exist_ok=True)
 
-    host_name = args.host
-    port_num = args.port or find_free_port()
-    url_host = f"{host_name}:{port_num}"
+    generations = OutputGenerations(serve_dir) if args.atomic_output else None
+
+    doctree_dir = args.doctree_dir
+    if doctree_dir is None:
+        # The defaults of sphinx-build, and of its make mode.
+        doctree_dir = out_dir / ("doctrees" if args.make_mode_builder else ".doctrees")
 
-    pre_build_commands = list(map(shlex.split, args.pre_build))
-    post_build_commands = list(map(shlex.split, args.post_build))
+    pre_build_commands = [Hook.from_argument(command) for command in args.pre_build]
+    pre_build_commands += [
+        Hook.from_argument(command, globs) for globs, command in args.pre_build_on
+    ]
+    post_build_commands = [Hook.from_argument(command) for command in args.post_build]
+    post_build_commands += [
+        Hook.from_argument(command, globs) for globs, command in args.post_build_on
+    ]
+    # Snapshots and cached doctrees are only valid for the same build.
+    build_key = json.dumps([sphinx.__display_version__, build_args])
+    doctree_cache = None
+    if args.doctree_cache is not None:
+        doctree_cache = DoctreeCache(
+            args.doctree_cache,
+            src_dir=src_dir,
+            doctree_dir=doctree_dir,
+            key=build_key,
+            max_size=args.doctree_cache_size * MIB,
+            skip=[out_dir],
+        )
     builder = Builder(
         build_args,
-        url_host=url_host,
+        url_host=f"{url_host}{prefix}",
         pre_build_commands=pre_build_commands,
         post_build_commands=post_build_commands,
+        warm_worker=args.warm_worker,
+        fast_path=args.fast_path,
+        src_dir=src_dir,
+        out_dir=out_dir,
+        serve_dir=serve_dir,
+        generations=generations,
+        hook_jobs=args.hook_jobs,
+        adaptive_jobs=args.adaptive_jobs,
+        doctree_dir=doctree_dir,
+        doctree_cache=doctree_cache,
+        **_resource_options(args),
     )
 
     watch_dirs = [src_dir] + args.additional_watched_dirs
@@ -77,72 +279,244 @@ def main(argv=()):
         out_dir,
         args.warnings_file,
         args.doctree_dir,
+        args.content_index,
+        args.metrics_file,
+        args.doctree_cache,
     ]
     ignore_dirs = list(filter(None, ignore_dirs))
-    ignore_handler = IgnoreFilter(ignore_dirs, args.re_ignore)
-    app = _create_app(watch_dirs, ignore_handler, builder, serve_dir, url_host)
+    gitignore = GitIgnore.from_directories(watch_dirs) if args.gitignore else None
+    ignore_handler = IgnoreFilter(ignore_dirs, args.re_ignore, gitignore=gitignore)
+    content_index = None
+    if args.skip_unchanged or args.content_index:
+        content_index = ContentIndex(args.content_index)
+    metrics = None
+    if args.metrics or args.metrics_file:
+        metrics = BuildMetrics(args.metrics_file)
+    snapshot = None
+    if args.resume:
+        snapshot = SourceSnapshot(
+            doctree_dir / "autobuild-snapshot.json",
+            watch_dirs,
+            ignore_handler.is_ignored,
+            key=build_key,
+        )
+    memory_reporter = None
+    if args.memory_report:
+        memory_reporter = MemoryReporter(args.memory_report, worker=builder.worker)
+    app = _create_app(
+        watch_dirs,
+        ignore_handler,
+        builder,
+        serve_dir,
+        url_host,
+        executor=args.executor,
+        debounce=args.debounce,
+        cancel_superseded=args.cancel_superseded,
+        content_index=content_index,
+        generations=generations,
+        response_cache=ResponseCache() if args.response_cache else None,
+        precompressor=Precompressor() if args.precompress else None,
+        initial_build=not args.no_initial_build,
+        metrics=metrics,
+        metrics_route=args.metrics,
+        prefix=prefix,
+        memory_reporter=memory_reporter,
+        snapshot=snapshot,
+        **app_options,
+    )
 
-    if not args.no_initial_build:
-        show_message("Starting initial build")
-        builder(changed_paths=())
+    return builder, app
+
+
+def _resource_options(args):
+    """Return the builder's options for bounding the resources used by builds."""
+    from sphinx_autobuild.resources import MIB, BuildLimits
+
+    limits = None
+    if args.build_memory_limit is not None:
+        limits = BuildLimits(memory=args.build_memory_limit * MIB)
+    max_worker_rss = None
+    if args.max_worker_rss is not None:
+        max_worker_rss = args.max_worker_rss * MIB
+    return {
+        "max_worker_builds": args.max_worker_builds,
+        "max_worker_rss": max_worker_rss,
+        "limits": limits,
+        "build_prefix": shlex.split(args.build_prefix or ""),
+    }
+
+
+def _create_app(
+    watch_dirs,
+    ignore_handler,
+    builder,
+    out_dir,
+    url_host,
+    *,
+    executor="thread",
+    debounce=0.0,
+    cancel_superseded=False,
+    content_index=None,
+    generations=None,
+    response_cache=None,
+    precompressor=None,
+    initial_build=False,
+    metrics=None,
+    metrics_route=False,
+    prefix="",
+    shared_watcher=False,
+    build_limit=None,
+    memory_reporter=None,
+    snapshot=None,
+    polling=None,
+):
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.routing import Mount, Route, WebSocketRoute
+    from starlette.staticfiles import StaticFiles
+
+    from sphinx_autobuild.generations import GenerationStaticFiles
+    from sphinx_autobuild.middleware import (
+        JavascriptInjectorMiddleware,
+        PlaceholderMiddleware,
+        ResponseCacheMiddleware,
+    )
+    from sphinx_autobuild.precompress import PrecompressedStaticFiles
+    from sphinx_autobuild.server import RebuildServer
+
+    watcher = RebuildServer(
+        watch_dirs,
+        ignore_handler,
+        change_callback=builder,
+        executor=executor,
+        debounce=debounce,
+        cancel_superseded=cancel_superseded,
+        content_index=content_index,
+        out_dir=out_dir,
+        response_cache=response_cache,
+        precompressor=precompressor,
+        initial_build=initial_build,
+        metrics=metrics,
+        url_prefix=prefix,
+        shared_watcher=shared_watcher,
+        build_limit=build_limit,
+        memory_reporter=memory_reporter,
+        snapshot=snapshot,
+        polling=polling,
+        generations=generations,
+    )
 
-    if args.open_browser:
-        open_browser(url_host, args.delay)
+    static_files_class = StaticFiles
+    if precompressor is not None:
+        static_files_class = PrecompressedStaticFiles
+    if generations is not None:
+        static_files = GenerationStaticFiles(
+            generations, static_files=static_files_class, html=True
+        )
+    else:
+        static_files = static_files_class(directory=out_dir, html=True)
 
-    show_message("Waiting to detect changes...")
-    try:
-        uvicorn.run(app, host=host_name, port=port_num, log_level="warning")
-    except KeyboardInterrupt:
-        show_message("Server ceasing operations. Cheerio!")
+    middleware = [
+        Middleware(PlaceholderMiddleware, ready=watcher.ready),
+        Middleware(JavascriptInjectorMiddleware, ws_url=f"{url_host}{prefix}"),
+    ]
+    if response_cache is not None:
+        # Outermost, so that cached pages include the injected script.
+        middleware.insert(0, Middleware(ResponseCacheMiddleware, cache=response_cache))
+
+    routes = [WebSocketRoute("/websocket-reload", watcher, name="reload")]
+    if metrics is not None and metrics_route:
+        routes.append(Route(METRICS_PATH, metrics.endpoint, name="metrics"))
+    routes.append(Mount("/", app=static_files, name="static"))
+
+    app = Starlette(
+        routes=routes,
+        middleware=middleware,
+        lifespan=watcher.lifespan,
+    )
+    app.state.watcher = watcher
+    return app
 
 
-def _create_app(watch_dirs, ignore_handler, builder, out_dir, url_host):
-    watcher = RebuildServer(watch_dirs, ignore_handler, change_callback=builder)
+def _uses_projects_file(argv):
+    """Whether *argv* asks to serve the projects in a projects file."""
+    options = argv[: argv.index("--")] if "--" in argv else argv
+    return any(arg == "--projects" or arg.startswith("--projects=") for arg in options)
 
-    return Starlette(
-        routes=[
-            WebSocketRoute("/websocket-reload", watcher, name="reload"),
-            Mount("/", app=StaticFiles(directory=out_dir, html=True), name="static"),
-        ],
-        middleware=[Middleware(JavascriptInjectorMiddleware, ws_url=url_host)],
-        lifespan=watcher.lifespan,
+
+def _get_projects_parser():
+    parser = argparse.ArgumentParser(
+        prog="sphinx-autobuild",
+        usage="%(prog)s --projects FILE [OPTIONS]",
+        description="Serve several Sphinx projects from a single process.",
     )
+    _add_server_arguments(parser.add_argument_group(AUTOBUILD_OPTIONS))
+    return parser
 
 
 def _parse_args(argv):
-    # Parse once with the Sphinx parser to emit errors
-    # and capture the ``-d`` and ``-w`` options.
-    # NOTE:
-    # The Sphinx parser is not considered to be public API,
-    # but as this is a first-party project, we can cheat a little bit.
-    sphinx_args = _get_sphinx_build_parser().parse_args(argv.copy())
+    if "--version" in argv[: argv.index("--") if "--" in argv else None]:
+        # Don't import Sphinx just to print the version.
+        print(f"sphinx-autobuild {__version__}")
+        raise SystemExit(0)
 
-    # Parse a second time with just our parser
-    parser = _get_parser()
-    args, build_args = parser.parse_known_args(argv.copy())
+    # Parse with the Sphinx parser, extended with our options,
+    # to emit errors and capture the ``-d``, ``-w``, and ``-M`` options.
+    parser = _get_sphinx_build_parser()
+    args = parser.parse_args(argv)
+    build_args = _remove_autobuild_arguments(argv, parser)
 
     # Copy needed settings
-    args.sourcedir = Path(sphinx_args.sourcedir).resolve(strict=True)
-    args.outdir = Path(sphinx_args.outputdir).resolve()
-    if sphinx_args.doctreedir:
-        args.doctree_dir = Path(sphinx_args.doctreedir).resolve()
+    args.sourcedir = Path(args.sourcedir).resolve(strict=True)
+    args.outdir = Path(args.outputdir).resolve()
+    if args.doctreedir:
+        args.doctree_dir = Path(args.doctreedir).resolve()
     else:
         args.doctree_dir = None
-    if sphinx_args.warnfile:
-        args.warnings_file = Path(sphinx_args.warnfile).resolve()
+    if args.warnfile:
+        args.warnings_file = Path(args.warnfile).resolve()
     else:
         args.warnings_file = None
 
     # Copy the make-mode builder, if present
-    args.make_mode_builder = sphinx_args.use_make_mode or ""
+    args.make_mode_builder = args.use_make_mode or ""
 
     return args, build_args
 
 
+def _remove_autobuild_arguments(argv, parser):
+    """Return the arguments in *argv* to pass on to sphinx-build."""
+    group = next(g for g in parser._action_groups if g.title == AUTOBUILD_OPTIONS)
+    ours = {option: a for a in group._group_actions for option in a.option_strings}
+    long_options = [o for o in parser._option_string_actions if o.startswith("--")]
+    build_args = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--":
+            build_args += [arg, *args]
+            break
+        name, has_value, _ = arg.partition("=")
+        if name.startswith("--") and name not in parser._option_string_actions:
+            # argparse accepts unambiguous abbreviations of long options.
+            candidates = [option for option in long_options if option.startswith(name)]
+            if len(candidates) == 1:
+                name = candidates[0]
+        if (action := ours.get(name)) is None:
+            build_args.append(arg)
+        else:
+            # Skip the option's values.
+            nargs = 1 if action.nargs is None else action.nargs
+            for _ in range(nargs - bool(has_value)):
+                next(args, None)
+    return build_args
+
+
 def _get_sphinx_build_parser():
     # NOTE:
     # sphinx.cmd.build.get_parser is not considered to be public API,
     # but as this is a first-party project, we can cheat a little bit.
+    from sphinx.cmd.build import get_parser as sphinx_get_parser
+
     sphinx_build_parser = sphinx_get_parser()
     sphinx_build_parser.description = None
     sphinx_build_parser.epilog = None
@@ -166,19 +540,8 @@ def _get_sphinx_build_parser():
     return sphinx_build_parser
 
 
-def _get_parser():
-    """Get the application's argument parser."""
-    parser = argparse.ArgumentParser(allow_abbrev=False)
-    parser.add_argument(
-        "--version", action="version", version=f"sphinx-autobuild {__version__}"
-    )
-    _add_autobuild_arguments(parser)
-
-    return parser
-
-
-def _add_autobuild_arguments(parser):
-    group = parser.add_argument_group("autobuild options")
+def _add_server_arguments(group):
+    """Add the options that apply to the server as a whole."""
     group.add_argument(
         "--port",
         type=int,
@@ -191,6 +554,59 @@ def _add_autobuild_arguments(parser):
         default="127.0.0.1",
         help="hostname to serve documentation on",
     )
+    group.add_argument(
+        "--open-browser",
+        action="store_true",
+        default=False,
+        help="open the browser after building documentation",
+    )
+    group.add_argument(
+        "--delay",
+        dest="delay",
+        type=float,
+        default=5,
+        help="how long to wait before opening the browser",
+    )
+    group.add_argument(
+        "--projects",
+        type=Path,
+        metavar="FILE",
+        default=None,
+        help="serve the projects listed in this TOML file, instead of SOURCEDIR",
+    )
+    group.add_argument(
+        "--max-concurrent-builds",
+        type=int,
+        metavar="N",
+        default=1,
+        help="with --projects, build up to N projects at once (default: 1)",
+    )
+    group.add_argument(
+        "--poll",
+        action="store_true",
+        default=False,
+        help="detect changes by scanning the watched directories, "
+        "for file systems that do not report changes",
+    )
+    group.add_argument(
+        "--poll-interval",
+        type=float,
+        metavar="SECONDS",
+        default=0.5,
+        help="with --poll, scan this often after a change (default: 0.5)",
+    )
+    group.add_argument(
+        "--poll-max-interval",
+        type=float,
+        metavar="SECONDS",
+        default=10.0,
+        help="with --poll, slow down to scanning this often when idle (default: 10)",
+    )
+
+
+def _add_autobuild_arguments(parser):
+    group = parser.add_argument_group(AUTOBUILD_OPTIONS)
+    _add_server_arguments(group)
     group.add_argument(
         "--re-ignore",
         action="append",
@@ -203,6 +619,12 @@ def _add_autobuild_arguments(parser):
         default=[],
         help="glob expression for files to ignore, when watching for changes",
     )
+    group.add_argument(
+        "--gitignore",
+        action="store_true",
+        default=False,
+        help="ignore files matched by .gitignore and .ignore files",
+    )
     group.add_argument(
         "--no-initial",
         dest="no_initial_build",
@@ -211,17 +633,10 @@ def _add_autobuild_arguments(parser):
         help="skip the initial build",
     )
     group.add_argument(
-        "--open-browser",
+        "--resume",
         action="store_true",
         default=False,
-        help="open the browser after building documentation",
-    )
-    group.add_argument(
-        "--delay",
-        dest="delay",
-        type=float,
-        default=5,
-        help="how long to wait before opening the browser",
+        help="only build what changed since the last successful build when starting",
     )
     group.add_argument(
         "--watch",
@@ -245,6 +660,166 @@ def _add_autobuild_arguments(parser):
         default=[],
         help="additional command(s) to run after building the documentation",
     )
+    group.add_argument(
+        "--pre-build-on",
+        action="append",
+        nargs=2,
+        metavar=("GLOBS", "COMMAND"),
+        default=[],
+        help="run COMMAND before building when a file matching "
+        "the comma-separated GLOBS changed",
+    )
+    group.add_argument(
+        "--post-build-on",
+        action="append",
+        nargs=2,
+        metavar=("GLOBS", "COMMAND"),
+        default=[],
+        help="run COMMAND after building when a file matching "
+        "the comma-separated GLOBS changed",
+    )
+    group.add_argument(
+        "--hook-jobs",
+        type=int,
+        metavar="N",
+        default=1,
+        help="run up to N pre- or post-build commands at once (default: 1)",
+    )
+    group.add_argument(
+        "--adaptive-jobs",
+        action="store_true",
+        default=False,
+        help="choose how many processes sphinx-build uses for each build, "
+        "unless -j is given",
+    )
+    group.add_argument(
+        "--warm-worker",
+        action="store_true",
+        default=False,
+        help="run builds in a persistent Sphinx process, restarted on Python changes",
+    )
+    group.add_argument(
+        "--max-worker-builds",
+        type=int,
+        metavar="N",
+        default=None,
+        help="with --warm-worker, restart the Sphinx process after N builds",
+    )
+    group.add_argument(
+        "--max-worker-rss",
+        type=int,
+        metavar="MIB",
+        default=None,
+        help="with --warm-worker, restart the Sphinx process after a build "
+        "if it uses more than MIB mebibytes of memory",
+    )
+    group.add_argument(
+        "--build-memory-limit",
+        type=int,
+        metavar="MIB",
+        default=None,
+        help="limit the address space of build processes to MIB mebibytes",
+    )
+    group.add_argument(
+        "--build-prefix",
+        metavar="COMMAND",
+        default=None,
+        help="run sphinx-build through COMMAND, e.g. to place it in a cgroup",
+    )
+    group.add_argument(
+        "--executor",
+        choices=list(EXECUTORS),
+        default="thread",
+        help="where to run the build callback (default: thread)",
+    )
+    group.add_argument(
+        "--debounce",
+        type=float,
+        metavar="SECONDS",
+        default=0.0,
+        help="wait until no changes have been detected for this long before building",
+    )
+    group.add_argument(
+        "--cancel-superseded",
+        action="store_true",
+        default=False,
+        help="abort a running build when newer changes are detected",
+    )
+    group.add_argument(
+        "--fast-path",
+        action="store_true",
+        default=False,
+        help="build changed documents first, then run a full build in the background",
+    )
+    group.add_argument(
+        "--atomic-output",
+        action="store_true",
+        default=False,
+        help="serve a snapshot of the last successful build while building",
+    )
+    group.add_argument(
+        "--response-cache",
+        action="store_true",
+        default=False,
+        help="keep served files in memory until a build changes them",
+    )
+    group.add_argument(
+        "--precompress",
+        action="store_true",
+        default=False,
+        help="compress changed output files after each build, and serve them "
+        "to browsers that accept them",
+    )
+    group.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        default=False,
+        help="skip rebuilds when the contents of the changed files are unchanged",
+    )
+    group.add_argument(
+        "--content-index",
+        type=Path,
+        metavar="FILE",
+        default=None,
+        help="file in which to keep file hashes between runs (implies "
+        "--skip-unchanged)",
+    )
+    group.add_argument(
+        "--metrics",
+        action="store_true",
+        default=False,
+        help=f"serve build timings in Prometheus format at {METRICS_PATH}",
+    )
+    group.add_argument(
+        "--metrics-file",
+        type=Path,
+        metavar="FILE",
+        default=None,
+        help="append a JSON record of the timings of every build to FILE",
+    )
+    group.add_argument(
+        "--memory-report",
+        type=float,
+        metavar="SECONDS",
+        default=None,
+        help="report the memory used by the server and builds every SECONDS",
+    )
+    group.add_argument(
+        "--doctree-cache",
+        type=Path,
+        metavar="DIR",
+        default=None,
+        help="seed the doctree directory from, and save it to, a cache in DIR "
+        "shared between checkouts",
+    )
+    group.add_argument(
+        "--doctree-cache-size",
+        type=int,
+        metavar="MIB",
+        default=1024,
+        help="remove the least recently used doctrees to keep the cache "
+        "below MIB mebibytes (default: 1024)",
+    )
     return group
 
 
@@ -3,53 +3,155 @@
 from __future__ import annotations
 
 import contextlib
+import shutil
 import subprocess
 import sys
-import traceback
+import threading
+import time
 from collections.abc import Sequence
 from pathlib import Path
 
 import sphinx
 
+from sphinx_autobuild.hooks import Hook, run_hooks
+from sphinx_autobuild.jobs import (
+    available_cores,
+    choose_jobs,
+    count_outdated,
+    jobs_pinned,
+)
 from sphinx_autobuild.utils import show_command, show_message
+from sphinx_autobuild.worker import SphinxWorker, WorkerError
+
+
+class BuildCancelledError(Exception):
+    """The build was aborted by a call to :meth:`Builder.cancel`."""
+
+
+class BuildResult:
+    """The outcome of a single call to :class:`Builder`."""
+
+    def __init__(
+        self,
+        *,
+        returncode: int,
+        targeted: bool = False,
+        timings: dict[str, float] | None = None,
+        jobs: int | None = None,
+    ) -> None:
+        self.returncode = returncode
+        #: Only the changed documents were built, so a full build is needed
+        #: to bring the rest of the output up to date.
+        self.targeted = targeted
+        #: Map of the phases of the build that ran to their duration, in seconds.
+        self.timings = timings if timings is not None else {}
+        #: The number of processes chosen for sphinx-build, if any.
+        self.jobs = jobs
+
+    def __repr__(self):
+        return f"BuildResult(returncode={self.returncode}, targeted={self.targeted})"
 
 
 class Builder:
     def __init__(
-        self, sphinx_args, *, url_host, pre_build_commands, post_build_commands
+        self,
+        sphinx_args,
+        *,
+        url_host,
+        pre_build_commands,
+        post_build_commands,
+        warm_worker=False,
+        fast_path=False,
+        src_dir=None,
+        out_dir=None,
+        serve_dir=None,
+        source_suffixes=(".rst", ".md"),
+        generations=None,
+        hook_jobs=1,
+        adaptive_jobs=False,
+        doctree_dir=None,
+        max_worker_builds=None,
+        max_worker_rss=None,
+        limits=None,
+        build_prefix=(),
+        doctree_cache=None,
     ):
         self.sphinx_args = sphinx_args
-        self.pre_build_commands = pre_build_commands
-        self.post_build_commands = post_build_commands
+        self.pre_build_commands = list(map(_as_hook, pre_build_commands))
+        self.post_build_commands = list(map(_as_hook, post_build_commands))
+        #: The number of pre- or post-build commands to run at once.
+        self.hook_jobs = hook_jobs
         self.uri = f"http://{url_host}"
+        #: Resource limits applied to each build process.
+        self.limits = limits
+        #: A command that runs the build, such as one placing it in a cgroup.
+        self.build_prefix = list(build_prefix)
+        self.worker = None
+        if warm_worker:
+            self.worker = SphinxWorker(
+                max_builds=max_worker_builds, max_rss=max_worker_rss, limits=limits
+            )
+        self.fast_path = fast_path
+        self.src_dir = Path(src_dir).resolve() if src_dir is not None else None
+        self.out_dir = Path(out_dir).resolve() if out_dir is not None else None
+        if serve_dir is not None:
+            self.serve_dir = Path(serve_dir).resolve()
+        else:
+            self.serve_dir = self.out_dir
+        self.source_suffixes = frozenset(source_suffixes)
+        #: If set, successful builds are published to this
+        #: :class:`~sphinx_autobuild.generations.OutputGenerations`.
+        self.generations = generations
+        #: Choose the number of processes for each build,
+        #: unless it is given in *sphinx_args*.
+        self.adaptive_jobs = adaptive_jobs and not jobs_pinned(sphinx_args)
+        self.doctree_dir = Path(doctree_dir).resolve() if doctree_dir else None
+        #: If set, a :class:`~sphinx_autobuild.doctree_cache.DoctreeCache`
+        #: that seeds the doctree directory before full builds.
+        self.doctree_cache = doctree_cache
+        self._cancel_requested = threading.Event()
+        self._process: subprocess.Popen | None = None
+
+    def __getstate__(self):
+        # With a process executor, each build runs on a copy of the builder,
+        # which cannot be cancelled from this process.
+        state = self.__dict__.copy()
+        del state["_cancel_requested"], state["_process"]
+        return state
 
-    def __call__(self, *, changed_paths: Sequence[Path]):
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cancel_requested = threading.Event()
+        self._process = None
+
+    def __call__(self, *, changed_paths: Sequence[Path]) -> BuildResult:
         """Generate the documentation using ``sphinx``."""
+        self._cancel_requested.clear()
+        if self.doctree_cache is not None:
+            self.doctree_cache.note_changes(changed_paths)
         if changed_paths:
-            cwd = Path.cwd()
-            rel_paths = []
-            for changed_path in changed_paths[:5]:
-                if not changed_path.exists():
-                    continue
-                with contextlib.suppress(ValueError):
-                    changed_path = changed_path.relative_to(cwd)
-                rel_paths.append(changed_path.as_posix())
-            if rel_paths:
-                show_message(f"Detected changes ({', '.join(rel_paths)})")
+            _show_changed_paths(changed_paths)
             show_message("Rebuilding...")
 
-        if self._run_commands(self.pre_build_commands, "pre-build") != 0:
-            return
+        timings = {}
+        start = time.perf_counter()
+        returncode = self._run_commands(
+            self.pre_build_commands, "pre-build", changed_paths
+        )
+        timings["pre_build"] = time.perf_counter() - start
+        if returncode != 0:
+            return BuildResult(returncode=returncode, timings=timings)
+        self._check_cancelled()
 
-        if sphinx.version_info[:3] >= (7, 2, 3):
-            sphinx_build_args = ["-m", "sphinx", "build"] + self.sphinx_args
-        else:
-            sphinx_build_args = ["-m", "sphinx"] + self.sphinx_args
-        show_command(["python"] + sphinx_build_args)
-        try:
-            subprocess.run([sys.executable] + sphinx_build_args, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Sphinx exited with exit code: {e.returncode}")
+        if self.worker is not None and _needs_fresh_interpreter(changed_paths):
+            show_message("Python sources changed, restarting the Sphinx worker")
+            self.worker.recycle()
+
+        start = time.perf_counter()
+        returncode, targeted, jobs = self._build(changed_paths)
+        timings["sphinx_build"] = time.perf_counter() - start
+        if returncode != 0:
+            print(f"Sphinx exited with exit code: {returncode}")
             print(
                 "The server will continue serving the build folder, but the contents "
                 "being served are no longer in sync with the documentation sources. "
@@ -58,31 +160,240 @@ class Builder:
             )
         else:
             # Run the post-build commands only if the build was successful
-            self._run_commands(self.post_build_commands, "post-build")
+            start = time.perf_counter()
+            self._run_commands(self.post_build_commands, "post-build", changed_paths)
+            timings["post_build"] = time.perf_counter() - start
+            if self.generations is not None:
+                self.generations.publish()
 
+        show_message(
+            "Build finished in "
+            + ", ".join(
+                f"{seconds:.2f}s ({phase.replace('_', '-')})"
+                for phase, seconds in timings.items()
+            )
+        )
         # Remind the user of the server URL for convenience.
         show_message(f"Serving on {self.uri}")
+        return BuildResult(
+            returncode=returncode, targeted=targeted, timings=timings, jobs=jobs
+        )
 
-    def _run_commands(self, commands, log_context):
-        try:
-            for command in commands:
-                show_message(log_context)
-                show_command(command)
-                subprocess.run(command, check=True)
-        except subprocess.CalledProcessError as e:
-            print(
-                f"{log_context.title()} command exited with exit code: {e.returncode}"
+    def _build(self, changed_paths: Sequence[Path]) -> tuple[int, bool, int | None]:
+        """Update the output.
+
+        Returns the exit code, whether the build was targeted,
+        and the number of processes chosen for sphinx-build.
+        """
+        if self._copy_static_files(changed_paths):
+            # Sphinx would copy the same files, so no build is needed.
+            return 0, False, None
+
+        sphinx_args = None
+        if filenames := self._changed_documents(changed_paths):
+            sphinx_args = self._sphinx_args_for_documents(filenames)
+        targeted = sphinx_args is not None
+        if targeted:
+            show_message("Building the changed documents first")
+        else:
+            sphinx_args = self.sphinx_args
+        jobs = None
+        if self.adaptive_jobs and self.src_dir is not None:
+            outdated = (
+                len(filenames) if targeted else self._count_outdated(changed_paths)
             )
-            print(
-                "Please fix the cause of the error above or press Ctrl+C to stop the "
-                "server."
+            jobs = choose_jobs(outdated, available_cores())
+            show_message(
+                f"Reading about {outdated} document(s) with {jobs} process(es)"
             )
+            sphinx_args = [*sphinx_args, "-j", str(jobs)]
+        sources = self._prepare_doctrees(full=not targeted)
+        self._check_cancelled()
+        returncode = self._run_sphinx(sphinx_args)
+        self._check_cancelled()
+        if returncode == 0 and sources is not None:
+            try:
+                self.doctree_cache.record(sources)
+            except OSError as e:
+                show_message(f"Could not update the doctree cache: {e}")
+        return returncode, targeted, jobs
+
+    def _prepare_doctrees(self, *, full: bool) -> dict | None:
+        if self.doctree_cache is None:
+            return None
+        try:
+            return self.doctree_cache.prepare(full=full)
+        except OSError as e:
+            show_message(f"Could not use the doctree cache: {e}")
+            return None
+
+    def _count_outdated(self, changed_paths: Sequence[Path]) -> int:
+        environment = None
+        if self.doctree_dir is not None:
+            environment = self.doctree_dir / "environment.pickle"
+        return count_outdated(
+            changed_paths,
+            src_dir=self.src_dir,
+            source_suffixes=self.source_suffixes,
+            environment=environment,
+            skip=[path for path in (self.out_dir, self.doctree_dir) if path],
+        )
+
+    def _changed_documents(self, changed_paths: Sequence[Path]) -> list[str]:
+        """Source documents to build first, or an empty list for a full build.
+
+        The fast path is only taken when every changed path
+        is an existing source document.
+        """
+        if not self.fast_path or not changed_paths:
+            return []
+        if self.src_dir is None or self.out_dir is None:
+            return []
+        if {"-a", "--write-all"}.intersection(self.sphinx_args):
+            # sphinx-build rejects filenames combined with -a.
+            return []
+        filenames = []
+        for path in changed_paths:
+            if path.suffix not in self.source_suffixes or not path.is_file():
+                return []
+            if not path.is_relative_to(self.src_dir):
+                return []
+            filenames.append(str(path))
+        return filenames
+
+    def _copy_static_files(self, changed_paths: Sequence[Path]) -> bool:
+        """Copy changed static files directly to the output directory.
+
+        This is only done when every changed path is an existing file
+        in the source directory's ``_static`` folder, other than templates.
+        Returns whether the files were copied.
+        """
+        if not self.fast_path or not changed_paths:
+            return False
+        if self.src_dir is None or self.serve_dir is None:
+            return False
+        static_dir = self.src_dir / "_static"
+        static_out_dir = self.serve_dir / "_static"
+        if not static_out_dir.is_dir():
+            # Not an HTML build, or not built yet.
+            return False
+        copies = []
+        for path in changed_paths:
+            if not path.is_file() or not path.is_relative_to(static_dir):
+                return False
+            if path.name.endswith("_t"):
+                # Static templates are rendered by Sphinx.
+                return False
+            copies.append((path, static_out_dir / path.relative_to(static_dir)))
+
+        show_message("Copying changed static files")
+        for source, destination in copies:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, destination)
+        return True
+
+    def _sphinx_args_for_documents(self, filenames: list[str]) -> list[str] | None:
+        # sphinx-build only accepts filenames immediately after the output
+        # directory, so insert them there rather than at the end.
+        args = self.sphinx_args
+        for i, arg in reversed([*enumerate(args)]):
+            if not arg.startswith("-") and Path(arg).resolve() == self.out_dir:
+                return args[: i + 1] + filenames + args[i + 1 :]
+        return None
+
+    def _run_sphinx(self, sphinx_args):
+        if self.worker is not None:
+            show_command(["sphinx-build"] + sphinx_args)
+            try:
+                return self.worker.build(sphinx_args)
+            except WorkerError as e:
+                self._check_cancelled()
+                show_message(f"{e}; falling back to a subprocess")
+            finally:
+                if reason := self.worker.exhausted():
+                    show_message(f"Restarting the Sphinx worker {reason}")
+                    self.worker.recycle()
+
+        if sphinx.version_info[:3] >= (7, 2, 3):
+            sphinx_build_args = ["-m", "sphinx", "build"] + sphinx_args
+        else:
+            sphinx_build_args = ["-m", "sphinx"] + sphinx_args
+        show_command(self.build_prefix + ["python"] + sphinx_build_args)
+        if self.limits is not None:
+            sphinx_build_args = self.limits.wrap(sphinx_build_args)
+        with subprocess.Popen(
+            self.build_prefix + [sys.executable] + sphinx_build_args
+        ) as process:
+            self._process = process
+            if self._cancel_requested.is_set():
+                # Cancelled before the process could be terminated.
+                process.terminate()
+            try:
+                return process.wait()
+            finally:
+                self._process = None
+
+    def cancel(self):
+        """Abort the running build, if any.
+
+        This may be called from any thread.
+        The interrupted call raises :exc:`BuildCancelledError`.
+        """
+        self._cancel_requested.set()
+        if (process := self._process) is not None:
+            process.terminate()
+        if self.worker is not None:
+            self.worker.terminate()
+
+    def _check_cancelled(self):
+        if self._cancel_requested.is_set():
+            show_message("Build cancelled")
+            raise BuildCancelledError
+
+    def close(self):
+        """Release any resources held by the builder."""
+        if self.worker is not None:
+            self.worker.stop()
+        if self.doctree_cache is not None:
+            self.doctree_cache.close()
+
+    def _run_commands(self, commands, log_context, changed_paths):
+        returncode = run_hooks(
+            commands, changed_paths, log_context=log_context, jobs=self.hook_jobs
+        )
+        if returncode != 0:
+            print(f"{log_context.title()} command exited with exit code: {returncode}")
             print(
                 "The server will continue serving the build folder, but the contents "
                 "being served are no longer in sync with the documentation sources. "
                 "Please fix the cause of the error above or press Ctrl+C to stop the "
                 "server."
             )
-            traceback.print_exception(e)
-            return e.returncode
-        return 0
+        return returncode
+
+
+def _show_changed_paths(changed_paths: Sequence[Path]) -> None:
+    cwd = Path.cwd()
+    rel_paths = []
+    for changed_path in changed_paths[:5]:
+        if not changed_path.exists():
+            continue
+        with contextlib.suppress(ValueError):
+            changed_path = changed_path.relative_to(cwd)
+        rel_paths.append(changed_path.as_posix())
+    if rel_paths:
+        show_message(f"Detected changes ({', '.join(rel_paths)})")
+
+
+def _needs_fresh_interpreter(changed_paths: Sequence[Path]) -> bool:
+    """Whether any of the changed paths may have been imported by Sphinx.
+
+    This covers ``conf.py``, local extensions, and modules documented
+    with autodoc, none of which are re-imported by a warm worker.
+    """
+    return any(path.suffix in {".py", ".pyi"} for path in changed_paths)
+
+
+def _as_hook(command: Hook | Sequence[str]) -> Hook:
+    """Wrap a plain command as a hook that always runs."""
+    return command if isinstance(command, Hook) else Hook(command)
@@ -0,0 +1,135 @@
+"""An in-memory cache of responses for the built documentation."""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+#: The default limit on the total size of cached response bodies, in bytes.
+MAX_SIZE = 64 * 1024 * 1024
+
+#: The default limit on the size of a single cached response body, in bytes.
+MAX_ENTRY_SIZE = 8 * 1024 * 1024
+
+#: Headers that are recomputed for cached responses.
+_REPLACED_HEADERS = frozenset({b"etag", b"content-length"})
+
+
+class CachedResponse:
+    """A complete response, with a strong ``ETag`` derived from its body."""
+
+    def __init__(
+        self, *, status: int, headers: Iterable[tuple[bytes, bytes]], body: bytes
+    ) -> None:
+        self.status = status
+        self.body = body
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.etag = f'"{digest}"'
+        self.headers = [
+            *((k, v) for k, v in headers if k.lower() not in _REPLACED_HEADERS),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"etag", self.etag.encode("latin-1")),
+        ]
+
+    def __repr__(self):
+        return f"CachedResponse(status={self.status}, etag={self.etag})"
+
+
+class ResponseCache:
+    """A bounded, least-recently-used cache of responses.
+
+    Keys are pairs of a URL path and a variant, such as the request's
+    ``Accept-Encoding`` header, for responses that differ between requests.
+
+    The output directory only changes during a build,
+    so entries stay valid until :meth:`invalidate` or :meth:`clear`
+    is called once a build has finished.
+    Files read during a build may be incomplete, so no responses are stored
+    between :meth:`pause` and :meth:`resume`.
+    """
+
+    def __init__(
+        self, *, max_size: int = MAX_SIZE, max_entry_size: int = MAX_ENTRY_SIZE
+    ) -> None:
+        self.max_size = max_size
+        self.max_entry_size = min(max_entry_size, max_size)
+        self.entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self.size = 0
+        #: Incremented on every invalidation, so that responses read
+        #: from disk before an invalidation are not stored afterwards.
+        self.version = 0
+        self.paused = False
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return (
+            f"ResponseCache(entries={len(self.entries)}, size={self.size}, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
+
+    def get(self, key: tuple[str, str]) -> CachedResponse | None:
+        if (entry := self.entries.get(key)) is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple[str, str], entry: CachedResponse, *, version: int) -> bool:
+        """Store *entry*, if the cache has not been invalidated since *version*.
+
+        Returns whether the entry was stored.
+        """
+        if (
+            self.paused
+            or version != self.version
+            or len(entry.body) > self.max_entry_size
+        ):
+            return False
+        self._remove(key)
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        while self.size > self.max_size:
+            self._remove(next(iter(self.entries)))
+        return True
+
+    def pause(self) -> None:
+        """Stop storing responses, as a build has started."""
+        self.version += 1
+        self.paused = True
+
+    def resume(self) -> None:
+        """Store responses again, once a build has finished."""
+        self.version += 1
+        self.paused = False
+
+    def invalidate(self, urls: Iterable[str]) -> None:
+        """Forget the responses for the files at the URL paths *urls*."""
+        self.version += 1
+        paths = {path for url in urls for path in _paths_for_url(url)}
+        for key in [key for key in self.entries if key[0] in paths]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Forget every response."""
+        self.version += 1
+        self.entries.clear()
+        self.size = 0
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        if (entry := self.entries.pop(key, None)) is not None:
+            self.size -= len(entry.body)
+
+
+def _paths_for_url(url: str) -> list[str]:
+    """Return the request paths at which the file at *url* may be served."""
+    paths = [url]
+    if url.endswith("/index.html"):
+        directory = url.removesuffix("index.html")
+        paths += [directory, directory.rstrip("/")]
+    return paths
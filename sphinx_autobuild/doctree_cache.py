@@ -0,0 +1,470 @@
+"""A cache of Sphinx doctree directories, shared between checkouts and branches.
+
+Each entry is a copy of a doctree directory after a successful build,
+addressed by the hashes of the source files it was built from.
+Before a full build, the doctree directory is replaced by the entry
+whose sources differ least from the current sources,
+if that is closer than what the directory already holds.
+
+Sphinx reads a document again if its modification time is newer than
+when the document was last read, which is the case for every file
+that ``git checkout`` rewrote, even if its contents are unchanged.
+The recorded read time of each document whose contents, and whose
+dependencies' contents, are identical to those it was built from is
+therefore moved forward, and that of each document whose contents differ
+is reset, so that Sphinx reads again exactly the documents that changed.
+
+Sphinx's environment records the absolute path of the source directory,
+and is discarded when used with another one,
+so entries are only used for the same source directory.
+
+The source directory is scanned before the first build only;
+later builds only hash the files reported as changed.
+Unpickling the environment imports the project's extensions,
+so the read times are corrected in a separate process.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sphinx_autobuild.hashing import ContentIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterable
+    from typing import Any
+
+ENVIRONMENT = "environment.pickle"
+
+#: Records the sources that the doctree directory was built from.
+MARKER = "autobuild-cache.json"
+
+_MANIFEST = "manifest.json"
+
+#: Bump when the on-disk format changes, to discard old entries.
+_CACHE_VERSION = 1
+
+#: Read times recorded by Sphinx before 7.3 are in seconds,
+#: and cannot be compared with modification times in microseconds.
+_MICROSECONDS = 10**12
+
+
+class DoctreeCache:
+    """Seed *doctree_dir* from, and publish it to, the cache in *cache_dir*.
+
+    Only entries with the same *key*, such as the Sphinx version and
+    the arguments to ``sphinx-build``, are used.
+    The least recently used entries are removed
+    to keep the cache below *max_size* bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | os.PathLike[str],
+        *,
+        src_dir: str | os.PathLike[str],
+        doctree_dir: str | os.PathLike[str],
+        key: str,
+        max_size: int,
+        source_suffixes: Collection[str] = (".rst", ".md"),
+        skip: Collection[str | os.PathLike[str]] = (),
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.src_dir = Path(src_dir).resolve()
+        self.doctree_dir = Path(doctree_dir).resolve()
+        self.max_size = max_size
+        self.source_suffixes = frozenset(source_suffixes)
+        self.skip = {os.fspath(Path(path).resolve()) for path in skip}
+        self.skip.add(os.fspath(self.doctree_dir))
+        self._key = hashlib.blake2b(
+            json.dumps([key, os.fspath(self.src_dir)]).encode(), digest_size=8
+        ).hexdigest()
+        self._index = ContentIndex()
+        self._scanned = False
+        #: Paths changed since the index was last updated.
+        self._changed: dict[Path, None] = {}
+        self._published = False
+
+    def __repr__(self):
+        return f"DoctreeCache(cache_dir={self.cache_dir!r})"
+
+    def note_changes(self, changed_paths: Iterable[Path]) -> None:
+        """Record that *changed_paths* changed, before the next build."""
+        self._changed.update(dict.fromkeys(changed_paths))
+
+    def prepare(self, *, full: bool) -> dict[str, Any]:
+        """Prepare the doctree directory for a build.
+
+        For a *full* build, the directory is seeded from the closest entry.
+        The read times of documents are corrected,
+        so that Sphinx reads again exactly the documents that changed.
+        Returns the manifest of the current sources, to be passed to
+        :meth:`record` if the build succeeds.
+        Sphinx reads every changed document even when building
+        only some of them, so the manifest is valid for targeted builds too.
+        """
+        current = self._read_marker()
+        with contextlib.suppress(FileNotFoundError):
+            # The directory is about to change.
+            (self.doctree_dir / MARKER).unlink()
+        checked = self._update_index()
+        sources = self._manifest()
+        if not (self.doctree_dir / ENVIRONMENT).is_file():
+            current = None
+        best = self._closest_entry(sources) if full else None
+        if best is not None and (
+            current is None
+            or _differences(best[1], sources) < _differences(current, sources)
+        ):
+            entry, manifest = best
+            self._restore(entry, manifest, previous=current)
+            current = manifest
+            checked = None
+        if current is not None:
+            self._align(current, sources, checked)
+        return sources
+
+    def record(self, sources: dict[str, Any]) -> None:
+        """Note that the doctree directory was built from *sources*.
+
+        The first successful build is published to the cache straight away;
+        later ones are published by :meth:`close`.
+        """
+        self.doctree_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(self.doctree_dir / MARKER, sources)
+        if not self._published:
+            self._published = True
+            self.publish()
+
+    def close(self) -> None:
+        self.publish()
+
+    def publish(self) -> None:
+        """Copy the doctree directory to the cache, if it was built successfully."""
+        sources = self._read_marker()
+        if sources is None:
+            return
+        entry = self.cache_dir / f"{self._key}-{sources['address']}"
+        if entry.is_dir():
+            _touch(entry)
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            shutil.copytree(
+                self.doctree_dir,
+                tmp_dir / "doctrees",
+                ignore=shutil.ignore_patterns("autobuild-*"),
+            )
+            size = _tree_size(tmp_dir)
+            if size > self.max_size:
+                return
+            _write_json(tmp_dir / _MANIFEST, {**sources, "size": size})
+            os.replace(tmp_dir, entry)
+        except OSError:
+            return
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._evict()
+
+    def _update_index(self) -> list[str] | None:
+        """Bring the hashes of the source files up to date.
+
+        Returns the names of the files checked,
+        or ``None`` if the whole source directory was scanned.
+        """
+        changed = [path for path in self._changed if self._is_source(path)]
+        self._changed = {}
+        if self._scanned and all(
+            path.is_file() or os.fspath(path) in self._index.entries for path in changed
+        ):
+            self._index.filter_changed(changed)
+            return [path.relative_to(self.src_dir).as_posix() for path in changed]
+        # Directories that were created or removed are scanned in full.
+        self._index.scan([self.src_dir], self._ignore)
+        self._scanned = True
+        return None
+
+    def _manifest(self) -> dict[str, Any]:
+        """Return the hashes of the source files, and their content address."""
+        files = {
+            Path(path).relative_to(self.src_dir).as_posix(): digest
+            for path, (_, _, digest) in self._index.entries.items()
+        }
+        address = hashlib.blake2b(
+            json.dumps(files, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+        return {
+            "version": _CACHE_VERSION,
+            "address": address,
+            # Sphinx records the time documents were read, in microseconds.
+            "built_at": time.time_ns() // 1_000,
+            "files": files,
+        }
+
+    def _ignore(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return name.startswith((".", "_build")) or path in self.skip
+
+    def _is_source(self, path: Path) -> bool:
+        """Whether *path* is below the source directory and not ignored."""
+        if not path.is_relative_to(self.src_dir):
+            return False
+        # Check each directory below the source directory, as scanning would.
+        parts = path.relative_to(self.src_dir).parts
+        return not any(
+            self._ignore(os.fspath(self.src_dir.joinpath(*parts[:i])))
+            for i in range(1, len(parts) + 1)
+        )
+
+    def _read_marker(self) -> dict[str, Any] | None:
+        return _read_manifest(self.doctree_dir / MARKER)
+
+    def _closest_entry(
+        self, sources: dict[str, Any]
+    ) -> tuple[Path, dict[str, Any]] | None:
+        """Return the entry, and its manifest, that differs least from *sources*.
+
+        Entries built with another ``conf.py`` are skipped,
+        as Sphinx reads every document again when the configuration changes.
+        """
+        best = None
+        conf = sources["files"].get("conf.py")
+        for entry in self.cache_dir.glob(f"{self._key}-*"):
+            manifest = _read_manifest(entry / _MANIFEST)
+            if manifest is None or manifest["files"].get("conf.py") != conf:
+                continue
+            differences = _differences(manifest, sources)
+            if best is None or differences < best[0]:
+                best = differences, entry, manifest
+        return best[1:] if best is not None else None
+
+    def _restore(
+        self,
+        entry: Path,
+        manifest: dict[str, Any],
+        *,
+        previous: dict[str, Any] | None,
+    ) -> None:
+        from sphinx_autobuild.utils import show_message
+
+        show_message(f"Seeding the doctree directory from {entry}")
+        if self.doctree_dir.is_dir():
+            for path in self.doctree_dir.iterdir():
+                # Keep files written by sphinx-autobuild itself.
+                if path.name.startswith("autobuild-"):
+                    continue
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+        shutil.copytree(entry / "doctrees", self.doctree_dir, dirs_exist_ok=True)
+        _touch(entry)
+        # Builders write pages whose doctree is newer than the page,
+        # so mark the doctrees that differ from what was last written.
+        previous_files = previous["files"] if previous is not None else {}
+        for name, digest in manifest["files"].items():
+            stem, suffix = os.path.splitext(name)
+            if suffix in self.source_suffixes and previous_files.get(name) != digest:
+                _touch(self.doctree_dir / f"{stem}.doctree")
+
+    def _align(
+        self,
+        built: dict[str, Any],
+        sources: dict[str, Any],
+        names: Iterable[str] | None = None,
+    ) -> None:
+        """Make Sphinx read again exactly the documents that changed.
+
+        *built* describes the sources that the doctree directory
+        was built from, and *sources* the current sources.
+        Only the files named in *names* are checked, if given.
+        """
+        if not self._misleading_mtimes(built, sources, names):
+            return
+        data = {
+            "environment": os.fspath(self.doctree_dir / ENVIRONMENT),
+            "src_dir": os.fspath(self.src_dir),
+            "built": built,
+            "sources": sources,
+        }
+        process = subprocess.run(
+            [sys.executable, "-m", "sphinx_autobuild.doctree_cache"],
+            input=json.dumps(data).encode(),
+            check=False,
+        )
+        if process.returncode != 0:
+            self._remove_changed_doctrees(built, sources)
+
+    def _misleading_mtimes(
+        self,
+        built: dict[str, Any],
+        sources: dict[str, Any],
+        names: Iterable[str] | None = None,
+    ) -> bool:
+        """Whether any modification time disagrees with the file's contents.
+
+        That is, whether a file is newer than the build but has the same
+        contents, or is older than the build but has different contents.
+        """
+        built_files, built_at = built["files"], built["built_at"]
+        if names is None:
+            names = sources["files"]
+        for name in names:
+            digest = sources["files"].get(name)
+            newer = _mtime(self.src_dir / name) > built_at
+            if newer == (built_files.get(name) == digest):
+                return True
+        return False
+
+    def _remove_changed_doctrees(self, built, sources) -> None:
+        """Remove the doctrees of changed documents, so that they are read again."""
+        for name, digest in sources["files"].items():
+            stem, suffix = os.path.splitext(name)
+            if suffix in self.source_suffixes and built["files"].get(name) != digest:
+                with contextlib.suppress(FileNotFoundError):
+                    (self.doctree_dir / f"{stem}.doctree").unlink()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits."""
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            manifest = _read_manifest(entry / _MANIFEST)
+            if manifest is not None:
+                entries.append((entry.stat().st_mtime, manifest["size"], entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def _align_read_times(
+    environment: Path, src_dir: Path, built: dict[str, Any], sources: dict[str, Any]
+) -> bool:
+    """Correct the read times recorded in the pickled *environment*.
+
+    The read time of each document that changed is reset,
+    and that of each unchanged document is moved past its modification time.
+    Returns whether the read times could be corrected.
+    """
+    try:
+        with environment.open("rb") as f:
+            env = pickle.load(f)
+        read_times = env.all_docs
+    except Exception:
+        # Classes from an extension that cannot be imported here.
+        return False
+    if not read_times or max(read_times.values()) < _MICROSECONDS:
+        return False
+
+    changed = False
+    for docname, read_time in read_times.items():
+        paths = [env.doc2path(docname), *env.dependencies.get(docname, ())]
+        states = [_compare(path, src_dir, built, sources) for path in paths]
+        if "changed" in states:
+            new_time = 0
+        elif "unknown" in states:
+            continue
+        else:
+            new_time = max(read_time, *map(_mtime, paths))
+        if new_time != read_time:
+            read_times[docname] = new_time
+            changed = True
+    if changed:
+        tmp_file = environment.with_name(f"{ENVIRONMENT}.tmp")
+        with tmp_file.open("wb") as f:
+            pickle.dump(env, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, environment)
+    return True
+
+
+def _compare(
+    path: str | os.PathLike[str],
+    src_dir: Path,
+    built: dict[str, Any],
+    sources: dict[str, Any],
+) -> str:
+    try:
+        name = Path(path).relative_to(src_dir).as_posix()
+    except ValueError:
+        return "unknown"
+    if name not in built["files"]:
+        return "unknown"
+    if sources["files"].get(name) != built["files"][name]:
+        return "changed"
+    return "same"
+
+
+def _differences(built: dict[str, Any], sources: dict[str, Any]) -> int:
+    """Count the files that differ between two manifests."""
+    built_files = built["files"]
+    return sum(
+        built_files.get(name) != digest for name, digest in sources["files"].items()
+    )
+
+
+def _read_manifest(path: Path) -> dict[str, Any] | None:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+        return None
+    return data
+
+
+def _write_json(path: Path, data: dict[str, Any]) -> None:
+    tmp_file = path.with_name(f"{path.name}.tmp")
+    tmp_file.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp_file, path)
+
+
+def _mtime(path: str | os.PathLike[str]) -> int:
+    """Return the modification time of *path* in microseconds, as Sphinx does."""
+    try:
+        return -(os.stat(path).st_mtime_ns // -1_000)
+    except OSError:
+        return 0
+
+
+def _touch(path: Path) -> None:
+    """Set the modification time of *path* to now, if it exists.
+
+    For cache entries, this marks them as recently used.
+    """
+    with contextlib.suppress(OSError):
+        os.utime(path)
+
+
+def _tree_size(root: Path) -> int:
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, filenames in os.walk(root)
+        for name in filenames
+    )
+
+
+def _main() -> int:
+    """Correct the read times, as described by JSON on standard input."""
+    data = json.load(sys.stdin.buffer)
+    aligned = _align_read_times(
+        Path(data["environment"]), Path(data["src_dir"]), data["built"], data["sources"]
+    )
+    return 0 if aligned else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
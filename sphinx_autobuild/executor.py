@@ -0,0 +1,65 @@
+"""Execution backends for running the rebuild callback."""
+
+from __future__ import annotations
+
+from concurrent.futures import Executor, Future
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    ExecutorFactory = Callable[[], Executor]
+
+
+class InlineExecutor(Executor):
+    """Run each call synchronously in the submitting thread.
+
+    This blocks the event loop for the duration of a build,
+    and so is mostly useful for tests and for embedding.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        return future
+
+
+# The executors are imported when needed, as importing
+# concurrent.futures.process also imports multiprocessing.
+
+
+def _thread_executor() -> Executor:
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="sphinx-autobuild")
+
+
+def _process_executor() -> Executor:
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=1)
+
+
+EXECUTORS: dict[str, ExecutorFactory] = {
+    "thread": _thread_executor,
+    "process": _process_executor,
+    "inline": InlineExecutor,
+}
+
+
+def create_executor(kind: str | ExecutorFactory) -> Executor:
+    """Create the executor named by *kind*, or by calling the factory *kind*."""
+    if callable(kind):
+        return kind()
+    try:
+        factory = EXECUTORS[kind]
+    except KeyError:
+        choices = ", ".join(map(repr, EXECUTORS))
+        msg = f"unknown executor {kind!r}, expected one of {choices}"
+        raise ValueError(msg) from None
+    return factory()
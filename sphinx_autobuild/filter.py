@@ -3,43 +3,126 @@
 from __future__ import annotations
 
 import fnmatch
+import functools
 import os
 import re
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sphinx_autobuild.gitignore import GitIgnore
+
+#: The number of recent verdicts to remember.
+#: Tools that regenerate files tend to touch the same paths repeatedly.
+CACHE_SIZE = 8192
 
 
 class IgnoreFilter:
-    def __init__(self, regular, regex_based):
+    def __init__(
+        self,
+        regular,
+        regex_based,
+        *,
+        gitignore: GitIgnore | None = None,
+        cache_size=CACHE_SIZE,
+    ):
         """Prepare the function that determines whether a path should be ignored."""
         normalised_paths = [Path(p).resolve().as_posix() for p in regular]
         self.regular_patterns = list(dict.fromkeys(normalised_paths))
         self.regex_based_patterns = [*map(re.compile, dict.fromkeys(regex_based))]
+        self.gitignore = gitignore or None
+        self.matcher, self.unmerged_patterns = _compile(
+            self.regular_patterns, self.regex_based_patterns
+        )
+        self.prefix_matcher = None
+        if self.regular_patterns:
+            prefixes = "|".join(map(re.escape, self.regular_patterns))
+            self.prefix_matcher = re.compile(f"^(?:{prefixes})(?:/|$)")
+        self.debug = os.getenv("SPHINX_AUTOBUILD_DEBUG") not in {None, "", "0"}
+        self._is_ignored = functools.lru_cache(maxsize=cache_size)(self._match)
 
     def __repr__(self):
+        if self.gitignore is None:
+            return (
+                f"IgnoreFilter(regular={self.regular_patterns!r}, "
+                f"regex_based={self.regex_based_patterns!r})"
+            )
         return (
             f"IgnoreFilter(regular={self.regular_patterns!r}, "
-            f"regex_based={self.regex_based_patterns!r})"
+            f"regex_based={self.regex_based_patterns!r}, "
+            f"gitignore={self.gitignore!r})"
         )
 
     def __call__(self, filename: str, /):
         """Determine if 'path' should be ignored."""
-        normalised_path = Path(filename).resolve().as_posix()
-        if os.getenv("SPHINX_AUTOBUILD_DEBUG") not in {None, "", "0"}:
+        if self.debug:
+            normalised_path = Path(filename).resolve().as_posix()
             print(
                 f"SPHINX_AUTOBUILD_DEBUG: {normalised_path!r} has changed; "
                 f"ignores are {self}"
             )
-        # Any regular pattern matches.
-        for pattern in self.regular_patterns:
-            # separators are normalised before creating the IgnoreFilter
-            if normalised_path.startswith(f"{pattern}/"):
-                return True
-            if fnmatch.fnmatch(normalised_path, pattern):
-                return True
-
-        # Any regular expression matches.
-        for regex in self.regex_based_patterns:  # NoQA: SIM110
-            if regex.search(normalised_path):
-                return True
-
-        return False
+        return self._is_ignored(os.fspath(filename))
+
+    def is_ignored(self, filename: str, /) -> bool:
+        """Determine if 'path' should be ignored, without debug output."""
+        return self._is_ignored(os.fspath(filename))
+
+    def prunes(self, directory: str, /) -> bool:
+        """Determine if everything below 'directory' is ignored.
+
+        Such directories need not be watched at all.
+        Only directory prefixes and ignore files are considered,
+        as globs and regular expressions may match the directory
+        without matching the paths inside it.
+        """
+        path = Path(directory).resolve().as_posix()
+        if self.prefix_matcher is not None and self.prefix_matcher.match(path):
+            return True
+        return self.gitignore is not None and self.gitignore.match(path, is_dir=True)
+
+    def _match(self, filename: str) -> bool:
+        normalised_path = Path(filename).resolve().as_posix()
+        if self.matcher is not None and self.matcher.search(normalised_path):
+            return True
+        if any(regex.search(normalised_path) for regex in self.unmerged_patterns):
+            return True
+        return self.gitignore is not None and self.gitignore.match(normalised_path)
+
+
+def _compile(regular_patterns, regex_patterns):
+    """Combine all patterns into as few regular expressions as possible.
+
+    Returns the combined expression (or ``None`` if there are no patterns),
+    and a list of regular expressions that could not safely be combined.
+    """
+    # Each regular pattern matches either as a directory prefix
+    # or as a glob against the whole path.
+    # Separators are normalised before creating the IgnoreFilter.
+    regular = [
+        part
+        for pattern in regular_patterns
+        for part in (f"{re.escape(pattern)}/", fnmatch.translate(pattern))
+    ]
+    parts = []
+    if regular:
+        # fnmatch uses os.path.normcase, which is case-insensitive on Windows.
+        flags = "i" if os.path.normcase("A") == "a" else ""
+        parts.append(f"^(?{flags}:{'|'.join(regular)})")
+
+    unmerged = []
+    for regex in regex_patterns:
+        # Capturing groups would be renumbered by combining expressions,
+        # breaking backreferences, and global flags must come first.
+        if regex.groups or regex.flags != re.UNICODE:
+            unmerged.append(regex)
+        else:
+            parts.append(f"(?:{regex.pattern})")
+
+    if not parts:
+        return None, unmerged
+    try:
+        return re.compile("|".join(parts)), unmerged
+    except re.error:
+        # Fall back to combining only the regular patterns.
+        matcher = re.compile(parts[0]) if regular else None
+        return matcher, list(regex_patterns)
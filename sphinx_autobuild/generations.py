@@ -0,0 +1,227 @@
+"""Atomic publishing of the built documentation.
+
+Sphinx writes into the output directory while a build runs,
+so serving that directory directly can expose a half-written build.
+Instead, each successful build is published as a new *generation*:
+a snapshot of the output directory that is never modified afterwards.
+Files unchanged since the previous generation are hard-linked to it,
+so that large, unchanging files such as images are not duplicated.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from starlette.staticfiles import StaticFiles
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from starlette.types import Receive, Scope, Send
+
+#: The directory, within the served directory, holding the generations.
+GENERATIONS_DIR = ".autobuild-generations"
+
+#: Directories in the served directory that are not published.
+SKIPPED_DIRECTORIES = frozenset({".doctrees", GENERATIONS_DIR})
+
+# The Linux ioctl that shares the storage of one file with another,
+# on file systems that support copy-on-write (e.g. Btrfs and XFS).
+if sys.platform == "linux":
+    import fcntl
+
+    FICLONE = 0x40049409
+else:
+    FICLONE = None
+
+
+class Generation:
+    """A published, immutable snapshot of the built documentation."""
+
+    def __init__(
+        self, number: int, directory: Path, stats: dict[str, tuple[int, int]]
+    ) -> None:
+        self.number = number
+        self.directory = directory
+        #: Map of relative path to the size and modification time
+        #: of the file in the output directory when it was published.
+        self.stats = stats
+        #: The number of requests currently being served from this generation.
+        self.requests = 0
+
+    def __repr__(self):
+        return f"Generation(number={self.number}, directory={self.directory!r})"
+
+
+class OutputGenerations:
+    """Publish snapshots of *serve_dir* and track which are in use.
+
+    A generation that has been superseded is removed once
+    no request is being served from it.
+    """
+
+    def __init__(self, serve_dir: str | os.PathLike[str]) -> None:
+        self.serve_dir = Path(serve_dir).resolve()
+        self.root = self.serve_dir / GENERATIONS_DIR
+        self.current: Generation | None = None
+        self.retired: list[Generation] = []
+        self.files_linked = 0
+        self.files_copied = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"OutputGenerations(serve_dir={self.serve_dir!r})"
+
+    def publish(self) -> Generation:
+        """Snapshot the served directory, and serve the snapshot from now on.
+
+        This may be called from any thread.
+        """
+        previous = self.current
+        if previous is None:
+            # Generations left behind by a previous run.
+            shutil.rmtree(self.root, ignore_errors=True)
+            number = 1
+        else:
+            number = previous.number + 1
+        directory = self.root / str(number)
+        shutil.rmtree(directory, ignore_errors=True)
+        stats = self._snapshot(directory, previous)
+
+        generation = Generation(number, directory, stats)
+        with self._lock:
+            self.current = generation
+            if previous is not None:
+                self.retired.append(previous)
+        self.prune()
+        return generation
+
+    def acquire(self) -> Generation | None:
+        """Return the current generation, marking it as in use."""
+        with self._lock:
+            if (generation := self.current) is not None:
+                generation.requests += 1
+            return generation
+
+    def release(self, generation: Generation) -> bool:
+        """Mark *generation* as no longer in use by a request.
+
+        Returns whether :meth:`prune` should be called.
+        """
+        with self._lock:
+            generation.requests -= 1
+            return not generation.requests and generation in self.retired
+
+    def prune(self) -> int:
+        """Remove superseded generations that are not in use.
+
+        Returns the number of generations removed.
+        """
+        with self._lock:
+            unused = [g for g in self.retired if not g.requests]
+            self.retired = [g for g in self.retired if g.requests]
+        for generation in unused:
+            shutil.rmtree(generation.directory, ignore_errors=True)
+        return len(unused)
+
+    def _snapshot(
+        self, directory: Path, previous: Generation | None
+    ) -> dict[str, tuple[int, int]]:
+        stats = {}
+        for dirpath, dirnames, filenames in os.walk(self.serve_dir):
+            dirnames[:] = [n for n in dirnames if n not in SKIPPED_DIRECTORIES]
+            relative_dir = os.path.relpath(dirpath, self.serve_dir)
+            target_dir = directory / relative_dir
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for name in filenames:
+                source = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(source)
+                except FileNotFoundError:
+                    continue
+                relative = os.path.normpath(os.path.join(relative_dir, name))
+                stats[relative] = stat = (st.st_size, st.st_mtime_ns)
+                if (
+                    previous is not None
+                    and previous.stats.get(relative) == stat
+                    and _link(previous.directory / relative, target_dir / name)
+                ):
+                    self.files_linked += 1
+                else:
+                    _clone(source, target_dir / name)
+                    # Keep the modification time, which is used to match
+                    # precompressed siblings to the original files.
+                    os.utime(target_dir / name, ns=(st.st_atime_ns, st.st_mtime_ns))
+                    self.files_copied += 1
+        return stats
+
+
+class GenerationStaticFiles:
+    """Serve files from the current generation.
+
+    Each request is served entirely from the generation that was current
+    when it arrived, even if a newer generation is published meanwhile.
+    Until the first generation is published, *generations.serve_dir*
+    is served directly.
+    Keyword arguments are passed to *static_files*, which is
+    :class:`~starlette.staticfiles.StaticFiles` or a subclass.
+    """
+
+    def __init__(
+        self,
+        generations: OutputGenerations,
+        *,
+        static_files: type[StaticFiles] = StaticFiles,
+        **kwargs: Any,
+    ) -> None:
+        self.generations = generations
+        self.static_files = static_files
+        self.kwargs = kwargs
+        self.fallback = static_files(directory=generations.serve_dir, **kwargs)
+        self._apps: dict[int, StaticFiles] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        generation = self.generations.acquire()
+        if generation is None:
+            await self.fallback(scope, receive, send)
+            return
+        try:
+            await self._app_for(generation)(scope, receive, send)
+        finally:
+            if self.generations.release(generation):
+                await asyncio.to_thread(self.generations.prune)
+
+    def _app_for(self, generation: Generation) -> StaticFiles:
+        if (app := self._apps.get(generation.number)) is None:
+            app = self.static_files(directory=generation.directory, **self.kwargs)
+            # Forget generations older than this one.
+            self._apps = {n: a for n, a in self._apps.items() if n > generation.number}
+            self._apps[generation.number] = app
+        return app
+
+
+def _link(source: Path, target: Path) -> bool:
+    try:
+        os.link(source, target)
+    except OSError:
+        return False
+    return True
+
+
+def _clone(source: str, target: Path) -> None:
+    """Copy *source* to *target*, sharing storage if the file system allows."""
+    if FICLONE is not None:
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            pass
+        else:
+            return
+    shutil.copyfile(source, target)
@@ -0,0 +1,183 @@
+"""Support for ``.gitignore``-style ignore files."""
+
+from __future__ import annotations
+
+import functools
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+#: The names of files from which ignore rules are read, in order of precedence.
+IGNORE_FILE_NAMES = (".gitignore", ".ignore")
+
+
+class _Rule(NamedTuple):
+    regex: re.Pattern[str]
+    negated: bool
+    dir_only: bool
+
+
+class GitIgnore:
+    """Rules from ``.gitignore`` and ``.ignore`` files.
+
+    Rules in each file apply to paths below the directory containing it,
+    and follow Git's semantics: the last matching rule wins,
+    ``!`` re-includes a path, and nothing below an ignored directory
+    can be re-included.
+    """
+
+    def __init__(self, *, cache_size: int = 4096) -> None:
+        #: Map of base directory (POSIX form) to the rules read from it.
+        self.rules: dict[str, list[_Rule]] = {}
+        self.files: list[Path] = []
+        self.match = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def __repr__(self):
+        return f"GitIgnore(files={[str(file) for file in self.files]!r})"
+
+    def __bool__(self):
+        return any(self.rules.values())
+
+    @classmethod
+    def from_directories(cls, directories: Iterable[os.PathLike[str]]) -> GitIgnore:
+        """Read the ignore files that apply to *directories*.
+
+        This includes ignore files in parent directories
+        up to the root of the enclosing Git repository, if any,
+        and ignore files in every directory below *directories*
+        that is not itself ignored.
+        """
+        gitignore = cls()
+        for directory in directories:
+            directory = Path(directory).resolve()
+            if not directory.is_dir():
+                continue
+            for parent in reversed(_repository_parents(directory)):
+                gitignore.read_directory(parent)
+            for dirpath, dirnames, _ in os.walk(directory):
+                gitignore.read_directory(Path(dirpath))
+                dirnames[:] = [
+                    name
+                    for name in dirnames
+                    if not gitignore.match(os.path.join(dirpath, name), is_dir=True)
+                ]
+        return gitignore
+
+    def read_directory(self, directory: Path) -> None:
+        """Read the ignore files in *directory*, if not already read."""
+        base = directory.as_posix()
+        if base in self.rules:
+            return
+        rules = self.rules[base] = []
+        for name in IGNORE_FILE_NAMES:
+            file = directory / name
+            try:
+                lines = file.read_text(encoding="utf-8").splitlines()
+            except (OSError, UnicodeDecodeError):
+                continue
+            self.files.append(file)
+            rules += filter(None, map(_parse_line, lines))
+        self.match.cache_clear()
+
+    def _match(self, path: str, *, is_dir: bool | None = None) -> bool:
+        """Whether the absolute *path* is ignored.
+
+        If *is_dir* is ``None``, the file system is consulted
+        when a rule only applies to directories.
+        """
+        path = Path(path).as_posix()
+        parent = path.rpartition("/")[0]
+        if parent and self.match(parent, is_dir=True):
+            return True
+
+        ignored = False
+        for base, rules in self.rules.items():
+            if not path.startswith(f"{base}/") and base != "/":
+                continue
+            relative = path.removeprefix(base).lstrip("/")
+            for rule in rules:
+                if rule.negated != ignored:
+                    # This rule cannot change the verdict.
+                    continue
+                if not rule.regex.fullmatch(relative):
+                    continue
+                if rule.dir_only:
+                    if is_dir is None:
+                        is_dir = os.path.isdir(path)
+                    if not is_dir:
+                        continue
+                ignored = not rule.negated
+        return ignored
+
+
+def _repository_parents(directory: Path) -> list[Path]:
+    """Return the parents of *directory* within its Git repository."""
+    parents = []
+    for parent in directory.parents:
+        parents.append(parent)
+        if (parent / ".git").exists():
+            return parents
+    # Not in a repository, so ignore files above *directory* don't apply.
+    return []
+
+
+def _parse_line(line: str) -> _Rule | None:
+    if not line.strip() or line.startswith("#"):
+        return None
+    # Trailing spaces are ignored unless escaped with a backslash.
+    line = re.sub(r"(?<!\\)\s+$", "", line)
+    negated = line.startswith("!")
+    if negated or line.startswith(("\\!", "\\#")):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A separator at the beginning or middle anchors the pattern
+    # to the directory containing the ignore file.
+    anchored = "/" in line
+    line = line.removeprefix("/")
+    regex = _translate(line)
+    if not anchored:
+        regex = f"(?:.*/)?{regex}"
+    return _Rule(re.compile(regex, re.DOTALL), negated=negated, dir_only=dir_only)
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regular expression."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif (c := pattern[i]) == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        elif c == "[" and (end := pattern.find("]", i + 2)) != -1:
+            chars = pattern[i + 1 : end]
+            if chars[0] in "!^":
+                chars = f"^{chars[1:]}"
+            chars = chars.replace("\\", "\\\\")
+            parts.append(f"[{chars}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return "".join(parts)
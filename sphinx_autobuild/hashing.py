@@ -0,0 +1,174 @@
+"""Tracking of file contents, to skip rebuilds when nothing really changed."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+#: Bump when the on-disk format changes, to discard old cache files.
+_CACHE_VERSION = 1
+
+
+def file_digest(path: str | os.PathLike[str]) -> str:
+    """Return a hex digest of the contents of the file at *path*."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+
+class ContentIndex:
+    """An index of file contents, keyed by absolute path.
+
+    Each entry records the file's modification time, size, and content hash.
+    The hash is only recomputed when the modification time or size differ
+    from the recorded values, so unchanged files cost a single ``stat``.
+    If *cache_file* is given, the index is loaded from and saved to it,
+    so that it survives restarts.
+    The index may be used from several threads at once.
+    """
+
+    def __init__(self, cache_file: str | os.PathLike[str] | None = None) -> None:
+        self.cache_file = Path(cache_file) if cache_file is not None else None
+        self.entries: dict[str, tuple[int, int, str | None]] = {}
+        self._lock = threading.Lock()
+        if self.cache_file is not None:
+            self.load()
+
+    def __repr__(self):
+        return f"ContentIndex(cache_file={self.cache_file!r}, entries={len(self)})"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self) -> None:
+        """Replace the index with the contents of the cache file, if valid."""
+        try:
+            data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+            return
+        self.entries = {
+            path: (mtime_ns, size, digest)
+            for path, (mtime_ns, size, digest) in data["entries"].items()
+        }
+
+    def save(self) -> None:
+        """Write the index to the cache file, if there is one."""
+        if self.cache_file is None:
+            return
+        with self._lock:
+            data = {"version": _CACHE_VERSION, "entries": dict(self.entries)}
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.tmp")
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_file, self.cache_file)
+
+    def update(self, path: str | os.PathLike[str], *, digest: bool = True) -> bool:
+        """Record the current state of *path*, returning whether it changed.
+
+        Paths that were not previously indexed count as changed,
+        as do deleted files.
+        Directories never count as changed, unless they were deleted,
+        as changes to their contents are reported separately.
+        If *digest* is false, the contents are not hashed,
+        and any change to the modification time or size counts as a change.
+        """
+        key = os.fspath(path)
+        with self._lock:
+            try:
+                st = os.stat(key)
+            except OSError:
+                self.entries.pop(key, None)
+                return True
+            if stat.S_ISDIR(st.st_mode):
+                return False
+
+            previous = self.entries.get(key)
+            if previous is not None and previous[:2] == (st.st_mtime_ns, st.st_size):
+                return False
+            if not digest:
+                self.entries[key] = st.st_mtime_ns, st.st_size, None
+                return True
+            try:
+                new_digest = file_digest(key)
+            except OSError:
+                self.entries.pop(key, None)
+                return True
+            self.entries[key] = st.st_mtime_ns, st.st_size, new_digest
+            return previous is None or previous[2] != new_digest
+
+    def filter_changed(self, paths: Iterable[Path]) -> list[Path]:
+        """Return the paths whose contents changed, updating the index."""
+        return [path for path in paths if self.update(path)]
+
+    def scan(
+        self,
+        roots: Iterable[str | os.PathLike[str]],
+        ignore: Callable[[str], bool],
+        *,
+        digests: bool = True,
+    ) -> list[str]:
+        """Index every file below *roots* that is not ignored.
+
+        Entries for files that no longer exist are removed.
+        Returns the paths of files that were added, changed, or removed.
+        If *digests* is false, changed files are not hashed;
+        :meth:`fill_digests` hashes them later.
+        """
+        with self._lock:
+            before = dict(self.entries)
+        changed = []
+        seen = set()
+        for root in roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [
+                    name for name in dirnames if not ignore(os.path.join(dirpath, name))
+                ]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if ignore(path):
+                        continue
+                    seen.add(path)
+                    if self.update(path, digest=digests):
+                        changed.append(path)
+        with self._lock:
+            for path in before.keys() - seen:
+                # Entries updated meanwhile are for files created since.
+                if self.entries.get(path) is before[path]:
+                    del self.entries[path]
+                    changed.append(path)
+        return changed
+
+    def fill_digests(self) -> int:
+        """Hash the files indexed without a digest, if they are unchanged since.
+
+        Files are hashed without holding the lock,
+        so that other threads can use the index meanwhile.
+        Returns the number of files hashed.
+        """
+        with self._lock:
+            pending = [key for key, entry in self.entries.items() if entry[2] is None]
+        filled = 0
+        for key in pending:
+            try:
+                before = os.stat(key)
+                digest = file_digest(key)
+                after = os.stat(key)
+            except OSError:
+                continue
+            entry = before.st_mtime_ns, before.st_size, None
+            if (after.st_mtime_ns, after.st_size) != entry[:2]:
+                continue
+            with self._lock:
+                if self.entries.get(key) == entry:
+                    self.entries[key] = *entry[:2], digest
+                    filled += 1
+        return filled
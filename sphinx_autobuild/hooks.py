@@ -0,0 +1,124 @@
+"""Commands run before and after each build."""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sphinx_autobuild.utils import show_command, show_message
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+class Hook:
+    """A command, and the paths whose changes it depends on.
+
+    A hook without *globs* runs for every build.
+    A hook with *globs* runs for the first build,
+    and afterwards only when a changed path matches one of them.
+    Globs are matched against absolute paths, and against paths
+    relative to the current directory.
+    """
+
+    def __init__(self, command: Sequence[str], globs: Sequence[str] = ()) -> None:
+        self.command = list(command)
+        self.globs = tuple(globs)
+        self.has_run = False
+
+    def __repr__(self):
+        return f"Hook(command={self.command!r}, globs={self.globs!r})"
+
+    @classmethod
+    def from_argument(cls, command: str, globs: str = "") -> Hook:
+        """Create a hook from a command line and comma-separated globs."""
+        globs = [glob.strip() for glob in globs.split(",") if glob.strip()]
+        return cls(shlex.split(command), globs)
+
+    @property
+    def name(self) -> str:
+        return Path(self.command[0]).name if self.command else ""
+
+    def should_run(self, changed_paths: Sequence[Path]) -> bool:
+        if not self.globs or not self.has_run:
+            return True
+        cwd = Path.cwd()
+        for path in changed_paths:
+            candidates = [path.as_posix()]
+            if path.is_relative_to(cwd):
+                candidates.append(path.relative_to(cwd).as_posix())
+            if any(
+                fnmatch.fnmatch(candidate, glob)
+                for candidate in candidates
+                for glob in self.globs
+            ):
+                return True
+        return False
+
+
+def run_hooks(
+    hooks: Sequence[Hook],
+    changed_paths: Sequence[Path],
+    *,
+    log_context: str,
+    jobs: int = 1,
+) -> int:
+    """Run the hooks that depend on *changed_paths*.
+
+    Returns the exit code of the first hook that failed, or zero.
+    With *jobs* greater than one, up to that many hooks run at once,
+    and each line of their output is prefixed with the hook's name.
+    """
+    selected = [hook for hook in hooks if hook.should_run(changed_paths)]
+    if skipped := len(hooks) - len(selected):
+        show_message(f"{log_context}: skipping {skipped} unaffected command(s)")
+    if jobs <= 1 or len(selected) <= 1:
+        for hook in selected:
+            if returncode := _run_hook(hook, log_context, prefix=None):
+                return returncode
+        return 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        returncodes = list(
+            pool.map(
+                lambda hook: _run_hook(hook, log_context, prefix=hook.name), selected
+            )
+        )
+    return next(filter(None, returncodes), 0)
+
+
+def _run_hook(hook: Hook, log_context: str, *, prefix: str | None) -> int:
+    show_message(log_context)
+    show_command(hook.command)
+    start = time.perf_counter()
+    if prefix is None:
+        returncode = subprocess.run(hook.command, check=False).returncode
+    else:
+        returncode = _run_prefixed(hook.command, prefix)
+    elapsed = time.perf_counter() - start
+    hook.has_run = True
+    outcome = "finished" if returncode == 0 else f"failed ({returncode})"
+    show_message(
+        f"{log_context} {outcome} in {elapsed:.2f}s: {shlex.join(hook.command)}"
+    )
+    return returncode
+
+
+def _run_prefixed(command: list[str], prefix: str) -> int:
+    """Run *command*, printing each line of its output after *prefix*."""
+    with subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    ) as process:
+        for line in process.stdout:
+            print(f"[{prefix}] {line}", end="", flush=True)
+        return process.wait()
@@ -0,0 +1,83 @@
+"""Broadcasting of notifications to connected browsers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any
+
+
+class Subscription:
+    """A connected client's queue of pending messages.
+
+    Once the client is dropped, the queue holds only ``None``.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize)
+
+    async def get(self) -> str | None:
+        """Wait for the next message, or return ``None`` if dropped."""
+        message = await self.queue.get()
+        if message is None:
+            # Leave the marker for later calls.
+            self.queue.put_nowait(None)
+        return message
+
+    def drop(self) -> None:
+        """Discard pending messages, and stop waiting for more."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ReloadHub:
+    """Publish messages to every subscribed client.
+
+    Each client has its own bounded queue,
+    so that one slow client cannot delay the others.
+    Clients whose queue is full are dropped.
+    Every message carries a monotonically increasing ``generation``.
+    """
+
+    def __init__(self, *, queue_size: int = 16, send_timeout: float = 10.0) -> None:
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.subscriptions: set[Subscription] = set()
+        self.generation = 0
+        self.clients_dropped = 0
+
+    def __repr__(self):
+        return (
+            f"ReloadHub(clients={len(self.subscriptions)}, "
+            f"generation={self.generation})"
+        )
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    def drop(self, subscription: Subscription) -> None:
+        """Stop sending messages to a client that is not keeping up."""
+        if subscription in self.subscriptions:
+            self.clients_dropped += 1
+        self.unsubscribe(subscription)
+        subscription.drop()
+
+    def publish(self, message: dict[str, Any]) -> int:
+        """Queue *message* for every client, returning the number queued."""
+        self.generation += 1
+        payload = json.dumps({**message, "generation": self.generation})
+        queued = 0
+        for subscription in list(self.subscriptions):
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.drop(subscription)
+            else:
+                queued += 1
+        return queued
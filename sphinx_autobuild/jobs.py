@@ -0,0 +1,91 @@
+"""Choosing how many processes sphinx-build uses for a build.
+
+Parallel builds start worker processes and pickle documents between them,
+which costs more than it saves when only a few documents are outdated.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Sequence
+    from pathlib import Path
+
+#: Documents each additional process should have to read to be worthwhile.
+DOCUMENTS_PER_JOB = 50
+
+#: Changes to files with these suffixes may affect every document.
+GLOBAL_SUFFIXES = frozenset({".py", ".pyi", ".html", ".jinja", ".j2"})
+
+
+def available_cores() -> int:
+    """Return the number of CPU cores this process may use."""
+    if hasattr(os, "process_cpu_count"):
+        return os.process_cpu_count() or 1
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def jobs_pinned(sphinx_args: Sequence[str]) -> bool:
+    """Whether the number of processes is given in *sphinx_args*."""
+    return any(
+        arg in {"-j", "--jobs"} or arg.startswith(("--jobs=", "-j"))
+        for arg in sphinx_args
+    )
+
+
+def choose_jobs(outdated: int, cores: int) -> int:
+    """Return the number of processes to read *outdated* documents with."""
+    return max(1, min(cores, outdated // DOCUMENTS_PER_JOB))
+
+
+def count_outdated(
+    changed_paths: Sequence[Path],
+    *,
+    src_dir: Path,
+    source_suffixes: Collection[str],
+    environment: Path | None,
+    skip: Collection[Path] = (),
+) -> int:
+    """Estimate how many documents Sphinx will read for *changed_paths*.
+
+    Changed documents are read again.
+    Other changes, such as to ``conf.py`` or to templates,
+    may cause every document to be read again.
+    An empty *changed_paths* asks for a full build, which reads every document
+    changed since the pickled *environment* was written.
+    """
+    if changed_paths and not any(
+        path.suffix in GLOBAL_SUFFIXES for path in changed_paths
+    ):
+        return sum(path.suffix in source_suffixes for path in changed_paths)
+    since = None
+    if not changed_paths and environment is not None:
+        with contextlib.suppress(OSError):
+            since = environment.stat().st_mtime_ns
+    skip = {os.fspath(path) for path in skip}
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if not name.startswith((".", "_build"))
+            and os.path.join(dirpath, name) not in skip
+        ]
+        for name in filenames:
+            if os.path.splitext(name)[1] not in source_suffixes:
+                continue
+            if since is None or _modified_since(os.path.join(dirpath, name), since):
+                count += 1
+    return count
+
+
+def _modified_since(path: str, since: int) -> bool:
+    try:
+        return os.stat(path).st_mtime_ns > since
+    except OSError:
+        return False
@@ -0,0 +1,192 @@
+"""Timing of builds, for finding out where rebuild time goes."""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from starlette.responses import PlainTextResponse
+
+if TYPE_CHECKING:
+    import os
+    from collections.abc import Sequence
+    from typing import Any
+
+    from starlette.requests import Request
+
+    from sphinx_autobuild.build import BuildResult
+
+#: The phases of a build, in order.
+PHASES = ("queue_wait", "pre_build", "sphinx_build", "post_build")
+
+#: Upper bounds of the build duration histogram, in seconds.
+BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+#: At most this many changed paths are kept in each record.
+MAX_TRIGGER_PATHS = 100
+
+_PREFIX = "sphinx_autobuild"
+
+
+class BuildRecord:
+    """The timings and outcome of a single build."""
+
+    def __init__(self, changed_paths: Sequence[Path], *, queue_wait: float) -> None:
+        #: The wall-clock time at which the build started.
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.trigger = [str(path) for path in changed_paths[:MAX_TRIGGER_PATHS]]
+        self.trigger_count = len(changed_paths)
+        #: Map of phase to its duration, in seconds.
+        self.phases = {"queue_wait": queue_wait}
+        #: The total time from the start of the build to notifying clients.
+        self.duration = 0.0
+        self.status = "unknown"
+        self.returncode: int | None = None
+        self.targeted = False
+        self.jobs: int | None = None
+        self.clients_notified = 0
+
+    def __repr__(self):
+        return f"BuildRecord(status={self.status!r}, duration={self.duration:.3f})"
+
+    def set_result(self, result: BuildResult | None) -> None:
+        """Record the outcome returned by the build callback."""
+        if result is None:
+            return
+        self.returncode = result.returncode
+        self.targeted = result.targeted
+        self.jobs = result.jobs
+        self.status = "success" if result.returncode == 0 else "failure"
+        self.phases.update(result.timings)
+
+    def finish(self, *, status: str | None = None, clients_notified: int = 0) -> None:
+        if status is not None:
+            self.status = status
+        self.clients_notified = clients_notified
+        self.duration = time.perf_counter() - self._start
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "trigger": self.trigger,
+            "trigger_count": self.trigger_count,
+            **{phase: self.phases.get(phase) for phase in PHASES},
+            "duration": self.duration,
+            "status": self.status,
+            "returncode": self.returncode,
+            "targeted": self.targeted,
+            "jobs": self.jobs,
+            "clients_notified": self.clients_notified,
+        }
+
+
+class BuildMetrics:
+    """Aggregate build records, and optionally append them to *log_file*.
+
+    The log file holds one JSON object per line, one line per build.
+    """
+
+    def __init__(
+        self, log_file: str | os.PathLike[str] | None = None, *, keep: int = 100
+    ) -> None:
+        self.log_file = Path(log_file) if log_file is not None else None
+        #: The most recent records.
+        self.recent: deque[BuildRecord] = deque(maxlen=keep)
+        self.builds = Counter()
+        self.clients_notified = 0
+        self.duration_sum = 0.0
+        self.duration_buckets = [0] * len(BUCKETS)
+        self.phase_sums = dict.fromkeys(PHASES, 0.0)
+        self.phase_counts = dict.fromkeys(PHASES, 0)
+
+    def __repr__(self):
+        return f"BuildMetrics(builds={sum(self.builds.values())})"
+
+    def add(self, record: BuildRecord) -> None:
+        """Add a finished record, writing it to the log file if there is one."""
+        self.recent.append(record)
+        self.builds[record.status] += 1
+        self.clients_notified += record.clients_notified
+        self.duration_sum += record.duration
+        for i, bound in enumerate(BUCKETS):
+            if record.duration <= bound:
+                self.duration_buckets[i] += 1
+        for phase, seconds in record.phases.items():
+            if phase in self.phase_sums:
+                self.phase_sums[phase] += seconds
+                self.phase_counts[phase] += 1
+        if self.log_file is not None:
+            with self.log_file.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record.as_dict()) + "\n")
+
+    def prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        total = sum(self.builds.values())
+        lines = [
+            f"# HELP {_PREFIX}_builds_total Builds run, by outcome.",
+            f"# TYPE {_PREFIX}_builds_total counter",
+            *(
+                f'{_PREFIX}_builds_total{{status="{status}"}} {count}'
+                for status, count in sorted(self.builds.items())
+            ),
+            f"# HELP {_PREFIX}_build_duration_seconds "
+            "Time from the start of a build to notifying clients.",
+            f"# TYPE {_PREFIX}_build_duration_seconds histogram",
+            *(
+                f'{_PREFIX}_build_duration_seconds_bucket{{le="{bound}"}} {count}'
+                for bound, count in zip(BUCKETS, self.duration_buckets, strict=True)
+            ),
+            f'{_PREFIX}_build_duration_seconds_bucket{{le="+Inf"}} {total}',
+            f"{_PREFIX}_build_duration_seconds_sum {self.duration_sum}",
+            f"{_PREFIX}_build_duration_seconds_count {total}",
+            f"# HELP {_PREFIX}_build_phase_seconds Time spent in each phase of builds.",
+            f"# TYPE {_PREFIX}_build_phase_seconds summary",
+        ]
+        metric = f"{_PREFIX}_build_phase_seconds"
+        for phase in PHASES:
+            labels = f'{{phase="{phase}"}}'
+            lines += [
+                f"{metric}_sum{labels} {self.phase_sums[phase]}",
+                f"{metric}_count{labels} {self.phase_counts[phase]}",
+            ]
+        if self.recent:
+            last = self.recent[-1]
+            lines += [
+                f"# HELP {_PREFIX}_last_build_phase_seconds "
+                "Time spent in each phase of the most recent build.",
+                f"# TYPE {_PREFIX}_last_build_phase_seconds gauge",
+                *(
+                    f'{_PREFIX}_last_build_phase_seconds{{phase="{phase}"}} {seconds}'
+                    for phase, seconds in last.phases.items()
+                ),
+                f"# HELP {_PREFIX}_last_build_timestamp_seconds "
+                "When the most recent build started.",
+                f"# TYPE {_PREFIX}_last_build_timestamp_seconds gauge",
+                f"{_PREFIX}_last_build_timestamp_seconds {last.started_at}",
+            ]
+            if last.jobs is not None:
+                lines += [
+                    f"# HELP {_PREFIX}_last_build_jobs "
+                    "Processes used by sphinx-build in the most recent build.",
+                    f"# TYPE {_PREFIX}_last_build_jobs gauge",
+                    f"{_PREFIX}_last_build_jobs {last.jobs}",
+                ]
+        lines += [
+            f"# HELP {_PREFIX}_clients_notified_total "
+            "Browser connections told that a build finished.",
+            f"# TYPE {_PREFIX}_clients_notified_total counter",
+            f"{_PREFIX}_clients_notified_total {self.clients_notified}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    async def endpoint(self, _request: Request) -> PlainTextResponse:
+        """Serve the metrics to a Prometheus scraper."""
+        return PlainTextResponse(
+            self.prometheus(),
+            media_type="text/plain; version=0.0.4",
+            headers={"Cache-Control": "no-store"},
+        )
@@ -2,48 +2,404 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from starlette.datastructures import MutableHeaders
+from starlette.datastructures import Headers
+
+from sphinx_autobuild.cache import CachedResponse
+from sphinx_autobuild.precompress import CODECS
 
 if TYPE_CHECKING:
+    import asyncio
+
     from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+    from sphinx_autobuild.cache import ResponseCache
+    from sphinx_autobuild.precompress import Codec
+
+_BODY_TAG = b"</body"
+
+#: When the length of a page is known, how far from its end to search
+#: for the closing body tag, in bytes.
+#: Pages with more content after that tag have the script appended.
+SEARCH_WINDOW = 16 * 1024
+
+#: Headers sent with a ``304 Not Modified`` response.
+_NOT_MODIFIED_HEADERS = frozenset({b"cache-control", b"etag", b"last-modified"})
+
 
 def web_socket_script(ws_url: str) -> str:
     # language=HTML
     return f"""
 <script>
 const ws = new WebSocket("ws://{ws_url}/websocket-reload");
-ws.onmessage = () => window.location.reload();
+ws.onmessage = (event) => {{
+  const message = JSON.parse(event.data);
+  if (message.changed === null) {{
+    window.location.reload();
+    return;
+  }}
+  const changed = new Set(message.changed);
+  const urlPath = (url) => {{
+    const path = decodeURIComponent(new URL(url, window.location.href).pathname);
+    return path.endsWith("/") ? `${{path}}index.html` : path;
+  }};
+  const cacheBust = (url) => {{
+    const busted = new URL(url, window.location.href);
+    busted.searchParams.set("autobuild", message.generation);
+    return busted.href;
+  }};
+  // HTML and scripts can't be swapped in place, so reload the page.
+  const scripts = [...document.querySelectorAll("script[src]")].map((s) => s.src);
+  if ([window.location.href, ...scripts].some((url) => changed.has(urlPath(url)))) {{
+    window.location.reload();
+    return;
+  }}
+  // Swap changed stylesheets and images, keeping the scroll position.
+  // Stylesheets imported by another stylesheet can't be matched,
+  // so refresh every stylesheet if one of those changed.
+  const links = [...document.querySelectorAll("link[rel~=stylesheet][href]")];
+  const linked = new Set(links.map((link) => urlPath(link.href)));
+  const imported = message.changed.some((u) => u.endsWith(".css") && !linked.has(u));
+  for (const link of links) {{
+    if (imported || changed.has(urlPath(link.href))) {{
+      link.href = cacheBust(link.href);
+    }}
+  }}
+  for (const image of document.querySelectorAll("img[src]")) {{
+    if (changed.has(urlPath(image.src))) {{
+      image.src = cacheBust(image.src);
+    }}
+  }}
+}};
 </script>
 """
 
 
 class JavascriptInjectorMiddleware:
+    """Insert the reload script into HTML pages as they are streamed.
+
+    The script is inserted before the closing ``</body>`` tag
+    (in lower or upper case), or appended if there is none.
+    Responses compressed with a supported encoding (see
+    :data:`~sphinx_autobuild.precompress.CODECS`) are decompressed
+    and recompressed on the fly; other encodings are sent unmodified.
+    """
+
     def __init__(self, app: ASGIApp, ws_url: str) -> None:
         self.app = app
         self.script = web_socket_script(ws_url).encode("utf-8")
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        add_script = False
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
+        inserter: _ScriptInserter | _RecompressingInserter | None = None
 
         async def send_wrapper(message: Message) -> None:
-            nonlocal add_script
+            nonlocal inserter
             if message["type"] == "http.response.start":
-                headers = MutableHeaders(scope=message)
-                if headers.get("Content-Type", "").startswith("text/html"):
-                    add_script = True
-                    if "Content-Length" in headers:
-                        length = int(headers["Content-Length"]) + len(self.script)
-                        headers["Content-Length"] = str(length)
-                headers["Cache-Control"] = "no-cache"
-            elif message["type"] == "http.response.body":
-                request_complete = not message.get("more_body", False)
-                if add_script and request_complete:
-                    message["body"] += self.script
+                inserter = self._prepare(message, scope)
+            elif message["type"] == "http.response.body" and inserter is not None:
+                # Reuse the message, as most chunks are passed on unchanged.
+                message["body"] = inserter.feed(message.get("body", b""))
+                if not message.get("more_body", False):
+                    message["body"] += inserter.finish()
             await send(message)
 
         await self.app(scope, receive, send_wrapper)
         return
+
+    def _prepare(
+        self, message: Message, scope: Scope
+    ) -> _ScriptInserter | _RecompressingInserter | None:
+        """Set the response headers, and return an inserter for HTML pages."""
+        content_type = encoding = b""
+        length = None
+        for key, value in message["headers"]:
+            if key == b"content-type":
+                content_type = value
+            elif key == b"content-encoding":
+                encoding = value.strip().lower()
+            elif key == b"content-length":
+                length = int(value)
+
+        inserter = None
+        if (
+            content_type.startswith(b"text/html")
+            and message["status"] not in {204, 304}
+            and scope["method"] != "HEAD"
+        ):
+            if encoding in {b"", b"identity"}:
+                inserter = _ScriptInserter(self.script, length=length)
+            elif (codec := CODECS.get(encoding.decode("latin-1"))) is not None:
+                inserter = _RecompressingInserter(_ScriptInserter(self.script), codec)
+
+        # The length of the modified body isn't known in advance,
+        # so it is sent with chunked transfer encoding.
+        removed = (
+            {b"cache-control", b"content-length"} if inserter else {b"cache-control"}
+        )
+        message["headers"] = [
+            *((k, v) for k, v in message["headers"] if k not in removed),
+            (b"cache-control", b"no-cache"),
+        ]
+        return inserter
+
+
+class _ScriptInserter:
+    """Insert *script* before ``</body>``, which may span several chunks.
+
+    If the *length* of the body is known, its last :data:`SEARCH_WINDOW`
+    bytes are held back, and searched once the body is complete.
+    Otherwise, each chunk is searched as it arrives.
+    """
+
+    def __init__(self, script: bytes, *, length: int | None = None) -> None:
+        self.script = script
+        self.inserted = False
+        #: The number of bytes of the body not yet received, if known.
+        self.remaining = length
+        # The end of the body received so far, if it may contain the tag.
+        self.pending = b""
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self.inserted:
+            return chunk
+        if self.remaining is not None:
+            self.remaining -= len(chunk)
+            if self.remaining >= SEARCH_WINDOW:
+                return chunk
+            # Searching the end of the page once, from its end,
+            # is much faster than searching every chunk.
+            held = min(len(chunk), SEARCH_WINDOW - max(self.remaining, 0))
+            self.pending += chunk[len(chunk) - held :]
+            return chunk[: len(chunk) - held]
+        if self.pending:
+            chunk = self.pending + chunk
+            self.pending = b""
+        if (i := _find_body_end(chunk)) != -1:
+            self.inserted = True
+            return _insert(chunk, i, self.script)
+        if n := _partial_tag_length(chunk):
+            self.pending = chunk[-n:]
+            return chunk[:-n]
+        return chunk
+
+    def finish(self) -> bytes:
+        if self.inserted:
+            return b""
+        self.inserted = True
+        if (i := _find_body_end(self.pending)) != -1:
+            return _insert(self.pending, i, self.script)
+        return self.pending + self.script
+
+
+class _RecompressingInserter:
+    """Insert the script into a compressed body."""
+
+    def __init__(self, inserter: _ScriptInserter, codec: Codec) -> None:
+        self.inserter = inserter
+        self.decompress, self.flush_decompressor = codec.decompressor()
+        self.compress, self.flush_compressor = codec.compressor()
+
+    def feed(self, chunk: bytes) -> bytes:
+        return self.compress(self.inserter.feed(self.decompress(chunk)))
+
+    def finish(self) -> bytes:
+        body = self.inserter.feed(self.flush_decompressor()) + self.inserter.finish()
+        return self.compress(body) + self.flush_compressor()
+
+
+def _find_body_end(chunk: bytes) -> int:
+    # bytes.rfind is much faster than a case-insensitive regular expression,
+    # and mixed-case tags are rare; the script is appended to those pages.
+    # Searching from the end finds the tag quickly, as pages end with it.
+    if (i := chunk.rfind(_BODY_TAG)) == -1:
+        i = chunk.rfind(_BODY_TAG.upper())
+    return i
+
+
+def _insert(chunk: bytes, i: int, script: bytes) -> bytes:
+    # One chunk, rather than three, so that servers write it at once.
+    return b"".join((chunk[:i], script, chunk[i:]))
+
+
+def _partial_tag_length(chunk: bytes) -> int:
+    """Return the length of the end of *chunk* that may begin ``</body>``."""
+    start = chunk.rfind(b"<", -len(_BODY_TAG))
+    if start == -1:
+        return 0
+    tail = chunk[start:]
+    if _BODY_TAG.startswith(tail) or _BODY_TAG.upper().startswith(tail):
+        return len(tail)
+    return 0
+
+
+# language=HTML
+PLACEHOLDER_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Building the documentation…</title>
+</head>
+<body>
+<p>Building the documentation…</p>
+<p>This page will reload when the build has finished.</p>
+<script>
+const ws = new WebSocket(`ws://${window.location.host}/websocket-reload`);
+ws.onmessage = () => window.location.reload();
+</script>
+</body>
+</html>
+""".encode()
+
+
+class PlaceholderMiddleware:
+    """Serve a placeholder for missing pages until the initial build finishes.
+
+    The placeholder reloads itself once *ready* is set.
+    It is sent with a ``200 OK`` status,
+    so that health checks succeed while the server is starting.
+    """
+
+    def __init__(self, app: ASGIApp, ready: asyncio.Event) -> None:
+        self.app = app
+        self.ready = ready
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.ready.is_set():
+            await self.app(scope, receive, send)
+            return
+        replaced = False
+
+        page = PLACEHOLDER_PAGE
+        if root_path := scope.get("root_path", ""):
+            # Served under a prefix, as are the project's other routes.
+            ws_path = f"{root_path}/websocket-reload".encode()
+            page = page.replace(b"/websocket-reload", ws_path)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal replaced
+            if message["type"] == "http.response.start" and message["status"] == 404:
+                replaced = True
+                headers = [
+                    (b"content-type", b"text/html; charset=utf-8"),
+                    (b"content-length", str(len(page)).encode("latin-1")),
+                    (b"cache-control", b"no-store"),
+                ]
+                await send({
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": headers,
+                })
+                body = page if scope["method"] != "HEAD" else b""
+                await send({"type": "http.response.body", "body": body})
+            elif not replaced:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class ResponseCacheMiddleware:
+    """Serve repeated requests for unchanged files from memory.
+
+    Successful ``GET`` responses are stored in *cache*,
+    and requests whose ``If-None-Match`` header matches the cached ``ETag``
+    receive a ``304 Not Modified`` response.
+    This must wrap :class:`JavascriptInjectorMiddleware`,
+    so that the cached pages already include the script.
+    """
+
+    def __init__(self, app: ASGIApp, cache: ResponseCache) -> None:
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in {"GET", "HEAD"}:
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        if "range" in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        key = scope["path"], request_headers.get("Accept-Encoding", "")
+        if (entry := self.cache.get(key)) is not None:
+            await _send_cached(entry, scope, request_headers, send)
+            return
+        if scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        await self._fetch(key, scope, receive, send)
+
+    async def _fetch(
+        self, key: tuple[str, str], scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Serve the request from the wrapped application, caching the response."""
+        request_headers = Headers(scope=scope)
+        version = self.cache.version
+        start: Message | None = None
+        chunks: list[bytes] = []
+        buffered = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, buffered
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                length = headers.get("Content-Length")
+                if (
+                    message["status"] == 200
+                    and "no-store" not in headers.get("Cache-Control", "")
+                    and (length is None or int(length) <= self.cache.max_entry_size)
+                ):
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                chunks.append(message.get("body", b""))
+                buffered += len(chunks[-1])
+                more_body = message.get("more_body", False)
+                if buffered > self.cache.max_entry_size:
+                    # Too large to cache, so stream the rest of the response.
+                    await send(start)
+                    body = b"".join(chunks)
+                    await send({
+                        "type": "http.response.body",
+                        "body": body,
+                        "more_body": more_body,
+                    })
+                    start = None
+                    return
+                if more_body:
+                    return
+                entry = CachedResponse(
+                    status=start["status"],
+                    headers=start["headers"],
+                    body=b"".join(chunks),
+                )
+                self.cache.put(key, entry, version=version)
+                await _send_cached(entry, scope, request_headers, send)
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+async def _send_cached(
+    entry: CachedResponse, scope: Scope, request_headers: Headers, send: Send
+) -> None:
+    if _etag_matches(entry.etag, request_headers.get("If-None-Match", "")):
+        headers = [(k, v) for k, v in entry.headers if k in _NOT_MODIFIED_HEADERS]
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    await send({
+        "type": "http.response.start",
+        "status": entry.status,
+        "headers": entry.headers,
+    })
+    body = entry.body if scope["method"] != "HEAD" else b""
+    await send({"type": "http.response.body", "body": body})
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
@@ -0,0 +1,55 @@
+"""Tracking of changes to the built documentation."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from sphinx_autobuild.generations import GENERATIONS_DIR
+from sphinx_autobuild.hashing import ContentIndex
+from sphinx_autobuild.precompress import is_precompressed
+
+#: Directories in the output directory that are never served.
+IGNORED_DIRECTORIES = frozenset({".doctrees", GENERATIONS_DIR})
+
+
+class OutputTracker:
+    """Find the URLs of output files that changed between builds.
+
+    Files are compared by content,
+    so files that a build rewrote with identical contents don't count.
+    """
+
+    def __init__(self, out_dir: str | os.PathLike[str]) -> None:
+        self.out_dir = Path(out_dir).resolve()
+        self.index = ContentIndex()
+        self.primed = False
+
+    def __repr__(self):
+        return f"OutputTracker(out_dir={self.out_dir!r})"
+
+    def prime(self) -> None:
+        """Record the files in the output directory, without hashing them.
+
+        Until :meth:`fill_digests` hashes a file,
+        any change to its modification time or size counts as a change.
+        """
+        self.index.scan([self.out_dir], self._ignore, digests=False)
+        self.primed = True
+
+    def fill_digests(self) -> None:
+        """Record the contents of the files recorded by :meth:`prime`."""
+        self.index.fill_digests()
+
+    def changed_urls(self) -> list[str]:
+        """Return the URL paths of files changed since the last call."""
+        changed = self.index.scan([self.out_dir], self._ignore)
+        return sorted(self.url_for(path) for path in changed)
+
+    def url_for(self, path: str | os.PathLike[str]) -> str:
+        """Return the URL path at which the file at *path* is served."""
+        return "/" + Path(path).relative_to(self.out_dir).as_posix()
+
+    @staticmethod
+    def _ignore(path: str) -> bool:
+        return os.path.basename(path) in IGNORED_DIRECTORIES or is_precompressed(path)
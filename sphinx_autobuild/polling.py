@@ -0,0 +1,162 @@
+"""Detecting changes by polling, where file system events are not delivered.
+
+Network file systems, and directories mounted into containers,
+often do not report changes to the file system watcher.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import stat
+import time
+from typing import TYPE_CHECKING
+
+from watchfiles import Change
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Sequence
+    from pathlib import Path
+
+    from sphinx_autobuild.filter import IgnoreFilter
+
+#: A directory listing is only reused if it was made at least this long
+#: after the directory was last modified, as coarse modification times
+#: may not change for entries added just after the listing.
+_RACY_NS = 2_000_000_000
+
+
+class Polling:
+    """Detect changes by periodically scanning the watched paths.
+
+    Scans are *interval* seconds apart after a change is found,
+    and the interval grows by a factor of *backoff* after each scan
+    that finds nothing, up to *max_interval*.
+    The interval is also kept long enough for scanning to take
+    at most *max_load* of the time, so that large trees do not use
+    a whole core.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        max_interval: float = 10.0,
+        *,
+        backoff: float = 1.5,
+        max_load: float = 0.1,
+    ) -> None:
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.backoff = backoff
+        self.max_load = max_load
+
+    def __repr__(self):
+        return f"Polling(interval={self.interval}, max_interval={self.max_interval})"
+
+    async def watch(
+        self, paths: Sequence[Path], ignore: IgnoreFilter
+    ) -> AsyncIterator[set[tuple[Change, str]]]:
+        """Yield batches of changes to files in *paths* that are not ignored."""
+        scanner = TreeScanner(paths, ignore)
+        await asyncio.to_thread(scanner.scan)
+        interval = self.interval
+        while True:
+            await asyncio.sleep(interval)
+            start = time.perf_counter()
+            changes = await asyncio.to_thread(scanner.scan)
+            duration = time.perf_counter() - start
+            if changes:
+                interval = self.interval
+                yield changes
+            else:
+                interval = min(self.max_interval, interval * self.backoff)
+            interval = max(interval, duration / self.max_load)
+
+
+class TreeScanner:
+    """Find changed files by comparing successive scans of *paths*.
+
+    Directories pruned by the ignore filter are never entered,
+    and directories are only listed again when their modification time
+    changes, which happens when entries are added, removed, or renamed.
+    Files are checked on every scan, as editing a file in place
+    does not change the modification time of its directory.
+    """
+
+    def __init__(self, paths: Sequence[Path], ignore: IgnoreFilter) -> None:
+        self.paths = [os.fspath(path) for path in paths]
+        self.ignore = ignore
+        #: Map of directory to its modification time, the time it was
+        #: listed, and the files and directories it contains.
+        self._directories: dict[str, tuple[int, int, list[str], list[str]]] = {}
+        #: Map of file to its modification time and size.
+        self._files: dict[str, tuple[int, int]] = {}
+
+    def __repr__(self):
+        return f"TreeScanner(paths={self.paths!r}, files={len(self._files)})"
+
+    def scan(self) -> set[tuple[Change, str]]:
+        """Scan the watched paths, returning the changes since the last scan.
+
+        The first scan reports every file as added.
+        """
+        directories = {}
+        files = {}
+        stack = list(self.paths)
+        while stack:
+            directory = stack.pop()
+            try:
+                st = os.stat(directory)
+            except OSError:
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                # A watched file.
+                files[directory] = st.st_mtime_ns, st.st_size
+                continue
+            listing = self._list(directory, st.st_mtime_ns)
+            directories[directory] = listing
+            stack += listing[3]
+            for path in listing[2]:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = st.st_mtime_ns, st.st_size
+
+        changes = {
+            (Change.added if path not in self._files else Change.modified, path)
+            for path, state in files.items()
+            if self._files.get(path) != state
+        }
+        changes.update(
+            (Change.deleted, path) for path in self._files.keys() - files.keys()
+        )
+        self._directories = directories
+        self._files = files
+        return changes
+
+    def _list(
+        self, directory: str, mtime_ns: int
+    ) -> tuple[int, int, list[str], list[str]]:
+        """Return the files and directories in *directory* that are not ignored."""
+        cached = self._directories.get(directory)
+        if cached is not None and cached[0] == mtime_ns < cached[1] - _RACY_NS:
+            return cached
+        listed_at = time.time_ns()
+        filenames = []
+        dirnames = []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if not self.ignore.prunes(entry.path):
+                    dirnames.append(entry.path)
+            elif not self.ignore.is_ignored(entry.path):
+                filenames.append(entry.path)
+        return mtime_ns, listed_at, filenames, dirnames
@@ -0,0 +1,276 @@
+"""Compression of the built documentation, and serving of compressed files.
+
+After each build, changed text files in the output directory
+are compressed into siblings such as ``searchindex.js.gz``.
+A sibling is only served while its modification time matches
+that of the original file, so a sibling left over from a previous build
+is never served in place of a newer file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import mimetypes
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from concurrent.futures import Future
+
+    from starlette.responses import Response
+    from starlette.types import Scope
+
+#: Suffixes of the files worth compressing.
+#: HTML pages are left out, as the reload script is inserted into them
+#: as they are served, which would mean decompressing and recompressing them.
+COMPRESSIBLE_SUFFIXES = frozenset({
+    ".css",
+    ".js",
+    ".json",
+    ".map",
+    ".mjs",
+    ".svg",
+    ".txt",
+    ".xml",
+})
+
+#: Files smaller than this are not compressed, in bytes.
+MIN_SIZE = 1024
+
+
+class Codec(NamedTuple):
+    """A content coding, as named in ``Accept-Encoding``."""
+
+    name: str
+    suffix: str
+    #: Compress a whole file, favouring size over speed.
+    compress: Callable[[bytes], bytes]
+    #: Return the ``process`` and ``finish`` functions of a streaming
+    #: compressor or decompressor, favouring speed over size.
+    compressor: Callable[[], tuple[Callable[[bytes], bytes], Callable[[], bytes]]]
+    decompressor: Callable[[], tuple[Callable[[bytes], bytes], Callable[[], bytes]]]
+
+
+def _zlib_codec(name: str, suffix: str, wbits: int) -> Codec:
+    def compress(data: bytes) -> bytes:
+        compressor = zlib.compressobj(9, wbits=wbits)
+        return compressor.compress(data) + compressor.flush()
+
+    def compressor():
+        c = zlib.compressobj(wbits=wbits)
+        return c.compress, c.flush
+
+    def decompressor():
+        d = zlib.decompressobj(wbits)
+        return d.decompress, d.flush
+
+    return Codec(name, suffix, compress, compressor, decompressor)
+
+
+def _brotli_codec() -> Codec:
+    def compressor():
+        c = brotli.Compressor(quality=5)
+        return c.process, c.finish
+
+    def decompressor():
+        return brotli.Decompressor().process, bytes
+
+    def compress(data):
+        return brotli.compress(data, quality=11)
+
+    return Codec("br", ".br", compress, compressor, decompressor)
+
+
+def _zstd_codec() -> Codec:
+    def compressor():
+        c = zstd.ZstdCompressor()
+        return c.compress, c.flush
+
+    def decompressor():
+        return zstd.ZstdDecompressor().decompress, bytes
+
+    def compress(data):
+        return zstd.compress(data, level=19)
+
+    return Codec("zstd", ".zst", compress, compressor, decompressor)
+
+
+#: Codecs for every supported content coding, by name.
+CODECS = {"gzip": _zlib_codec("gzip", ".gz", 16 + zlib.MAX_WBITS)}
+CODECS["deflate"] = _zlib_codec("deflate", ".zz", zlib.MAX_WBITS)
+if brotli is not None:
+    CODECS["br"] = _brotli_codec()
+if zstd is not None:
+    CODECS["zstd"] = _zstd_codec()
+
+#: The codecs used to precompress files, from most to least preferred.
+PRECOMPRESSED = tuple(CODECS[name] for name in ("br", "zstd", "gzip") if name in CODECS)
+
+#: Suffixes of precompressed siblings.
+PRECOMPRESSED_SUFFIXES = frozenset(codec.suffix for codec in PRECOMPRESSED)
+
+
+class Precompressor:
+    """Write compressed siblings of changed files, in a pool of threads.
+
+    The compression functions release the GIL,
+    so threads compress several files in parallel.
+    """
+
+    def __init__(
+        self,
+        *,
+        codecs: Iterable[Codec] = PRECOMPRESSED,
+        min_size: int = MIN_SIZE,
+        max_workers: int | None = None,
+    ) -> None:
+        self.codecs = tuple(codecs)
+        self.min_size = min_size
+        self.max_workers = max_workers
+        self.files_compressed = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    def __repr__(self):
+        names = [codec.name for codec in self.codecs]
+        return f"Precompressor(codecs={names!r})"
+
+    def submit(self, paths: Iterable[os.PathLike[str]]) -> list[Future[None]]:
+        """Compress the files at *paths* in the background."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="precompress"
+            )
+        return [
+            self._executor.submit(self.compress, path)
+            for path in paths
+            if Path(path).suffix in COMPRESSIBLE_SUFFIXES
+        ]
+
+    def submit_tree(
+        self, directory: os.PathLike[str], *, skip: Iterable[str] = ()
+    ) -> list[Future[None]]:
+        """Compress every file below *directory* in the background.
+
+        Directories named in *skip* are not searched.
+        """
+        skip = frozenset(skip)
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if name not in skip]
+            paths += (Path(dirpath, name) for name in filenames)
+        return self.submit(paths)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def compress(self, path: os.PathLike[str]) -> None:
+        """Write the compressed siblings of *path*, or remove stale siblings."""
+        try:
+            st = os.stat(path)
+            data = Path(path).read_bytes() if st.st_size >= self.min_size else None
+        except FileNotFoundError:
+            data = None
+        for codec in self.codecs:
+            sibling = f"{os.fspath(path)}{codec.suffix}"
+            if data is None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(sibling)
+                continue
+            compressed = codec.compress(data)
+            tmp = f"{sibling}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(compressed)
+            # Record which version of the file the sibling belongs to.
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp, sibling)
+        if data is not None:
+            self.files_compressed += 1
+
+
+def is_precompressed(path: str | os.PathLike[str]) -> bool:
+    """Whether *path* is a compressed sibling, or is being written as one."""
+    path = Path(path)
+    if path.suffix == ".tmp":
+        path = path.with_suffix("")
+    return (
+        path.suffix in PRECOMPRESSED_SUFFIXES
+        and Path(path.stem).suffix in COMPRESSIBLE_SUFFIXES
+    )
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Serve precompressed siblings to clients that accept them."""
+
+    codecs = PRECOMPRESSED
+
+    def file_response(
+        self,
+        full_path: os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        if Path(full_path).suffix not in COMPRESSIBLE_SUFFIXES:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        request_headers = Headers(scope=scope)
+        accepted = _accepted_encodings(request_headers.get("Accept-Encoding", ""))
+        for codec in self.codecs:
+            if codec.name not in accepted:
+                continue
+            sibling = f"{os.fspath(full_path)}{codec.suffix}"
+            try:
+                sibling_stat = os.stat(sibling)
+            except OSError:
+                continue
+            if sibling_stat.st_mtime_ns != stat_result.st_mtime_ns:
+                continue
+            media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+            response = FileResponse(
+                sibling,
+                status_code=status_code,
+                stat_result=sibling_stat,
+                media_type=media_type,
+            )
+            response.headers["Content-Encoding"] = codec.name
+            break
+        else:
+            response = FileResponse(
+                full_path, status_code=status_code, stat_result=stat_result
+            )
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    """Return the content codings accepted by an ``Accept-Encoding`` header."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        q = params.strip().removeprefix("q=")
+        with contextlib.suppress(ValueError):
+            if q and float(q) == 0:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
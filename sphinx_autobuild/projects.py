@@ -0,0 +1,181 @@
+"""Serving several Sphinx projects from a single process.
+
+The projects are listed in a TOML file, with one ``[[project]]`` table
+per project::
+
+    [[project]]
+    name = "guide"
+    prefix = "/guide"
+    args = ["docs/guide", "build/guide", "--fast-path"]
+
+``args`` are the arguments that would be passed to ``sphinx-autobuild``
+to serve the project on its own.
+``prefix`` is the URL path under which the project is served,
+and defaults to ``/`` followed by the project's name.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import html
+import tomllib
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import TYPE_CHECKING
+
+from starlette.responses import HTMLResponse
+
+from sphinx_autobuild.server import watch_changes
+
+if TYPE_CHECKING:
+    import os
+    from collections.abc import Sequence
+    from typing import Any
+
+    from starlette.requests import Request
+
+    from sphinx_autobuild.polling import Polling
+    from sphinx_autobuild.server import RebuildServer
+
+
+class ProjectConfigError(ValueError):
+    """The projects file is invalid."""
+
+
+class Project:
+    """A Sphinx project, as listed in the projects file."""
+
+    def __init__(self, name: str, prefix: str, args: Sequence[str]) -> None:
+        self.name = name
+        self.prefix = prefix
+        self.args = list(args)
+
+    def __repr__(self):
+        return f"Project(name={self.name!r}, prefix={self.prefix!r})"
+
+
+def load_projects(path: str | os.PathLike[str]) -> list[Project]:
+    """Read the projects listed in the TOML file at *path*."""
+    try:
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        msg = f"Cannot read the projects file {path}: {e}"
+        raise ProjectConfigError(msg) from None
+
+    tables = config.get("project", [])
+    if not isinstance(tables, list) or not tables:
+        msg = f"{path}: expected at least one [[project]] table"
+        raise ProjectConfigError(msg)
+    projects = [_project(path, i, table) for i, table in enumerate(tables, start=1)]
+    for project in projects:
+        for other in projects:
+            if other is not project and (
+                other.prefix == project.prefix
+                or other.prefix.startswith(f"{project.prefix}/")
+            ):
+                msg = f"{path}: the prefix {other.prefix!r} overlaps another project's"
+                raise ProjectConfigError(msg)
+    return projects
+
+
+def _project(path: str | os.PathLike[str], number: int, table: Any) -> Project:
+    """Create a project from a ``[[project]]`` table."""
+    name = table.get("name")
+    args = table.get("args")
+    if not isinstance(name, str) or not name:
+        msg = f"{path}: project {number} has no name"
+        raise ProjectConfigError(msg)
+    if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+        msg = f"{path}: project {name!r} needs args, a list of strings"
+        raise ProjectConfigError(msg)
+    prefix = table.get("prefix", f"/{name}")
+    if not isinstance(prefix, str) or not prefix.startswith("/"):
+        msg = f"{path}: the prefix of project {name!r} must start with '/'"
+        raise ProjectConfigError(msg)
+    if not (prefix := prefix.rstrip("/")):
+        msg = f"{path}: project {name!r} cannot be served at '/'"
+        raise ProjectConfigError(msg)
+    return Project(name, prefix, args)
+
+
+class ProjectGroup:
+    """Watch the files of several :class:`RebuildServer` instances at once.
+
+    Each server keeps its own build scheduler and reload channel,
+    but changes are detected by a single watcher,
+    and passed to the servers whose watched paths contain them.
+    """
+
+    def __init__(
+        self,
+        servers: Sequence[RebuildServer],
+        projects: Sequence[Project],
+        *,
+        polling: Polling | None = None,
+    ) -> None:
+        self.servers = list(servers)
+        self.projects = list(projects)
+        self.paths = list(dict.fromkeys(p for s in self.servers for p in s.paths))
+        self.ignore = _SharedIgnore(self.servers)
+        self.polling = polling
+
+    def __repr__(self):
+        return f"ProjectGroup(projects={self.projects!r})"
+
+    @asynccontextmanager
+    async def lifespan(self, app) -> AbstractAsyncContextManager[None]:
+        async with contextlib.AsyncExitStack() as stack:
+            for server in self.servers:
+                await stack.enter_async_context(server.lifespan(app))
+            task = asyncio.create_task(self.watch())
+            try:
+                yield
+            finally:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+    async def watch(self) -> None:
+        async for changes in watch_changes(
+            self.paths, self.ignore, polling=self.polling
+        ):
+            await self.dispatch(changes)
+
+    async def dispatch(self, changes: set[tuple[object, str]]) -> None:
+        """Pass each change to the servers that watch the changed path."""
+        for server in self.servers:
+            owned = {
+                (change, path)
+                for change, path in changes
+                if server.owns(path) and not server.ignore(path)
+            }
+            if owned:
+                await server.handle_changes(owned)
+
+    async def index(self, _request: Request) -> HTMLResponse:
+        """List the projects, with links to each."""
+        items = "".join(
+            f'<li><a href="{html.escape(p.prefix)}/">{html.escape(p.name)}</a></li>'
+            for p in self.projects
+        )
+        return HTMLResponse(
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            f"<title>Projects</title></head><body><ul>{items}</ul></body></html>"
+        )
+
+
+class _SharedIgnore:
+    """Ignore paths that are ignored by every server watching them."""
+
+    def __init__(self, servers: Sequence[RebuildServer]) -> None:
+        self.servers = servers
+
+    def __call__(self, path: str) -> bool:
+        return all(s.ignore(path) for s in self.servers if s.owns(path))
+
+    def is_ignored(self, path: str) -> bool:
+        return all(s.ignore.is_ignored(path) for s in self.servers if s.owns(path))
+
+    def prunes(self, path: str) -> bool:
+        return all(s.ignore.prunes(path) for s in self.servers if s.owns(path))
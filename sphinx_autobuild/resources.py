@@ -0,0 +1,129 @@
+"""Bounding and reporting the memory used by the server and by builds."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from sphinx_autobuild.worker import SphinxWorker
+
+MIB = 1024 * 1024
+
+
+def rss(pid: int | None = None) -> int | None:
+    """Return the resident set size of process *pid*, in bytes.
+
+    If *pid* is not given, return that of this process.
+    Returns ``None`` if it cannot be determined (other than on Linux).
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def peak_child_rss() -> int | None:
+    """Return the largest resident set size of any finished child process."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Reported in bytes on macOS, and in kibibytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BuildLimits:
+    """Resource limits applied to each build process with ``setrlimit``.
+
+    *memory* limits the address space of the process, in bytes,
+    so that a leaking build fails rather than exhausting the machine's memory.
+
+    The limits are applied by the build process itself, as ``preexec_fn``
+    is unsafe in a server with several threads.
+    """
+
+    def __init__(self, *, memory: int | None = None) -> None:
+        self.memory = memory
+
+    def __repr__(self):
+        return f"BuildLimits(memory={self.memory})"
+
+    def apply(self) -> None:
+        """Limit the current process; called in the build process."""
+        try:
+            import resource
+        except ImportError:
+            return
+        if self.memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory, self.memory))
+
+    def wrap(self, args: Sequence[str]) -> list[str]:
+        """Return interpreter arguments that run ``-m MODULE ...`` *args* limited.
+
+        The module is run by this one,
+        which applies the limits in the new interpreter first.
+        """
+        options = []
+        if self.memory is not None:
+            options.append(f"--memory={self.memory}")
+        return ["-m", "sphinx_autobuild.resources", *options, "--", *args]
+
+
+class MemoryReporter:
+    """Periodically report the memory used by the server and by builds."""
+
+    def __init__(self, interval: float, *, worker: SphinxWorker | None = None) -> None:
+        self.interval = interval
+        self.worker = worker
+
+    def __repr__(self):
+        return f"MemoryReporter(interval={self.interval})"
+
+    def report(self) -> str:
+        parts = []
+        if (server := rss()) is not None:
+            parts.append(f"server {server / MIB:.0f} MiB")
+        pid = self.worker.pid if self.worker is not None else None
+        if pid is not None and (worker := rss(pid)) is not None:
+            parts.append(f"Sphinx worker {worker / MIB:.0f} MiB")
+        if peak := peak_child_rss():
+            parts.append(f"largest build process {peak / MIB:.0f} MiB")
+        return "Memory use: " + (", ".join(parts) or "unknown")
+
+    async def run(self) -> None:
+        from sphinx_autobuild.utils import show_message
+
+        while True:
+            await asyncio.sleep(self.interval)
+            show_message(await asyncio.to_thread(self.report))
+
+
+def _main(argv: Sequence[str]) -> None:
+    """Apply the limits in *argv*, then run the module that follows them.
+
+    *argv* is as returned by :meth:`BuildLimits.wrap`.
+    """
+    import runpy
+
+    separator = argv.index("--")
+    options = dict(arg.removeprefix("--").split("=") for arg in argv[:separator])
+    limits = BuildLimits(
+        memory=int(options["memory"]) if "memory" in options else None,
+    )
+    limits.apply()
+    _, module, *args = argv[separator + 1 :]
+    sys.argv = [module, *args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
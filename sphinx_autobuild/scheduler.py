@@ -0,0 +1,133 @@
+"""Scheduling of rebuilds in response to changes."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from sphinx_autobuild.build import BuildCancelledError
+from sphinx_autobuild.utils import show_message
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Iterable, Sequence
+    from pathlib import Path
+
+    from sphinx_autobuild.build import BuildResult
+
+
+class BuildScheduler:
+    """Run at most one build at a time, merging changes that arrive meanwhile.
+
+    Batches of changes passed to :meth:`submit` are collected into a single
+    pending rebuild, which starts once the current build (if any) finishes
+    and no further changes have arrived for *debounce* seconds.
+    Targeted builds of only the changed documents are followed by
+    a full build, unless newer changes arrive first.
+    If *cancel* is given, it is called to abort a running build
+    as soon as newer changes arrive.
+    """
+
+    def __init__(
+        self,
+        run_build: Callable[[Sequence[Path]], Awaitable[BuildResult | None]],
+        *,
+        on_complete: Callable[[], Awaitable[None]],
+        debounce: float = 0.0,
+        cancel: Callable[[], None] | None = None,
+    ) -> None:
+        self.run_build = run_build
+        self.on_complete = on_complete
+        self.debounce = debounce
+        self.cancel = cancel
+        self.pending: dict[Path, None] = {}
+        self.pending_batches = 0
+        self.building = False
+        self.batches_merged = 0
+        self.builds_cancelled = 0
+        self.builds_completed = 0
+        #: How long the changes for the latest build waited for it to start.
+        self.queue_wait = 0.0
+        self._pending_since: float | None = None
+        self._wakeup = asyncio.Event()
+
+    def __repr__(self):
+        return (
+            f"BuildScheduler(batches_merged={self.batches_merged}, "
+            f"builds_cancelled={self.builds_cancelled}, "
+            f"builds_completed={self.builds_completed})"
+        )
+
+    def submit(self, changed_paths: Iterable[Path]) -> None:
+        """Request a rebuild for *changed_paths*."""
+        if self.pending_batches:
+            self.batches_merged += 1
+        self.pending_batches += 1
+        self.pending.update(dict.fromkeys(changed_paths))
+        self._mark_pending()
+        if self.building and self.cancel is not None:
+            show_message("Newer changes detected, cancelling the running build")
+            self.cancel()
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Process rebuild requests until cancelled."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.debounce > 0:
+                await self._wait_until_quiet()
+            if not self.pending_batches:
+                continue
+
+            changed_paths = list(self.pending)
+            if self.pending_batches > 1:
+                show_message(
+                    f"Merged {self.pending_batches} batches of changes into one build"
+                )
+            self.pending.clear()
+            self.pending_batches = 0
+            self.queue_wait = time.perf_counter() - self._pending_since
+            self._pending_since = None
+
+            self.building = True
+            try:
+                result = await self.run_build(changed_paths)
+            except BuildCancelledError:
+                self.builds_cancelled += 1
+                # Carry the cancelled changes over to the next build.
+                self.pending = dict.fromkeys(changed_paths) | self.pending
+                self.pending_batches = max(self.pending_batches, 1)
+                self._mark_pending()
+                self._wakeup.set()
+                continue
+            finally:
+                self.building = False
+            self.builds_completed += 1
+            await self.on_complete()
+            if result is not None and result.targeted and result.returncode == 0:
+                self._request_full_build()
+
+    def _request_full_build(self) -> None:
+        # An empty set of changed paths asks for a full build.
+        # If other changes are already pending, that build will
+        # request a full build of its own once it finishes.
+        if not self.pending_batches:
+            show_message("Scheduling a full build to update the remaining pages")
+            self.pending_batches = 1
+            self._mark_pending()
+            self._wakeup.set()
+
+    def _mark_pending(self) -> None:
+        if self._pending_since is None:
+            self._pending_since = time.perf_counter()
+
+    async def _wait_until_quiet(self) -> None:
+        # Restart the timer whenever another batch of changes arrives.
+        while True:
+            try:
+                async with asyncio.timeout(self.debounce):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                return
+            self._wakeup.clear()
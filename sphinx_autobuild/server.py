@@ -1,21 +1,55 @@
 from __future__ import annotations
 
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
-from contextlib import AbstractAsyncContextManager, asynccontextmanager
+import os
+import time
+from contextlib import (
+    AbstractAsyncContextManager,
+    asynccontextmanager,
+    nullcontext,
+    suppress,
+)
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import watchfiles
 from starlette.websockets import WebSocket
 
+from sphinx_autobuild.build import BuildCancelledError
+from sphinx_autobuild.executor import create_executor
+from sphinx_autobuild.hub import ReloadHub
+from sphinx_autobuild.metrics import BuildRecord
+from sphinx_autobuild.output import IGNORED_DIRECTORIES, OutputTracker
+from sphinx_autobuild.scheduler import BuildScheduler
+from sphinx_autobuild.utils import show_message
+
 if TYPE_CHECKING:
-    import os
-    from collections.abc import Callable, Sequence
+    from collections.abc import AsyncIterator, Callable, Coroutine, Sequence
+    from concurrent.futures import Executor
+    from typing import Any
 
     from starlette.types import Receive, Scope, Send
 
+    from sphinx_autobuild.build import BuildResult
+    from sphinx_autobuild.cache import ResponseCache
+    from sphinx_autobuild.executor import ExecutorFactory
     from sphinx_autobuild.filter import IgnoreFilter
+    from sphinx_autobuild.generations import OutputGenerations
+    from sphinx_autobuild.hashing import ContentIndex
+    from sphinx_autobuild.hub import Subscription
+    from sphinx_autobuild.metrics import BuildMetrics
+    from sphinx_autobuild.polling import Polling
+    from sphinx_autobuild.precompress import Precompressor
+    from sphinx_autobuild.resources import MemoryReporter
+    from sphinx_autobuild.snapshot import SourceSnapshot
+
+#: Beyond this many changed files, clients are told to reload unconditionally,
+#: rather than sending them a long list of URLs.
+MAX_CHANGED_URLS = 1000
+
+#: How long to wait for the changes buffered by a watcher that is replaced,
+#: in seconds: longer than the debounce period of :func:`watchfiles.awatch`.
+DRAIN_TIMEOUT = 2.0
 
 
 class RebuildServer:
@@ -23,62 +57,513 @@ class RebuildServer:
         self,
         paths: list[os.PathLike[str]],
         ignore_filter: IgnoreFilter,
-        change_callback: Callable[[Sequence[Path]], None],
+        change_callback: Callable[[Sequence[Path]], BuildResult | None],
+        *,
+        executor: str | ExecutorFactory = "thread",
+        debounce: float = 0.0,
+        cancel_superseded: bool = False,
+        content_index: ContentIndex | None = None,
+        out_dir: os.PathLike[str] | None = None,
+        response_cache: ResponseCache | None = None,
+        precompressor: Precompressor | None = None,
+        initial_build: bool = False,
+        metrics: BuildMetrics | None = None,
+        url_prefix: str = "",
+        shared_watcher: bool = False,
+        build_limit: asyncio.Semaphore | None = None,
+        memory_reporter: MemoryReporter | None = None,
+        snapshot: SourceSnapshot | None = None,
+        polling: Polling | None = None,
+        generations: OutputGenerations | None = None,
     ) -> None:
         self.paths = [Path(path).resolve(strict=True) for path in paths]
         self.ignore = ignore_filter
         self.change_callback = change_callback
-        self.flag = asyncio.Event()
+        self.executor_factory = executor
+        self.executor: Executor | None = None
+        self.content_index = content_index
+        self.output = OutputTracker(out_dir) if out_dir is not None else None
+        self.response_cache = response_cache
+        self.precompressor = precompressor if self.output is not None else None
+        self._background: set[asyncio.Task[None]] = set()
+        self.metrics = metrics
+        #: The record of the build whose clients are yet to be notified.
+        self._record: BuildRecord | None = None
+        #: The URL path at which the output directory is served.
+        self.url_prefix = url_prefix
+        #: If set, changes are passed to :meth:`handle_changes`
+        #: by a :class:`~sphinx_autobuild.projects.ProjectGroup`,
+        #: rather than watched by this server.
+        self.shared_watcher = shared_watcher
+        #: Limits the number of builds that run at once, across servers.
+        self.build_limit = build_limit
+        #: Periodically reports memory use, while the server runs.
+        self.memory_reporter = memory_reporter
+        #: If set, saved after each successful build, and used on startup
+        #: to build only what changed since.
+        self.snapshot = snapshot
+        #: If set, changes are detected by polling, rather than by events.
+        self.polling = polling
+        #: If set, the existing output is published on startup,
+        #: to be served until the first successful build.
+        self.generations = generations
+        self._notified_generation = None
+        self.hub = ReloadHub()
         self.should_exit = asyncio.Event()
+        self.initial_build = initial_build
+        #: Set once the initial build has finished, if there is one.
+        self.ready = asyncio.Event()
+        cancel = getattr(change_callback, "cancel", None)
+        self.scheduler = BuildScheduler(
+            self.rebuild,
+            on_complete=self.notify,
+            debounce=debounce,
+            cancel=cancel if cancel_superseded else None,
+        )
 
     @asynccontextmanager
     async def lifespan(self, _app) -> AbstractAsyncContextManager[None]:
+        self.executor = create_executor(self.executor_factory)
         task = asyncio.create_task(self.main())
-        yield
-        self.should_exit.set()
-        await task
+        try:
+            yield
+        finally:
+            self.should_exit.set()
+            await task
+            await asyncio.to_thread(self.executor.shutdown, cancel_futures=True)
+            self.executor = None
+            if self.precompressor is not None:
+                await asyncio.to_thread(self.precompressor.shutdown)
+            if self.content_index is not None:
+                await asyncio.to_thread(self.content_index.save)
         return
 
     async def main(self) -> None:
-        tasks = (
-            asyncio.create_task(self.watch()),
+        background = [asyncio.create_task(self.index_contents())]
+        if self.precompressor is not None:
+            background.append(asyncio.create_task(self.precompress_output()))
+        if self.memory_reporter is not None:
+            background.append(asyncio.create_task(self.memory_reporter.run()))
+        if self.generations is not None:
+            # Serve the existing output until the first successful build.
+            # Copying it may take a while, so this is done while the server
+            # answers, but before any build writes to the output.
+            await asyncio.to_thread(self.generations.publish)
+            self._notified_generation = self.generations.current
+        if self.initial_build:
+            await self.start_initial_build()
+        else:
+            self.ready.set()
+        tasks = [
+            asyncio.create_task(self.scheduler.run()),
             asyncio.create_task(self.should_exit.wait()),
-        )
+        ]
+        if not self.shared_watcher:
+            tasks.append(asyncio.create_task(self.watch()))
         done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-        [task.cancel() for task in pending]
+        [task.cancel() for task in (*pending, *background, *self._background)]
         [task.result() for task in done]
 
+    async def start_initial_build(self) -> None:
+        changed = await asyncio.to_thread(self._changes_since_snapshot)
+        if changed is None:
+            show_message("Starting initial build")
+            # An empty set of changed paths asks for a full build.
+            # Changes detected meanwhile are merged into a follow-up build.
+            self.scheduler.submit(())
+        elif changed:
+            show_message(f"Building {len(changed)} change(s) since the last build")
+            self.scheduler.submit(changed)
+        else:
+            show_message("No changes since the last build")
+            self.ready.set()
+
+    def _changes_since_snapshot(self) -> list[Path] | None:
+        """Return the changes since the last build, or ``None`` if unknown."""
+        if self.snapshot is None:
+            return None
+        out_dir = self.output.out_dir if self.output is not None else None
+        if out_dir is not None and not (out_dir.is_dir() and any(out_dir.iterdir())):
+            # The output was deleted, so everything must be built again.
+            return None
+        return self.snapshot.changes()
+
     async def watch(self) -> None:
-        async for changes in watchfiles.awatch(
-            *self.paths,
-            watch_filter=lambda _, path: not self.ignore(path),
+        async for changes in watch_changes(
+            self.paths, self.ignore, polling=self.polling
         ):
-            changed_paths = [Path(path).resolve() for (_, path) in changes]
-            with ProcessPoolExecutor() as pool:
-                fut = pool.submit(self.change_callback, changed_paths=changed_paths)
-                await asyncio.wrap_future(fut)
-            self.flag.set()
+            await self.handle_changes(changes)
+
+    async def handle_changes(self, changes: set[tuple[watchfiles.Change, str]]) -> None:
+        """Request a rebuild for the changes reported by the watcher."""
+        changed_paths = await asyncio.to_thread(self._changed_paths, changes)
+        if changed_paths:
+            self.scheduler.submit(changed_paths)
+
+    def owns(self, path: str) -> bool:
+        """Whether *path* is within one of the watched paths."""
+        return any(Path(path).is_relative_to(root) for root in self.paths)
+
+    def _changed_paths(self, changes: set[tuple[watchfiles.Change, str]]) -> list[Path]:
+        changed_paths = [Path(path).resolve() for (_, path) in changes]
+        if self.content_index is None:
+            return changed_paths
+        if really_changed := self.content_index.filter_changed(changed_paths):
+            return really_changed
+        show_message("Detected changes, but file contents are unchanged")
+        return []
+
+    async def index_contents(self) -> None:
+        """Build the initial content index in the background."""
+        if self.content_index is not None:
+            await asyncio.to_thread(
+                self.content_index.scan, self.paths, self.ignore.is_ignored
+            )
+            await asyncio.to_thread(self.content_index.save)
+
+    async def precompress_output(self) -> None:
+        """Compress the existing output in the background."""
+        futures = await asyncio.to_thread(
+            self.precompressor.submit_tree,
+            self.output.out_dir,
+            skip=IGNORED_DIRECTORIES,
+        )
+        await asyncio.gather(*map(asyncio.wrap_future, futures))
+
+    async def rebuild(self, changed_paths: Sequence[Path]) -> BuildResult | None:
+        """Run the change callback on the server's executor."""
+        if self.output is not None and not self.output.primed:
+            await asyncio.to_thread(self.output.prime)
+            # Hashing the existing output may take a while,
+            # so it is done while the first build runs.
+            self._run_in_background(asyncio.to_thread(self.output.fill_digests))
+        waiting = time.perf_counter()
+        async with self.build_limit or nullcontext():
+            queue_wait = self.scheduler.queue_wait + time.perf_counter() - waiting
+            if self.response_cache is not None:
+                self.response_cache.pause()
+            return await self._run_callback(changed_paths, queue_wait)
+
+    async def _run_callback(
+        self, changed_paths: Sequence[Path], queue_wait: float
+    ) -> BuildResult | None:
+        record = None
+        if self.metrics is not None:
+            record = BuildRecord(changed_paths, queue_wait=queue_wait)
+        state = None
+        if self.snapshot is not None:
+            state = await asyncio.to_thread(self.snapshot.capture, changed_paths)
+        fut = self.executor.submit(self.change_callback, changed_paths=changed_paths)
+        try:
+            result = await asyncio.wrap_future(fut)
+        except BuildCancelledError:
+            if record is not None:
+                record.finish(status="cancelled")
+                await asyncio.to_thread(self.metrics.add, record)
+            raise
+        if record is not None:
+            record.set_result(result)
+            self._record = record
+        if state is not None and _complete(result):
+            await asyncio.to_thread(self.snapshot.commit, state)
+        return result
+
+    async def notify(self) -> None:
+        """Tell connected clients that a build has completed.
+
+        If the output directory is known, the message lists the URLs
+        of the files that changed, so that clients can skip reloading
+        pages that are unaffected.
+        The message type is ``css`` if only stylesheets changed,
+        ``asset`` if no HTML pages changed, and ``page`` otherwise.
+        Cached responses for the changed files are discarded first.
+        """
+        changed = None
+        if self.output is not None:
+            if self._output_published():
+                changed = await asyncio.to_thread(self.output.changed_urls)
+            else:
+                # Files changed by a build that was not published
+                # are reported once a later build publishes them.
+                changed = []
+        if self.response_cache is not None:
+            if changed is None:
+                self.response_cache.clear()
+            else:
+                self.response_cache.invalidate(self._prefixed(changed))
+            self.response_cache.resume()
+
+        message = {"type": "page", "changed": None}
+        if changed is not None and len(changed) <= MAX_CHANGED_URLS:
+            message = {
+                "type": _message_type(changed),
+                "changed": self._prefixed(changed),
+            }
+        clients_notified = self.hub.publish(message)
+        self.ready.set()
+        if (record := self._record) is not None:
+            self._record = None
+            record.finish(clients_notified=clients_notified)
+            await asyncio.to_thread(self.metrics.add, record)
+
+        if self.precompressor is not None and changed:
+            # Compress after notifying clients, without waiting.
+            self._run_in_background(self.precompress(changed))
+
+    def _run_in_background(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _output_published(self) -> bool:
+        """Whether the output was published since clients were last notified.
+
+        Without :attr:`generations`, the output directory is served directly,
+        so this is always true.
+        """
+        if self.generations is None:
+            return True
+        current = self.generations.current
+        published = current is not self._notified_generation
+        self._notified_generation = current
+        return published
+
+    async def precompress(self, changed_urls: Sequence[str]) -> None:
+        """Compress the changed output files.
+
+        Cached responses for those files are then discarded,
+        so that the compressed files are served from now on.
+        """
+        out_dir = self.output.out_dir
+        paths = [out_dir / url.lstrip("/") for url in changed_urls]
+        futures = self.precompressor.submit(paths)
+        await asyncio.gather(*map(asyncio.wrap_future, futures))
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self._prefixed(changed_urls))
+
+    def _prefixed(self, urls: Sequence[str]) -> list[str]:
+        """Return the URLs of output files as served, under :attr:`url_prefix`."""
+        return [self.url_prefix + url for url in urls]
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         assert scope["type"] == "websocket"
         ws = WebSocket(scope, receive, send)
         await ws.accept()
 
+        subscription = self.hub.subscribe()
         tasks = (
-            asyncio.create_task(self.watch_reloads(ws)),
+            asyncio.create_task(self.watch_reloads(ws, subscription)),
             asyncio.create_task(self.wait_client_disconnect(ws)),
         )
-        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            self.hub.unsubscribe(subscription)
         [task.cancel() for task in pending]
         [task.result() for task in done]
 
-    async def watch_reloads(self, ws: WebSocket) -> None:
-        while True:
-            await self.flag.wait()
-            self.flag.clear()
-            await ws.send_text("refresh")
+    async def watch_reloads(self, ws: WebSocket, subscription: Subscription) -> None:
+        while (message := await subscription.get()) is not None:
+            try:
+                async with asyncio.timeout(self.hub.send_timeout):
+                    await ws.send_text(message)
+            except TimeoutError:
+                self.hub.drop(subscription)
+                return
 
     @staticmethod
     async def wait_client_disconnect(ws: WebSocket) -> None:
         async for _ in ws.iter_text():
             pass
+
+
+def watch_changes(
+    paths: Sequence[Path], ignore: IgnoreFilter, *, polling: Polling | None = None
+) -> AsyncIterator[set[tuple[watchfiles.Change, str]]]:
+    """Yield batches of changes to files in *paths* that are not ignored.
+
+    Changes are detected by file system events, or with *polling* if given.
+    """
+    if polling is not None:
+        return polling.watch(paths, ignore)
+    return _watch_events(paths, ignore)
+
+
+async def _watch_events(
+    paths: Sequence[Path], ignore: IgnoreFilter
+) -> AsyncIterator[set[tuple[watchfiles.Change, str]]]:
+    new_directories = []
+    # The watcher being replaced, once new directories are found.
+    replaced = None
+    draining: set[asyncio.Task[set[tuple[watchfiles.Change, str]]]] = set()
+    try:
+        while True:
+            directories, recursive = await asyncio.to_thread(
+                _watched_directories, paths, ignore
+            )
+            watcher = _Watcher(directories, ignore, recursive=recursive)
+            try:
+                if replaced is not None:
+                    # Let the watcher register the new directories first.
+                    # Changes made until then are buffered by the previous
+                    # watcher, which is closed once they are reported.
+                    await asyncio.sleep(0)
+                    draining.add(asyncio.create_task(replaced.drain()))
+                    replaced = None
+                    # Report the files created in the new directories
+                    # before they were watched.
+                    if added := await asyncio.to_thread(
+                        _files_below, new_directories, ignore
+                    ):
+                        yield added
+                while (changes := await watcher.wait(draining)) is not None:
+                    if changes:
+                        yield changes
+                    if not recursive and (new_directories := _new_directories(changes)):
+                        # Start watching the new directories.
+                        replaced = watcher
+                        break
+                else:
+                    return
+            finally:
+                if replaced is not watcher:
+                    await watcher.close()
+    finally:
+        for task in draining:
+            task.cancel()
+        await asyncio.gather(*draining, return_exceptions=True)
+        if replaced is not None:
+            await replaced.close()
+
+
+class _Watcher:
+    """Changes reported by :func:`watchfiles.awatch`, until it is stopped."""
+
+    def __init__(
+        self, directories: Sequence[Path], ignore: IgnoreFilter, *, recursive: bool
+    ) -> None:
+        self.stop = asyncio.Event()
+        self.changes = watchfiles.awatch(
+            *directories,
+            watch_filter=lambda _, path: not ignore(path),
+            recursive=recursive,
+            stop_event=self.stop,
+        )
+        self.next_changes = asyncio.ensure_future(anext(self.changes))
+
+    async def wait(
+        self, draining: set[asyncio.Task[set[tuple[watchfiles.Change, str]]]]
+    ) -> set[tuple[watchfiles.Change, str]] | None:
+        """Wait for changes, from this watcher or from the watchers it replaced.
+
+        Returns ``None`` once this watcher has stopped.
+        """
+        done, _ = await asyncio.wait(
+            {self.next_changes, *draining}, return_when=asyncio.FIRST_COMPLETED
+        )
+        changes = set()
+        for task in done & draining:
+            changes |= task.result()
+        draining.difference_update(done)
+        if self.next_changes in done:
+            try:
+                changes |= self.next_changes.result()
+            except StopAsyncIteration:
+                return None
+            self.next_changes = asyncio.ensure_future(anext(self.changes))
+        return changes
+
+    async def drain(self) -> set[tuple[watchfiles.Change, str]]:
+        """Return the changes buffered by this watcher, then close it.
+
+        The next batch holds every change buffered when it was requested,
+        and is reported within the debounce period of :func:`watchfiles.awatch`,
+        so the watcher is stopped if nothing is reported by then.
+        """
+        timer = asyncio.get_running_loop().call_later(DRAIN_TIMEOUT, self.stop.set)
+        try:
+            return await self.next_changes
+        except StopAsyncIteration:
+            return set()
+        finally:
+            timer.cancel()
+            await self.close()
+
+    async def close(self) -> None:
+        self.stop.set()
+        if self.next_changes.cancel():
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await self.next_changes
+        await self.changes.aclose()
+
+
+def _complete(result: BuildResult | None) -> bool:
+    """Whether a build succeeded and brought the whole output up to date."""
+    return result is None or (result.returncode == 0 and not result.targeted)
+
+
+def _message_type(changed_urls: Sequence[str]) -> str:
+    if all(url.endswith(".css") for url in changed_urls):
+        return "css"
+    if not any(url.endswith((".html", ".htm")) for url in changed_urls):
+        return "asset"
+    return "page"
+
+
+def _watched_directories(
+    paths: Sequence[Path], ignore: IgnoreFilter
+) -> tuple[list[Path], bool]:
+    """Return the paths to watch, and whether to watch them recursively.
+
+    If any directory below *paths* is pruned by the ignore filter,
+    every other directory is watched individually, so that the pruned
+    directories are never registered with the operating system.
+    """
+    directories = []
+    pruned = False
+    for path in paths:
+        if not path.is_dir():
+            directories.append(path)
+            continue
+        for dirpath, dirnames, _ in os.walk(path):
+            directories.append(Path(dirpath))
+            kept = [
+                name
+                for name in dirnames
+                if not ignore.prunes(os.path.join(dirpath, name))
+            ]
+            pruned |= len(kept) != len(dirnames)
+            dirnames[:] = kept
+    if not pruned:
+        return list(paths), True
+    return directories, False
+
+
+def _new_directories(changes: set[tuple[watchfiles.Change, str]]) -> list[str]:
+    return [
+        path
+        for change, path in changes
+        if change == watchfiles.Change.added and os.path.isdir(path)
+    ]
+
+
+def _files_below(
+    directories: Sequence[str], ignore: IgnoreFilter
+) -> set[tuple[watchfiles.Change, str]]:
+    """Return additions for the files in *directories* that are not ignored."""
+    added = set()
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if not ignore.prunes(os.path.join(dirpath, name))
+            ]
+            added.update(
+                (watchfiles.Change.added, path)
+                for name in filenames
+                if not ignore(path := os.path.join(dirpath, name))
+            )
+    return added
@@ -0,0 +1,113 @@
+"""Catching up on changes made while the server was not running."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sphinx_autobuild.hashing import ContentIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    #: Map of path to its recorded state, or to ``None`` if it was deleted.
+    SnapshotState = dict[str, tuple[int, int, str] | None]
+
+#: Bump when the on-disk format changes, to discard old snapshots.
+_SNAPSHOT_VERSION = 1
+
+
+class SourceSnapshot:
+    """The state of the watched sources as of the last successful build.
+
+    The snapshot is saved to *path* after each successful build,
+    and records the modification time, size, and hash of every file
+    below *roots* that is not ignored.
+    On startup, :meth:`changes` compares the sources with the saved snapshot,
+    so that only what changed meanwhile needs to be built.
+    A snapshot saved with a different *key*, such as for other build options,
+    is discarded.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        roots: Sequence[str | os.PathLike[str]],
+        ignore: Callable[[str], bool],
+        *,
+        key: str = "",
+    ) -> None:
+        self.path = Path(path)
+        self.roots = list(roots)
+        self.ignore = ignore
+        self.key = key
+        #: The state of the sources, as of the last successful build.
+        self.entries: dict[str, tuple[int, int, str]] = {}
+
+    def __repr__(self):
+        return f"SourceSnapshot(path={self.path!r}, entries={len(self.entries)})"
+
+    def load(self) -> bool:
+        """Read the saved snapshot, returning whether it is valid."""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != _SNAPSHOT_VERSION
+            or data.get("key") != self.key
+        ):
+            return False
+        self.entries = {
+            path: (mtime_ns, size, digest)
+            for path, (mtime_ns, size, digest) in data["entries"].items()
+        }
+        return True
+
+    def save(self) -> None:
+        data = {"version": _SNAPSHOT_VERSION, "key": self.key, "entries": self.entries}
+        tmp_file = self.path.with_name(f"{self.path.name}.tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_file, self.path)
+
+    def changes(self) -> list[Path] | None:
+        """Return the paths changed since the saved snapshot.
+
+        Returns ``None`` if there is no valid snapshot,
+        in which case everything must be built.
+        Files are only hashed if their modification time or size changed.
+        """
+        if not self.load():
+            return None
+        index = ContentIndex()
+        index.entries = dict(self.entries)
+        return [Path(path) for path in index.scan(self.roots, self.ignore)]
+
+    def capture(self, changed_paths: Sequence[Path]) -> SnapshotState:
+        """Record the state of *changed_paths*, before building them.
+
+        An empty *changed_paths* records the state of every source,
+        for a full build.
+        """
+        index = ContentIndex()
+        index.entries = dict(self.entries)
+        if changed_paths:
+            index.filter_changed(changed_paths)
+            paths = map(os.fspath, changed_paths)
+        else:
+            index.scan(self.roots, self.ignore)
+            paths = index.entries.keys() | self.entries.keys()
+        return {path: index.entries.get(path) for path in paths}
+
+    def commit(self, state: SnapshotState) -> None:
+        """Save *state*, captured before a build that has succeeded."""
+        for path, entry in state.items():
+            if entry is None:
+                self.entries.pop(path, None)
+            else:
+                self.entries[path] = entry
+        self.save()
@@ -27,9 +27,8 @@ def open_browser(url_host: str, delay: float) -> None:
         time.sleep(delay)
         webbrowser.open(f"http://{url_host}")
 
-    t = threading.Thread(target=_opener)
-    t.start()
-    t.join()
+    # The server starts while waiting, so don't block.
+    threading.Thread(target=_opener, daemon=True).start()
 
 
 def _log(text, *, colour):
@@ -0,0 +1,159 @@
+"""A long-lived process for running Sphinx builds with warm imports."""
+
+from __future__ import annotations
+
+import contextlib
+import multiprocessing
+import traceback
+from typing import TYPE_CHECKING
+
+from sphinx_autobuild.resources import MIB, rss
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+    from sphinx_autobuild.resources import BuildLimits
+
+
+class WorkerError(Exception):
+    """The warm worker could not run a build."""
+
+
+class SphinxWorker:
+    """Run ``sphinx-build`` invocations in a persistent child process.
+
+    The child imports Sphinx once, and keeps every extension imported by
+    ``conf.py`` in ``sys.modules`` between builds.
+    Call :meth:`recycle` when Python code used by the build changes,
+    so that the next build starts from a fresh interpreter.
+
+    Memory that Sphinx and its extensions keep between builds is released
+    by recycling the worker after *max_builds* builds,
+    or once its resident set size exceeds *max_rss* bytes.
+    *limits* are applied to the child process when it starts.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_builds: int | None = None,
+        max_rss: int | None = None,
+        limits: BuildLimits | None = None,
+    ) -> None:
+        self.max_builds = max_builds
+        self.max_rss = max_rss
+        self.limits = limits
+        self._context = multiprocessing.get_context("spawn")
+        self._process: BaseProcess | None = None
+        self._conn: Connection | None = None
+        self._busy = False
+        #: Builds run by the current worker process.
+        self.builds = 0
+
+    def __repr__(self):
+        return f"SphinxWorker(pid={self.pid!r})"
+
+    @property
+    def pid(self) -> int | None:
+        if self._process is None:
+            return None
+        return self._process.pid
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self) -> None:
+        """Start the worker process, if it is not already running."""
+        if self.is_alive:
+            return
+        self.stop()
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.limits),
+            name="sphinx-autobuild-worker",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._process = process
+        self._conn = parent_conn
+        self.builds = 0
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop the worker process, waiting up to *timeout* seconds."""
+        process, conn = self._process, self._conn
+        self._process = self._conn = None
+        if conn is not None:
+            with contextlib.suppress(OSError):
+                conn.send(None)
+            conn.close()
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            process.close()
+
+    def terminate(self) -> None:
+        """Kill a running build; the next build starts a new worker."""
+        process = self._process
+        if self._busy and process is not None and process.is_alive():
+            process.terminate()
+
+    def recycle(self) -> None:
+        """Discard the current worker; the next build starts a new one."""
+        self.stop()
+
+    def build(self, sphinx_args: Sequence[str]) -> int:
+        """Run ``sphinx-build`` with *sphinx_args*, returning the exit code."""
+        self.start()
+        self._busy = True
+        try:
+            self._conn.send(list(sphinx_args))
+            returncode = self._conn.recv()
+        except (EOFError, OSError) as e:
+            self.stop()
+            msg = "The Sphinx worker process exited unexpectedly"
+            raise WorkerError(msg) from e
+        finally:
+            self._busy = False
+        self.builds += 1
+        return returncode
+
+    def exhausted(self) -> str | None:
+        """Return why the worker should be recycled, if it has reached a limit."""
+        if self.max_builds is not None and self.builds >= self.max_builds:
+            return f"after {self.builds} builds"
+        if self.max_rss is not None and self.pid is not None:
+            usage = rss(self.pid)
+            if usage is not None and usage > self.max_rss:
+                return f"using {usage / MIB:.0f} MiB"
+        return None
+
+
+def _worker_main(conn: Connection, limits: BuildLimits | None = None) -> None:
+    if limits is not None:
+        limits.apply()
+    # Importing Sphinx up-front is the point of the warm worker.
+    from sphinx.cmd.build import main as sphinx_main
+
+    while True:
+        try:
+            sphinx_args = conn.recv()
+        except EOFError:
+            break
+        if sphinx_args is None:
+            break
+        try:
+            returncode = sphinx_main(sphinx_args)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        conn.send(returncode)
+    conn.close()
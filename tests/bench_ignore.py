@@ -0,0 +1,87 @@
+"""Micro-benchmark for IgnoreFilter.
+
+Run with ``python tests/bench_ignore.py``.
+This compares the compiled, caching filter against a linear scan
+of the same patterns, as used before the patterns were compiled.
+"""
+
+import fnmatch
+import re
+import sys
+import timeit
+from pathlib import Path
+
+from sphinx_autobuild.filter import IgnoreFilter
+
+REGULAR = [
+    ".git",
+    ".hg",
+    ".idea",
+    ".mypy_cache",
+    "node_modules",
+    ".nox",
+    ".ruff_cache",
+    ".pytest_cache",
+    ".pytype",
+    ".svn",
+    ".tox",
+    ".venv",
+    "venv",
+    ".vscode",
+    "docs/_build",
+    "*.pyc",
+    "*.swp",
+]
+REGEX_BASED = [r"\.ipynb_checkpoints", r"~$", r"/\.#", r"\.tmp$"]
+
+
+class LinearIgnoreFilter:
+    """The previous implementation, for comparison."""
+
+    def __init__(self, regular, regex_based):
+        normalised_paths = [Path(p).resolve().as_posix() for p in regular]
+        self.regular_patterns = list(dict.fromkeys(normalised_paths))
+        self.regex_based_patterns = [*map(re.compile, dict.fromkeys(regex_based))]
+
+    def __call__(self, filename):
+        normalised_path = Path(filename).resolve().as_posix()
+        for pattern in self.regular_patterns:
+            if normalised_path.startswith(f"{pattern}/"):
+                return True
+            if fnmatch.fnmatch(normalised_path, pattern):
+                return True
+        return any(regex.search(normalised_path) for regex in self.regex_based_patterns)
+
+
+def event_storm(count):
+    """Paths as reported when a tool regenerates a directory several times."""
+    root = Path.cwd() / "docs" / "api"
+    paths = [str(root / f"module_{i // 10}" / f"page_{i}.rst") for i in range(count)]
+    return paths * 5
+
+
+def main(count=2_000):
+    paths = event_storm(count)
+    linear = LinearIgnoreFilter(REGULAR, REGEX_BASED)
+    compiled = IgnoreFilter(REGULAR, REGEX_BASED)
+    assert [*map(linear, paths)] == [*map(compiled, paths)]
+
+    def cold():
+        # A fresh filter, so that every distinct path misses the cache.
+        ignore = IgnoreFilter(REGULAR, REGEX_BASED)
+        return [*map(ignore, paths)]
+
+    results = {
+        "linear": min(timeit.repeat(lambda: [*map(linear, paths)], number=1)),
+        "cold": min(timeit.repeat(cold, number=1)),
+        "warm": min(timeit.repeat(lambda: [*map(compiled, paths)], number=1)),
+    }
+    for name, seconds in results.items():
+        rate = len(paths) / seconds
+        print(f"{name:>7}: {seconds * 1000:8.2f} ms ({rate:,.0f} paths/s)")
+    for name in "cold", "warm":
+        print(f"speedup ({name}): {results['linear'] / results[name]:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
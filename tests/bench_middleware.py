@@ -0,0 +1,116 @@
+"""Micro-benchmark for JavascriptInjectorMiddleware.
+
+Run with ``python tests/bench_middleware.py [SIZE_KIB]``.
+This serves a large HTML page, in chunks as StaticFiles does,
+through the streaming injector and through the previous implementation,
+which appended the script to the last chunk and adjusted Content-Length.
+"""
+
+import asyncio
+import gzip
+import sys
+import timeit
+
+from starlette.datastructures import MutableHeaders
+
+from sphinx_autobuild.middleware import JavascriptInjectorMiddleware
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AppendingInjectorMiddleware(JavascriptInjectorMiddleware):
+    """The previous implementation, for comparison."""
+
+    async def __call__(self, scope, receive, send):
+        add_script = False
+
+        async def send_wrapper(message):
+            nonlocal add_script
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if headers.get("Content-Type", "").startswith("text/html"):
+                    add_script = True
+                    if "Content-Length" in headers:
+                        length = int(headers["Content-Length"]) + len(self.script)
+                        headers["Content-Length"] = str(length)
+                headers["Cache-Control"] = "no-cache"
+            elif message["type"] == "http.response.body":
+                request_complete = not message.get("more_body", False)
+                if add_script and request_complete:
+                    message["body"] += self.script
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def page_app(body, content_type=b"text/html; charset=utf-8", encoding=None):
+    async def app(_scope, _receive, send):
+        headers = [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+            (b"etag", b'"0123456789abcdef"'),
+            (b"last-modified", b"Thu, 01 Jan 1970 00:00:00 GMT"),
+        ]
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i in range(0, len(body), CHUNK_SIZE):
+            chunk = body[i : i + CHUNK_SIZE]
+            more_body = i + CHUNK_SIZE < len(body)
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body,
+            })
+
+    return app
+
+
+def serve(app, requests):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+
+    async def send(_message):
+        pass
+
+    async def main():
+        for _ in range(requests):
+            await app(scope, None, send)
+
+    asyncio.run(main())
+
+
+def large_page(size):
+    row = b'<tr><td><a href="#api">sphinx_autobuild.api</a></td><td>...</td></tr>\n'
+    rows = row * (size // len(row))
+    return b"<html><body><table>\n" + rows + b"</table></body></html>\n"
+
+
+def main(size_kib=2048, requests=50):
+    html = large_page(size_kib * 1024)
+    cases = {
+        "html": (html, b"text/html; charset=utf-8", None),
+        "gzip html": (gzip.compress(html), b"text/html; charset=utf-8", b"gzip"),
+        "css": (html, b"text/css", None),
+    }
+    print(f"{requests} requests for a {len(html) / 1024:,.0f} KiB page")
+    for name, (body, content_type, encoding) in cases.items():
+        app = page_app(body, content_type, encoding)
+        for label, middleware in (
+            ("appending", AppendingInjectorMiddleware),
+            ("streaming", JavascriptInjectorMiddleware),
+        ):
+            if encoding is not None and label == "appending":
+                # Appending to a compressed body would corrupt it.
+                continue
+            wrapped = middleware(app, "127.0.0.1:8000")
+            seconds = min(
+                timeit.repeat(lambda w=wrapped: serve(w, requests), number=1, repeat=3)
+            )
+            rate = requests / seconds
+            print(
+                f"{name:>10} {label:>9}: {seconds * 1000:8.2f} ms ({rate:,.0f} req/s)"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
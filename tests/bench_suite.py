@@ -0,0 +1,378 @@
+"""Benchmarks for the whole rebuild and serving pipeline.
+
+Run with ``python tests/bench_suite.py [--pages N ...] [--output FILE]``,
+or ``nox -s bench -- [OPTIONS]``.
+For every project size, this generates a synthetic Sphinx project and measures:
+
+* ``reload``: the latency from editing a page to the reload message,
+  end to end through :class:`RebuildServer` and a real build;
+* ``filter``: the throughput of :class:`IgnoreFilter`
+  for a storm of change events;
+* ``serve``: the throughput of serving the built pages through
+  the application's middleware, including :class:`JavascriptInjectorMiddleware`;
+* ``fan-out``: the latency of delivering a reload message
+  to many WebSocket clients.
+
+The results are written as JSON, so that they can be compared between runs.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import sphinx
+
+from sphinx_autobuild import __version__
+from sphinx_autobuild.__main__ import _create_app
+from sphinx_autobuild.build import Builder
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.metrics import BuildMetrics
+from sphinx_autobuild.server import RebuildServer
+
+BENCHMARKS = ("reload", "filter", "serve", "fan-out")
+
+#: Pages per section of the synthetic project.
+SECTION_SIZE = 100
+
+URL_HOST = "127.0.0.1:8000"
+
+PAGE = """\
+{title}
+{underline}
+
+This is page {number} of the synthetic project.
+It links to :doc:`page_{previous}` and :ref:`the next page <label-{next}>`.
+
+.. _label-{number}:
+
+Section
+-------
+
+.. code-block:: python
+
+   def page_{number}():
+       return {number}
+
+{paragraphs}
+"""
+
+PARAGRAPH = (
+    "Lorem ipsum dolor sit amet, *consectetur* adipiscing elit, "
+    "sed do **eiusmod** tempor incididunt ut labore et dolore magna aliqua. "
+    "See ``page_{number}`` for details.\n\n"
+)
+
+
+def make_project(directory, pages):
+    """Write a Sphinx project with *pages* pages to *directory*.
+
+    Pages are grouped into sections of :data:`SECTION_SIZE` pages,
+    each with its own table of contents, and link to their neighbours.
+    Returns the paths of the pages.
+    """
+    src_dir = Path(directory)
+    (src_dir / "_static").mkdir(parents=True, exist_ok=True)
+    (src_dir / "_static" / "custom.css").write_text("body { margin: 0; }\n")
+    (src_dir / "conf.py").write_text(
+        'project = "Benchmark"\n'
+        'html_theme = "basic"\n'
+        'html_static_path = ["_static"]\n'
+        'html_css_files = ["custom.css"]\n'
+    )
+    sections = range(0, pages, SECTION_SIZE)
+    toctree = "".join(f"   section_{start}/index\n" for start in sections)
+    (src_dir / "index.rst").write_text(
+        f"Benchmark\n=========\n\n.. toctree::\n   :maxdepth: 2\n\n{toctree}"
+    )
+    paths = []
+    for start in sections:
+        section_dir = src_dir / f"section_{start}"
+        section_dir.mkdir(exist_ok=True)
+        numbers = range(start, min(start + SECTION_SIZE, pages))
+        entries = "".join(f"   page_{number}\n" for number in numbers)
+        title = f"Section {start}"
+        (section_dir / "index.rst").write_text(
+            f"{title}\n{'=' * len(title)}\n\n.. toctree::\n\n{entries}"
+        )
+        for number in numbers:
+            title = f"Page {number}"
+            path = section_dir / f"page_{number}.rst"
+            path.write_text(
+                PAGE.format(
+                    title=title,
+                    underline="=" * len(title),
+                    number=number,
+                    previous=max(number - 1, start),
+                    next=min(number + 1, numbers[-1]),
+                    paragraphs=PARAGRAPH.format(number=number) * 5,
+                )
+            )
+            paths.append(path)
+    return paths
+
+
+def summarise(samples):
+    """Summary statistics of *samples*, in seconds."""
+    samples = sorted(samples)
+    return {
+        "samples": len(samples),
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, round(0.95 * (len(samples) - 1)))],
+        "max": samples[-1],
+    }
+
+
+def bench_reload(src_dir, out_dir, pages, *, edits):
+    """Edit pages and time how long until clients are told to reload."""
+    builder = Builder(
+        [str(src_dir), str(out_dir), "-q"],
+        url_host=URL_HOST,
+        pre_build_commands=[],
+        post_build_commands=[],
+    )
+    metrics = BuildMetrics()
+    server = RebuildServer(
+        [src_dir],
+        IgnoreFilter([out_dir], []),
+        builder,
+        out_dir=out_dir,
+        metrics=metrics,
+    )
+
+    async def main():
+        latencies = []
+        async with server.lifespan(None):
+            subscription = server.hub.subscribe()
+            # Give the watcher time to start.
+            await asyncio.sleep(1)
+            for page in pages[:: max(1, len(pages) // edits)][:edits]:
+                with page.open("a", encoding="utf-8") as f:
+                    f.write(f"\nEdited at {time.time()}.\n")
+                start = time.perf_counter()
+                async with asyncio.timeout(600):
+                    await subscription.get()
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    latencies = asyncio.run(main())
+    return {
+        "latency": summarise(latencies),
+        "builds": [record.as_dict() for record in metrics.recent],
+    }
+
+
+def bench_filter(src_dir, out_dir, *, repeats=5):
+    """Time filtering a storm of events, as when a tool rewrites many files."""
+    paths = [str(path) for path in src_dir.rglob("*")]
+    paths += [str(path) for path in out_dir.rglob("*")]
+    paths += [str(src_dir / ".git" / "objects" / f"{i:02x}") for i in range(256)]
+    storm = paths * repeats
+    regular = [out_dir, ".git", "node_modules", "*.pyc", "*.swp"]
+    regex_based = [r"\.ipynb_checkpoints", r"~$", r"/\.#"]
+
+    results = {"events": len(storm)}
+    ignore = IgnoreFilter(regular, regex_based)
+    # The first pass starts with an empty cache.
+    for name in "cold", "warm":
+        start = time.perf_counter()
+        ignored = sum(map(ignore, storm))
+        seconds = time.perf_counter() - start
+        results[name] = {"seconds": seconds, "events_per_second": len(storm) / seconds}
+    results["ignored"] = ignored
+    return results
+
+
+def bench_serve(src_dir, out_dir, *, requests):
+    """Time serving the built pages through the application's middleware."""
+    app = _create_app([src_dir], IgnoreFilter([], []), None, out_dir, URL_HOST)
+    urls = [
+        "/" + path.relative_to(out_dir).as_posix()
+        for path in sorted(out_dir.rglob("*.html"))
+    ]
+    sent = 0
+
+    async def receive():
+        # Requests have no body, and clients never disconnect.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    async def main():
+        for i in range(requests):
+            scope = {
+                "type": "http",
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": urls[i % len(urls)],
+                "raw_path": urls[i % len(urls)].encode(),
+                "query_string": b"",
+                "headers": [(b"host", URL_HOST.encode())],
+                "server": ("127.0.0.1", 8000),
+            }
+            await app(scope, receive, send)
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    seconds = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "seconds": seconds,
+        "requests_per_second": requests / seconds,
+        "bytes_per_second": sent / seconds,
+    }
+
+
+class FakeClients:
+    """WebSocket clients that count the messages sent to them."""
+
+    def __init__(self, count):
+        self.count = count
+        self.accepted = 0
+        self.received = 0
+        self.all_accepted = asyncio.Event()
+        self.all_received = asyncio.Event()
+        self.disconnect = asyncio.Event()
+
+    async def connect(self, app):
+        connected = False
+
+        async def receive():
+            nonlocal connected
+            if not connected:
+                connected = True
+                return {"type": "websocket.connect"}
+            await self.disconnect.wait()
+            return {"type": "websocket.disconnect", "code": 1000}
+
+        await app({"type": "websocket"}, receive, self.send)
+
+    async def send(self, message):
+        if message["type"] == "websocket.accept":
+            self.accepted += 1
+            if self.accepted == self.count:
+                self.all_accepted.set()
+        elif message["type"] == "websocket.send":
+            self.received += 1
+            if self.received == self.count:
+                self.all_received.set()
+
+
+def bench_fan_out(src_dir, *, clients, messages=20):
+    """Time delivering reload messages to many WebSocket clients."""
+    server = RebuildServer([src_dir], IgnoreFilter([], []), None)
+    server.hub.queue_size = messages + 1
+
+    async def main():
+        fake = FakeClients(clients)
+        tasks = [asyncio.create_task(fake.connect(server)) for _ in range(clients)]
+        await fake.all_accepted.wait()
+        assert len(server.hub.subscriptions) == clients
+        latencies = []
+        for _ in range(messages):
+            fake.received = 0
+            fake.all_received.clear()
+            start = time.perf_counter()
+            server.hub.publish({"type": "page", "changed": None})
+            await fake.all_received.wait()
+            latencies.append(time.perf_counter() - start)
+        fake.disconnect.set()
+        await asyncio.gather(*tasks)
+        return latencies
+
+    return {"clients": clients, "latency": summarise(asyncio.run(main()))}
+
+
+def run(pages, *, benchmarks, edits, requests, clients):
+    """Run the benchmarks against a synthetic project of *pages* pages."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        src_dir = Path(tmp, "docs").resolve()
+        out_dir = Path(tmp, "build").resolve()
+        page_paths = make_project(src_dir, pages)
+
+        builder = Builder(
+            [str(src_dir), str(out_dir), "-q"],
+            url_host=URL_HOST,
+            pre_build_commands=[],
+            post_build_commands=[],
+        )
+        start = time.perf_counter()
+        builder(changed_paths=())
+        results["initial_build"] = {"seconds": time.perf_counter() - start}
+
+        if "reload" in benchmarks:
+            results["reload"] = bench_reload(src_dir, out_dir, page_paths, edits=edits)
+        if "filter" in benchmarks:
+            results["filter"] = bench_filter(src_dir, out_dir)
+        if "serve" in benchmarks:
+            results["serve"] = bench_serve(src_dir, out_dir, requests=requests)
+        if "fan-out" in benchmarks:
+            results["fan-out"] = bench_fan_out(src_dir, clients=clients)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n")[0])
+    parser.add_argument(
+        "--pages",
+        type=int,
+        nargs="+",
+        default=[100],
+        help="sizes of the synthetic projects (default: 100)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        dest="benchmarks",
+        action="append",
+        choices=BENCHMARKS,
+        help="benchmark to run; may be repeated (default: all)",
+    )
+    parser.add_argument("--edits", type=int, default=5, help="pages to edit")
+    parser.add_argument("--requests", type=int, default=1000, help="pages to serve")
+    parser.add_argument("--clients", type=int, default=200, help="WebSocket clients")
+    parser.add_argument(
+        "--output", type=Path, help="file to write the results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    report = {
+        "sphinx_autobuild": __version__,
+        "sphinx": sphinx.__display_version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "projects": {},
+    }
+    # Keep the build output out of the results.
+    with contextlib.redirect_stdout(sys.stderr):
+        for pages in args.pages:
+            report["projects"][pages] = run(
+                pages,
+                benchmarks=args.benchmarks or BENCHMARKS,
+                edits=args.edits,
+                requests=args.requests,
+                clients=args.clients,
+            )
+
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
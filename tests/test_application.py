@@ -1,6 +1,8 @@
 """A very basic test that the application works."""
 
+import asyncio
 import shutil
+import threading
 from pathlib import Path
 
 from starlette.testclient import TestClient
@@ -34,3 +36,37 @@ def test_application(tmp_path):
     response = client.get("/")
     assert response.status_code == 200
     assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_initial_build_in_background(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    src_dir.mkdir()
+    out_dir.mkdir()
+    (out_dir / "stale.html").write_text("<p>stale</p>", encoding="utf-8")
+
+    url_host = "127.0.0.1:7777"
+    release = threading.Event()
+    builds = []
+
+    def builder(*, changed_paths):
+        release.wait(timeout=10)
+        builds.append(changed_paths)
+        (out_dir / "index.html").write_text("<p>built</p>", encoding="utf-8")
+
+    app = _create_app(
+        [src_dir], IgnoreFilter([], []), builder, out_dir, url_host, initial_build=True
+    )
+    with TestClient(app) as client:
+        # The server answers while the initial build is running.
+        assert "<p>stale</p>" in client.get("/stale.html").text
+        response = client.get("/")
+        assert response.status_code == 200
+        assert "Building the documentation" in response.text
+        assert response.headers["Cache-Control"] == "no-store"
+
+        release.set()
+        watcher = next(route for route in app.routes if route.name == "reload")
+        client.portal.call(asyncio.wait_for, watcher.endpoint.ready.wait(), 10)
+        assert "<p>built</p>" in client.get("/").text
+    assert builds == [[]]
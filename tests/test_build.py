@@ -0,0 +1,153 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from sphinx_autobuild.build import BuildCancelledError, Builder
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def project(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    shutil.copytree(ROOT / "docs", src_dir)
+    (src_dir / "other.rst").write_text("Other\n=====\n", encoding="utf-8")
+    return src_dir, out_dir
+
+
+def _builder(sphinx_args, src_dir, out_dir):
+    return Builder(
+        sphinx_args,
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        fast_path=True,
+        src_dir=src_dir,
+        out_dir=out_dir,
+        serve_dir=out_dir,
+    )
+
+
+def test_changed_documents(project):
+    src_dir, out_dir = project
+    builder = _builder([str(src_dir), str(out_dir)], src_dir, out_dir)
+
+    index = src_dir / "index.rst"
+    assert builder._changed_documents([index]) == [str(index)]
+    assert builder._changed_documents([index, src_dir / "conf.py"]) == []
+    assert builder._changed_documents([src_dir / "deleted.rst"]) == []
+    assert builder._changed_documents([]) == []
+
+    builder.sphinx_args.append("-a")
+    assert builder._changed_documents([index]) == []
+
+
+def test_filenames_follow_output_dir(project):
+    src_dir, out_dir = project
+    builder = _builder([str(src_dir), str(out_dir), "-b", "html"], src_dir, out_dir)
+
+    assert builder._sphinx_args_for_documents(["index.rst"]) == [
+        str(src_dir),
+        str(out_dir),
+        "index.rst",
+        "-b",
+        "html",
+    ]
+
+
+def test_targeted_build(project):
+    src_dir, out_dir = project
+    builder = _builder([str(src_dir), str(out_dir), "-q"], src_dir, out_dir)
+    assert not builder(changed_paths=()).targeted
+
+    (src_dir / "index.rst").write_text("Index\n=====\n", encoding="utf-8")
+    (src_dir / "other.rst").write_text("Changed\n=======\n", encoding="utf-8")
+    other_html = (out_dir / "other.html").read_text(encoding="utf-8")
+
+    result = builder(changed_paths=[src_dir / "index.rst"])
+    assert result.targeted
+    assert result.returncode == 0
+    assert "Index" in (out_dir / "index.html").read_text(encoding="utf-8")
+    assert (out_dir / "other.html").read_text(encoding="utf-8") == other_html
+
+
+def test_copy_static_files(project):
+    src_dir, out_dir = project
+    builder = _builder([str(src_dir), str(out_dir)], src_dir, out_dir)
+    static_dir = src_dir / "_static"
+    static_dir.mkdir(exist_ok=True)
+    css = static_dir / "custom.css"
+    css.write_text("body {}", encoding="utf-8")
+
+    # The output has not been built yet.
+    assert not builder._copy_static_files([css])
+
+    (out_dir / "_static").mkdir(parents=True)
+    assert builder._copy_static_files([css])
+    assert (out_dir / "_static" / "custom.css").read_text(encoding="utf-8") == (
+        "body {}"
+    )
+
+    css.write_text("body { color: red }", encoding="utf-8")
+    result = builder(changed_paths=[css])
+    assert result.returncode == 0
+    assert not result.targeted
+    assert not (out_dir / "index.html").exists()
+    assert (out_dir / "_static" / "custom.css").read_text(encoding="utf-8") == (
+        "body { color: red }"
+    )
+
+    template = static_dir / "layout.css_t"
+    template.write_text("body {}", encoding="utf-8")
+    assert not builder._copy_static_files([template])
+    assert not builder._copy_static_files([css, src_dir / "index.rst"])
+    assert not builder._copy_static_files([static_dir / "deleted.css"])
+
+
+def test_cancelled_before_sphinx(project, monkeypatch):
+    src_dir, out_dir = project
+    calls = []
+    monkeypatch.setattr(Builder, "_run_sphinx", lambda _, args: calls.append(args))
+    builder = _builder([str(src_dir), str(out_dir)], src_dir, out_dir)
+    # Cancelled while the doctree directory is prepared.
+    monkeypatch.setattr(builder, "_prepare_doctrees", lambda **_: builder.cancel())
+
+    with pytest.raises(BuildCancelledError):
+        builder(changed_paths=())
+    assert calls == []
+
+
+def test_adaptive_jobs(project, monkeypatch):
+    src_dir, out_dir = project
+    calls = []
+    monkeypatch.setattr(Builder, "_run_sphinx", lambda _, args: calls.append(args))
+    monkeypatch.setattr("sphinx_autobuild.build.available_cores", lambda: 8)
+    builder = Builder(
+        [str(src_dir), str(out_dir)],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        src_dir=src_dir,
+        out_dir=out_dir,
+        adaptive_jobs=True,
+        doctree_dir=out_dir / ".doctrees",
+    )
+    for i in range(200):
+        (src_dir / f"page_{i}.rst").write_text("Page\n====\n", encoding="utf-8")
+
+    assert builder(changed_paths=()).jobs == 4
+    assert builder(changed_paths=[src_dir / "page_0.rst"]).jobs == 1
+    assert calls[-1][-2:] == ["-j", "1"]
+
+    pinned = Builder(
+        [str(src_dir), str(out_dir), "-j", "auto"],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        src_dir=src_dir,
+        adaptive_jobs=True,
+    )
+    assert pinned(changed_paths=()).jobs is None
+    assert calls[-1][-2:] == ["-j", "auto"]
@@ -0,0 +1,141 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.cache import CachedResponse, ResponseCache
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.middleware import (
+    JavascriptInjectorMiddleware,
+    PlaceholderMiddleware,
+    ResponseCacheMiddleware,
+)
+from sphinx_autobuild.server import RebuildServer
+
+
+def _app(directory, cache):
+    return Starlette(
+        routes=[Mount("/", app=StaticFiles(directory=directory, html=True))],
+        middleware=[
+            Middleware(ResponseCacheMiddleware, cache=cache),
+            Middleware(JavascriptInjectorMiddleware, ws_url="127.0.0.1:7777"),
+        ],
+    )
+
+
+def _entry(body):
+    return CachedResponse(status=200, headers=[], body=body)
+
+
+def test_cached_until_invalidated(tmp_path):
+    page = tmp_path / "api" / "index.html"
+    page.parent.mkdir()
+    page.write_text("<p>one</p>", encoding="utf-8")
+    cache = ResponseCache()
+    client = TestClient(_app(tmp_path, cache))
+
+    first = client.get("/api/")
+    assert first.status_code == 200
+    assert "<p>one</p>" in first.text
+    assert "websocket-reload" in first.text
+    etag = first.headers["ETag"]
+
+    page.write_text("<p>two</p>", encoding="utf-8")
+    second = client.get("/api/")
+    assert second.text == first.text
+    assert second.headers["ETag"] == etag
+    assert second.headers["Cache-Control"] == "no-cache"
+    assert cache.hits == 1
+
+    not_modified = client.get("/api/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    cache.invalidate(["/api/index.html"])
+    third = client.get("/api/", headers={"If-None-Match": etag})
+    assert third.status_code == 200
+    assert "<p>two</p>" in third.text
+    assert third.headers["ETag"] != etag
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache = ResponseCache()
+    client = TestClient(_app(tmp_path, cache))
+
+    assert client.get("/missing.html").status_code == 404
+    assert cache.entries == {}
+
+
+def test_placeholder_is_not_cached(tmp_path):
+    cache = ResponseCache()
+    ready = asyncio.Event()
+    app = Starlette(
+        routes=[Mount("/", app=StaticFiles(directory=tmp_path, html=True))],
+        middleware=[
+            Middleware(ResponseCacheMiddleware, cache=cache),
+            Middleware(PlaceholderMiddleware, ready=ready),
+            Middleware(JavascriptInjectorMiddleware, ws_url="127.0.0.1:7777"),
+        ],
+    )
+    client = TestClient(app)
+
+    response = client.get("/index.html")
+    assert "Building the documentation" in response.text
+    assert response.headers["Cache-Control"] == "no-store"
+    assert cache.entries == {}
+
+
+def test_size_limits():
+    cache = ResponseCache(max_size=10, max_entry_size=6)
+
+    assert not cache.put(("/large", ""), _entry(b"x" * 7), version=0)
+    assert cache.put(("/a", ""), _entry(b"a" * 5), version=0)
+    assert cache.put(("/b", ""), _entry(b"b" * 5), version=0)
+    cache.get(("/a", ""))
+    assert cache.put(("/c", ""), _entry(b"c" * 5), version=0)
+    assert list(cache.entries) == [("/a", ""), ("/c", "")]
+    assert cache.size == 10
+
+
+def test_stale_responses_are_not_stored():
+    cache = ResponseCache()
+    version = cache.version
+    cache.clear()
+
+    assert not cache.put(("/index.html", ""), _entry(b"old"), version=version)
+    assert cache.get(("/index.html", "")) is None
+
+
+def test_responses_are_not_stored_during_builds(tmp_path):
+    src_dir = tmp_path / "docs"
+    src_dir.mkdir()
+    page = tmp_path / "build" / "index.html"
+    page.parent.mkdir()
+    page.write_text("<p>page</p>", encoding="utf-8")
+    cache = ResponseCache()
+    client = TestClient(_app(page.parent, cache))
+
+    def build(**_):
+        # The page is read while it is written, but ends up unchanged.
+        page.write_text("<p>pa", encoding="utf-8")
+        assert "<p>page" not in client.get("/index.html").text
+        page.write_text("<p>page</p>", encoding="utf-8")
+
+    server = RebuildServer(
+        [src_dir],
+        IgnoreFilter([], []),
+        change_callback=build,
+        out_dir=page.parent,
+        response_cache=cache,
+    )
+    with TestClient(Starlette(lifespan=server.lifespan)) as server_client:
+        server_client.portal.call(server.rebuild, [src_dir / "index.rst"])
+        assert cache.entries == {}
+        server_client.portal.call(server.notify)
+
+    assert "<p>page</p>" in client.get("/index.html").text
+    assert cache.entries
@@ -0,0 +1,158 @@
+import time
+
+from sphinx_autobuild.build import Builder
+from sphinx_autobuild.doctree_cache import DoctreeCache
+from sphinx_autobuild.hashing import file_digest
+
+
+def _write_project(src_dir, branch):
+    src_dir.mkdir(exist_ok=True)
+    (src_dir / "conf.py").write_text('project = "Cache"\n', encoding="utf-8")
+    (src_dir / "index.rst").write_text(
+        "Index\n=====\n\n.. toctree::\n   :glob:\n\n   page*\n", encoding="utf-8"
+    )
+    for i in range(5):
+        text = f"Page {i}\n======\n\nOn branch {branch if i == 1 else 'main'}.\n"
+        (src_dir / f"page{i}.rst").write_text(text, encoding="utf-8")
+
+
+def test_switching_branches(tmp_path, capfd):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    doctree_dir = out_dir / ".doctrees"
+    cache = DoctreeCache(
+        tmp_path / "cache",
+        src_dir=src_dir,
+        doctree_dir=doctree_dir,
+        key="html",
+        max_size=2**30,
+        skip=[out_dir],
+    )
+    builder = Builder(
+        [str(src_dir), str(out_dir)],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        src_dir=src_dir,
+        out_dir=out_dir,
+        doctree_dir=doctree_dir,
+        doctree_cache=cache,
+    )
+
+    def build(branch):
+        # Rewrite every file, as checking out an unrelated branch would.
+        time.sleep(0.01)
+        _write_project(src_dir, branch)
+        capfd.readouterr()
+        builder(changed_paths=sorted(src_dir.iterdir()))
+        return capfd.readouterr().out
+
+    assert "6 added" in build("one")
+    assert len(list(cache.cache_dir.iterdir())) == 1
+    # Only the page that differs between the branches is read again.
+    assert "0 added, 1 changed, 0 removed" in build("two")
+
+    output = build("one")
+    assert "Seeding the doctree directory" in output
+    assert "0 added, 0 changed, 0 removed" in output
+    assert "On branch one" in (out_dir / "page1.html").read_text(encoding="utf-8")
+
+    # Unchanged files that are rewritten are not read again.
+    output = build("one")
+    assert "Seeding the doctree directory" not in output
+    assert "0 added, 0 changed, 0 removed" in output
+
+    builder.close()
+    assert len(list(cache.cache_dir.iterdir())) == 1
+
+
+def test_targeted_build(tmp_path, capfd):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    doctree_dir = out_dir / ".doctrees"
+    _write_project(src_dir, "main")
+    cache = DoctreeCache(
+        tmp_path / "cache",
+        src_dir=src_dir,
+        doctree_dir=doctree_dir,
+        key="html",
+        max_size=2**30,
+        skip=[out_dir],
+    )
+    builder = Builder(
+        [str(src_dir), str(out_dir)],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        fast_path=True,
+        src_dir=src_dir,
+        out_dir=out_dir,
+        serve_dir=out_dir,
+        doctree_dir=doctree_dir,
+        doctree_cache=cache,
+    )
+    builder(changed_paths=())
+
+    page = src_dir / "page2.rst"
+    for i in range(2):
+        page.write_text(f"Page 2\n======\n\nEdit {i}.\n", encoding="utf-8")
+        capfd.readouterr()
+        assert builder(changed_paths=[page]).targeted
+        assert "0 added, 1 changed, 0 removed" in capfd.readouterr().out
+
+        # The full build that follows neither restores the cached copy
+        # nor reads the edited document again.
+        builder(changed_paths=())
+        output = capfd.readouterr().out
+        assert "Seeding the doctree directory" not in output
+        assert "0 added, 0 changed, 0 removed" in output
+    builder.close()
+
+
+def test_only_changed_files_are_hashed(tmp_path, monkeypatch):
+    src_dir = tmp_path / "docs"
+    _write_project(src_dir, "main")
+    cache = DoctreeCache(
+        tmp_path / "cache",
+        src_dir=src_dir,
+        doctree_dir=tmp_path / "doctrees",
+        key="html",
+        max_size=2**30,
+    )
+    cache.prepare(full=True)
+
+    def scan(*_args, **_kwargs):
+        raise AssertionError("scanned the source directory again")
+
+    monkeypatch.setattr(cache._index, "scan", scan)
+    page = src_dir / "page1.rst"
+    page.write_text("Changed\n=======\n", encoding="utf-8")
+    cache.note_changes([page, tmp_path / "outside.rst"])
+    sources = cache.prepare(full=True)
+    assert sources["files"]["page1.rst"] == file_digest(page)
+    assert len(sources["files"]) == 7
+
+
+def test_eviction(tmp_path):
+    src_dir = tmp_path / "docs"
+    doctree_dir = tmp_path / "doctrees"
+    src_dir.mkdir()
+    doctree_dir.mkdir()
+    (doctree_dir / "environment.pickle").write_bytes(b"x" * 1000)
+    cache = DoctreeCache(
+        tmp_path / "cache",
+        src_dir=src_dir,
+        doctree_dir=doctree_dir,
+        key="html",
+        max_size=2500,
+    )
+
+    entries = []
+    for i in range(4):
+        (src_dir / "index.rst").write_text(str(i), encoding="utf-8")
+        cache.note_changes([src_dir / "index.rst"])
+        cache.record(cache.prepare(full=True))
+        cache.publish()
+        entries.append(set(cache.cache_dir.iterdir()) - set().union(*entries))
+    # Only the two most recently published entries fit.
+    assert set(cache.cache_dir.iterdir()) == entries[2] | entries[3]
@@ -0,0 +1,85 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.build import Builder
+from sphinx_autobuild.executor import InlineExecutor, create_executor
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.server import RebuildServer
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.mark.parametrize(
+    ("kind", "cls"),
+    [
+        ("thread", ThreadPoolExecutor),
+        ("process", ProcessPoolExecutor),
+        ("inline", InlineExecutor),
+    ],
+)
+def test_create_executor(kind, cls):
+    executor = create_executor(kind)
+    try:
+        assert isinstance(executor, cls)
+        assert executor.submit(pow, 2, 5).result() == 32
+    finally:
+        executor.shutdown()
+
+
+def test_process_executor_runs_builder(tmp_path):
+    builder = Builder(
+        [str(ROOT / "docs"), str(tmp_path), "-q"],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+    )
+    builder.cancel()
+    copy = pickle.loads(pickle.dumps(builder))
+    assert not copy._cancel_requested.is_set()
+
+    executor = create_executor("process")
+    try:
+        result = executor.submit(builder, changed_paths=[]).result()
+    finally:
+        executor.shutdown()
+    assert result.returncode == 0
+    assert (tmp_path / "index.html").is_file()
+
+
+def test_create_executor_factory():
+    executor = InlineExecutor()
+    assert create_executor(lambda: executor) is executor
+
+
+def test_create_executor_unknown():
+    with pytest.raises(ValueError, match="unknown executor 'fibre'"):
+        create_executor("fibre")
+
+
+def test_inline_executor_exception():
+    future = InlineExecutor().submit(int, "not a number")
+    assert isinstance(future.exception(), ValueError)
+
+
+def test_executor_lifespan(tmp_path):
+    calls = []
+    server = RebuildServer(
+        [tmp_path],
+        IgnoreFilter([], []),
+        change_callback=lambda *, changed_paths: calls.append(changed_paths),
+        executor="inline",
+    )
+    app = Starlette(lifespan=server.lifespan)
+
+    assert server.executor is None
+    with TestClient(app) as client:
+        executor = server.executor
+        assert isinstance(executor, InlineExecutor)
+        client.portal.call(server.rebuild, [tmp_path / "index.rst"])
+    assert server.executor is None
+    assert calls == [[tmp_path / "index.rst"]]
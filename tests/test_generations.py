@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.build import BuildResult
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.generations import (
+    GENERATIONS_DIR,
+    GenerationStaticFiles,
+    OutputGenerations,
+)
+from sphinx_autobuild.server import RebuildServer
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_publish_links_unchanged_files(tmp_path):
+    _write(tmp_path / "index.html", "<p>one</p>")
+    _write(tmp_path / "_images" / "logo.png", "image")
+    _write(tmp_path / ".doctrees" / "index.doctree", "doctree")
+    generations = OutputGenerations(tmp_path)
+
+    first = generations.publish()
+    assert (first.directory / "index.html").read_text(encoding="utf-8") == (
+        "<p>one</p>"
+    )
+    assert not (first.directory / ".doctrees").exists()
+    assert not (first.directory / GENERATIONS_DIR).exists()
+
+    _write(tmp_path / "index.html", "<p>two</p>")
+    generations.acquire()
+    second = generations.publish()
+    assert (second.directory / "index.html").read_text(encoding="utf-8") == (
+        "<p>two</p>"
+    )
+    assert os.path.samefile(
+        first.directory / "_images" / "logo.png",
+        second.directory / "_images" / "logo.png",
+    )
+    assert generations.files_linked == 1
+    assert generations.files_copied == 3
+
+    # The first generation is removed once it is no longer in use.
+    assert generations.release(first)
+    generations.prune()
+    assert not first.directory.exists()
+    assert (second.directory / "_images" / "logo.png").read_text(
+        encoding="utf-8"
+    ) == "image"
+
+
+def test_generation_in_use_is_kept(tmp_path):
+    _write(tmp_path / "index.html", "<p>one</p>")
+    generations = OutputGenerations(tmp_path)
+    first = generations.publish()
+
+    assert generations.acquire() is first
+    generations.publish()
+    assert first.directory.exists()
+    assert generations.retired == [first]
+
+    assert generations.release(first)
+    assert generations.prune() == 1
+    assert not first.directory.exists()
+
+
+def test_serves_current_generation(tmp_path):
+    _write(tmp_path / "index.html", "<p>one</p>")
+    generations = OutputGenerations(tmp_path)
+    app = Starlette(
+        routes=[Mount("/", app=GenerationStaticFiles(generations, html=True))]
+    )
+    client = TestClient(app)
+
+    # Before the first generation, the directory is served directly.
+    assert client.get("/").text == "<p>one</p>"
+
+    generations.publish()
+    _write(tmp_path / "index.html", "<p>half-written</p>")
+    assert client.get("/").text == "<p>one</p>"
+
+    generations.publish()
+    assert client.get("/").text == "<p>half-written</p>"
+    assert generations.current.requests == 0
+
+
+def test_published_on_startup(tmp_path):
+    _write(tmp_path / "index.html", "<p>one</p>")
+    generations = OutputGenerations(tmp_path)
+    calls = []
+    server = RebuildServer(
+        [tmp_path],
+        IgnoreFilter([], []),
+        change_callback=lambda *, changed_paths: calls.append(changed_paths),
+        executor="inline",
+        generations=generations,
+    )
+    app = Starlette(lifespan=server.lifespan)
+
+    assert generations.current is None
+    with TestClient(app) as client:
+        client.portal.call(asyncio.wait_for, server.ready.wait(), 10)
+        assert generations.current.number == 1
+    assert calls == []
+
+
+def test_changes_reported_once_published(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    _write(src_dir / "index.rst", "")
+    _write(out_dir / "index.html", "<p>one</p>")
+    generations = OutputGenerations(out_dir)
+    returncodes = iter([1, 0])
+
+    def build(**_):
+        # Sphinx writes pages even if the build fails.
+        _write(out_dir / "index.html", "<p>two</p>")
+        returncode = next(returncodes)
+        if returncode == 0:
+            generations.publish()
+        return BuildResult(returncode=returncode)
+
+    server = RebuildServer(
+        [src_dir],
+        IgnoreFilter([], []),
+        change_callback=build,
+        out_dir=out_dir,
+        generations=generations,
+    )
+    app = Starlette(lifespan=server.lifespan)
+    changed = []
+    with TestClient(app) as client:
+        client.portal.call(asyncio.wait_for, server.ready.wait(), 10)
+        subscription = server.hub.subscribe()
+        for _ in range(2):
+            client.portal.call(server.rebuild, [src_dir / "index.rst"])
+            client.portal.call(server.notify)
+            message = json.loads(client.portal.call(subscription.get))
+            changed.append(message["changed"])
+    assert changed == [[], ["/index.html"]]
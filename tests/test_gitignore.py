@@ -0,0 +1,122 @@
+import asyncio
+
+from watchfiles import Change
+
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.gitignore import GitIgnore
+from sphinx_autobuild.server import _watched_directories, watch_changes
+
+
+def _write(path, text=""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_gitignore_rules(tmp_path):
+    _write(
+        tmp_path / ".gitignore",
+        "# comment\n*.log\n!keep.log\n/generated/\ncache/\ndocs/**/tmp\n",
+    )
+    _write(tmp_path / "sub" / ".ignore", "*.rst\n!index.rst\n")
+    (tmp_path / "generated").mkdir()
+    (tmp_path / "sub" / "generated").mkdir()
+    (tmp_path / "cache").mkdir()
+
+    gitignore = GitIgnore.from_directories([tmp_path])
+    ignored = IgnoreFilter([], [], gitignore=gitignore)
+
+    assert ignored(str(tmp_path / "build.log"))
+    assert ignored(str(tmp_path / "deep" / "dir" / "build.log"))
+    assert not ignored(str(tmp_path / "keep.log"))
+    assert ignored(str(tmp_path / "generated" / "api.rst"))
+    assert not ignored(str(tmp_path / "sub" / "generated" / "api.txt"))
+    assert ignored(str(tmp_path / "cache" / "file.txt"))
+    assert ignored(str(tmp_path / "docs" / "a" / "b" / "tmp"))
+    assert ignored(str(tmp_path / "sub" / "page.rst"))
+    assert not ignored(str(tmp_path / "sub" / "index.rst"))
+    assert not ignored(str(tmp_path / "page.rst"))
+
+
+def test_cannot_reinclude_below_ignored_directory(tmp_path):
+    _write(tmp_path / ".gitignore", "build/\n!build/keep.txt\n")
+    (tmp_path / "build").mkdir()
+
+    ignored = IgnoreFilter([], [], gitignore=GitIgnore.from_directories([tmp_path]))
+    assert ignored(str(tmp_path / "build" / "keep.txt"))
+
+
+def test_parent_gitignore_in_repository(tmp_path):
+    (tmp_path / ".git").mkdir()
+    _write(tmp_path / ".gitignore", "docs/_build/\n")
+    (tmp_path / "docs" / "_build").mkdir(parents=True)
+
+    gitignore = GitIgnore.from_directories([tmp_path / "docs"])
+    assert gitignore.files == [tmp_path / ".gitignore"]
+    assert gitignore.match(str(tmp_path / "docs" / "_build" / "index.html"))
+
+
+def test_pruned_directories_are_not_watched(tmp_path):
+    _write(tmp_path / ".gitignore", "node_modules/\n")
+    _write(tmp_path / "index.rst")
+    _write(tmp_path / "api" / "module.rst")
+    _write(tmp_path / "node_modules" / "pkg" / "index.js")
+    _write(tmp_path / "_build" / "index.html")
+
+    # Regular expressions never prune directories.
+    ignored = IgnoreFilter([], [r"/_build/"])
+    assert _watched_directories([tmp_path], ignored) == ([tmp_path], True)
+
+    gitignore = GitIgnore.from_directories([tmp_path])
+    ignored = IgnoreFilter([tmp_path / "_build"], [], gitignore=gitignore)
+    directories, recursive = _watched_directories([tmp_path], ignored)
+    assert not recursive
+    assert sorted(directories) == [tmp_path, tmp_path / "api"]
+
+
+def test_new_directory_containing_a_file(tmp_path):
+    _write(tmp_path / "index.rst")
+    (tmp_path / "_build").mkdir()
+    ignored = IgnoreFilter([tmp_path / "_build"], [])
+    new_file = tmp_path / "new" / "a.rst"
+
+    async def main():
+        changes = watch_changes([tmp_path], ignored)
+        first = asyncio.ensure_future(anext(changes))
+        await asyncio.sleep(0.2)
+        # Written before the new directory is watched.
+        _write(new_file)
+        seen = set()
+        try:
+            seen |= await asyncio.wait_for(first, 5)
+            while (Change.added, str(new_file)) not in seen:
+                seen |= await asyncio.wait_for(anext(changes), 5)
+        finally:
+            await changes.aclose()
+        return seen
+
+    assert (Change.added, str(new_file)) in asyncio.run(main())
+
+
+def test_changes_while_watching_a_new_directory(tmp_path):
+    index = tmp_path / "index.rst"
+    _write(index)
+    (tmp_path / "_build").mkdir()
+    ignored = IgnoreFilter([tmp_path / "_build"], [])
+
+    async def main():
+        changes = watch_changes([tmp_path], ignored)
+        first = asyncio.ensure_future(anext(changes))
+        await asyncio.sleep(0.2)
+        (tmp_path / "new").mkdir()
+        seen = set()
+        try:
+            seen |= await asyncio.wait_for(first, 5)
+            # Written while the batch is handled, before the watcher restarts.
+            _write(index, "changed")
+            while (Change.modified, str(index)) not in seen:
+                seen |= await asyncio.wait_for(anext(changes), 5)
+        finally:
+            await changes.aclose()
+        return seen
+
+    assert (Change.modified, str(index)) in asyncio.run(main())
@@ -0,0 +1,85 @@
+import os
+
+from sphinx_autobuild.hashing import ContentIndex
+
+
+def test_unchanged_contents(tmp_path):
+    path = tmp_path / "index.rst"
+    path.write_text("Hello\n", encoding="utf-8")
+    index = ContentIndex()
+
+    # Unknown files count as changed.
+    assert index.update(path)
+    assert not index.update(path)
+
+    # Rewriting identical bytes is not a change.
+    path.write_text("Hello\n", encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert not index.update(path)
+
+    path.write_text("Goodbye\n", encoding="utf-8")
+    assert index.update(path)
+
+    path.unlink()
+    assert index.update(path)
+    assert str(path) not in index.entries
+
+
+def test_directories_are_unchanged(tmp_path):
+    index = ContentIndex()
+    assert not index.update(tmp_path)
+    assert index.update(tmp_path / "missing")
+
+
+def test_scan(tmp_path):
+    (tmp_path / "one.rst").write_text("one", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "two.rst").write_text("two", encoding="utf-8")
+    (tmp_path / "_build").mkdir()
+    (tmp_path / "_build" / "index.html").write_text("", encoding="utf-8")
+
+    index = ContentIndex()
+    index.entries[str(tmp_path / "gone.rst")] = (0, 0, "")
+    index.scan([tmp_path], ignore=lambda path: path.endswith("_build"))
+    assert sorted(index.entries) == [
+        str(tmp_path / "one.rst"),
+        str(tmp_path / "sub" / "two.rst"),
+    ]
+    assert index.filter_changed([tmp_path / "one.rst", tmp_path / "new.rst"]) == [
+        tmp_path / "new.rst"
+    ]
+
+
+def test_cache_file(tmp_path):
+    path = tmp_path / "index.rst"
+    path.write_text("Hello\n", encoding="utf-8")
+    cache_file = tmp_path / "cache" / "hashes.json"
+
+    index = ContentIndex(cache_file)
+    index.update(path)
+    index.save()
+
+    path.write_text("Hello\n", encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert not ContentIndex(cache_file).update(path)
+
+    cache_file.write_text("not json", encoding="utf-8")
+    assert len(ContentIndex(cache_file)) == 0
+
+
+def test_update_during_scan(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "index.rst").write_text("index", encoding="utf-8")
+    new = tmp_path / "new.rst"
+    new.write_text("new", encoding="utf-8")
+    index = ContentIndex()
+
+    def ignore(_path):
+        # Another thread records a change while the scan runs.
+        index.filter_changed([new])
+        return False
+
+    assert index.scan([tmp_path / "docs"], ignore) == [
+        str(tmp_path / "docs" / "index.rst")
+    ]
+    assert str(new) in index.entries
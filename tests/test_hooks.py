@@ -0,0 +1,78 @@
+import sys
+import time
+from pathlib import Path
+
+from sphinx_autobuild.hooks import Hook, run_hooks
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_hook_globs(tmp_path):
+    hook = Hook.from_argument("echo hello", f"*.css, {tmp_path.as_posix()}/*.svg")
+    assert hook.command == ["echo", "hello"]
+    assert hook.globs == ("*.css", f"{tmp_path.as_posix()}/*.svg")
+
+    # Hooks run for the first build, whatever changed.
+    assert hook.should_run([])
+    hook.has_run = True
+    assert not hook.should_run([])
+    assert not hook.should_run([tmp_path / "index.rst"])
+    assert hook.should_run([tmp_path / "index.rst", tmp_path / "style.css"])
+    assert hook.should_run([tmp_path / "logo.svg"])
+    assert Hook(["echo"]).should_run([])
+
+
+def test_hook_glob_relative_to_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    hook = Hook(["echo"], ["docs/_static/*"])
+    hook.has_run = True
+
+    assert hook.should_run([tmp_path / "docs" / "_static" / "logo.png"])
+    assert not hook.should_run([tmp_path / "src" / "_static" / "logo.png"])
+
+
+def test_run_hooks_skips_unaffected(tmp_path, capsys):
+    marker = tmp_path / "marker"
+    hook = Hook(_python(f"open({str(marker)!r}, 'a').write('x')"), ["*.css"])
+
+    assert run_hooks([hook], [], log_context="pre-build") == 0
+    assert run_hooks([hook], [Path("index.rst")], log_context="pre-build") == 0
+    assert run_hooks([hook], [Path("style.css")], log_context="pre-build") == 0
+
+    assert marker.read_text() == "xx"
+    out = capsys.readouterr().out
+    assert "skipping 1 unaffected command(s)" in out
+    assert out.count("pre-build finished in ") == 2
+
+
+def test_run_hooks_sequential_stops_at_failure(tmp_path):
+    marker = tmp_path / "marker"
+    hooks = [
+        Hook(_python("raise SystemExit(3)")),
+        Hook(_python(f"open({str(marker)!r}, 'w')")),
+    ]
+
+    assert run_hooks(hooks, [], log_context="pre-build") == 3
+    assert not marker.exists()
+
+
+def test_run_hooks_concurrently(capsys):
+    hooks = [
+        Hook(_python(f"import time; time.sleep(0.5); print('hook {n}')"))
+        for n in range(3)
+    ]
+    hooks.append(Hook(_python("raise SystemExit(2)")))
+    name = Path(sys.executable).name
+
+    start = time.perf_counter()
+    returncode = run_hooks(hooks, [], log_context="post-build", jobs=4)
+    elapsed = time.perf_counter() - start
+
+    assert returncode == 2
+    assert elapsed < 1.4
+    out = capsys.readouterr().out
+    for n in range(3):
+        assert f"[{name}] hook {n}\n" in out
+    assert "post-build failed (2) in " in out
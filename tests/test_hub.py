@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+
+from starlette.applications import Starlette
+from starlette.routing import WebSocketRoute
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.hub import ReloadHub
+from sphinx_autobuild.server import RebuildServer
+
+
+def test_every_client_receives_each_message():
+    async def main():
+        hub = ReloadHub()
+        subscriptions = [hub.subscribe() for _ in range(3)]
+        assert hub.publish({"type": "reload"}) == 3
+        assert hub.publish({"type": "reload"}) == 3
+        return [
+            [json.loads(await subscription.get()) for _ in range(2)]
+            for subscription in subscriptions
+        ]
+
+    for messages in asyncio.run(main()):
+        assert messages == [
+            {"type": "reload", "generation": 1},
+            {"type": "reload", "generation": 2},
+        ]
+
+
+def test_slow_clients_are_dropped():
+    async def main():
+        hub = ReloadHub(queue_size=2)
+        slow = hub.subscribe()
+        fast = hub.subscribe()
+        for _ in range(2):
+            hub.publish({"type": "reload"})
+            await fast.get()
+        assert hub.publish({"type": "reload"}) == 1
+        assert hub.subscriptions == {fast}
+        assert hub.clients_dropped == 1
+        return await slow.get()
+
+    assert asyncio.run(main()) is None
+
+
+def test_cancelled_get():
+    async def main():
+        subscription = ReloadHub().subscribe()
+        task = asyncio.create_task(subscription.get())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.sleep(0)
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(main()) == set()
+
+
+def test_websocket_clients(tmp_path):
+    server = RebuildServer(
+        [tmp_path], IgnoreFilter([], []), change_callback=lambda **_: None
+    )
+    app = Starlette(
+        routes=[WebSocketRoute("/websocket-reload", server)],
+        lifespan=server.lifespan,
+    )
+    with (
+        TestClient(app) as client,
+        client.websocket_connect("/websocket-reload") as first,
+        client.websocket_connect("/websocket-reload") as second,
+    ):
+        while len(server.hub.subscriptions) < 2:
+            time.sleep(0.01)
+        client.portal.call(server.notify)
+        assert first.receive_json()["generation"] == 1
+        assert second.receive_json()["generation"] == 1
@@ -89,3 +89,32 @@ def test_debug(val, capfd):
         assert "SPHINX_AUTOBUILD_DEBUG" in captured.out
     else:
         assert "SPHINX_AUTOBUILD_DEBUG" not in captured.out
+
+
+def test_prefix_is_not_partial_match(tmp_path):
+    ignored = IgnoreFilter([tmp_path / "build"], [])
+
+    assert ignored(str(tmp_path / "build"))
+    assert ignored(str(tmp_path / "build" / "index.html"))
+    assert not ignored(str(tmp_path / "building.rst"))
+    assert not ignored(str(tmp_path / "buildx" / "index.html"))
+
+
+def test_regex_with_backreference():
+    ignored = IgnoreFilter([], [r"(\w+)\.\1$", r"(?i)\.BAK$"])
+
+    assert ignored.unmerged_patterns == ignored.regex_based_patterns
+    assert ignored("foo.foo")
+    assert not ignored("foo.bar")
+    assert ignored("notes.bak")
+
+
+def test_verdicts_are_cached():
+    ignored = IgnoreFilter(["*.pyc"], [])
+
+    for _ in range(3):
+        assert ignored("module.pyc")
+        assert not ignored("module.py")
+    info = ignored._is_ignored.cache_info()
+    assert info.misses == 2
+    assert info.hits == 4
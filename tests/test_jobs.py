@@ -0,0 +1,50 @@
+import os
+
+from sphinx_autobuild.jobs import choose_jobs, count_outdated, jobs_pinned
+
+
+def test_choose_jobs():
+    assert choose_jobs(0, 8) == 1
+    assert choose_jobs(10, 8) == 1
+    assert choose_jobs(120, 8) == 2
+    assert choose_jobs(10_000, 8) == 8
+    assert choose_jobs(10_000, 1) == 1
+
+
+def test_jobs_pinned():
+    assert jobs_pinned(["docs", "build", "-j", "4"])
+    assert jobs_pinned(["docs", "build", "-jauto"])
+    assert jobs_pinned(["docs", "build", "--jobs=2"])
+    assert not jobs_pinned(["docs", "build", "-W"])
+
+
+def test_count_outdated(tmp_path):
+    src_dir = tmp_path / "docs"
+    (src_dir / "_build").mkdir(parents=True)
+    (src_dir / "_build" / "copy.rst").touch()
+    (src_dir / "out").mkdir()
+    (src_dir / "out" / "copy.rst").touch()
+    for name in "index.rst", "guide.md", "conf.py", "logo.png":
+        (src_dir / name).touch()
+    environment = tmp_path / "environment.pickle"
+
+    def outdated(changed_paths):
+        return count_outdated(
+            changed_paths,
+            src_dir=src_dir,
+            source_suffixes={".rst", ".md"},
+            environment=environment,
+            skip=[src_dir / "out"],
+        )
+
+    # No environment, so every document is read.
+    assert outdated([]) == 2
+    # Only the changed documents.
+    assert outdated([src_dir / "index.rst", src_dir / "logo.png"]) == 1
+    # The configuration may affect every document.
+    assert outdated([src_dir / "conf.py"]) == 2
+
+    environment.touch()
+    os.utime(environment, ns=(0, 0))
+    os.utime(src_dir / "guide.md", ns=(0, 0))
+    assert outdated([]) == 1
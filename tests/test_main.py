@@ -0,0 +1,127 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from sphinx_autobuild import __version__
+from sphinx_autobuild.__main__ import _check_args, _parse_args
+
+ROOT = Path(__file__).parent.parent
+
+#: Modules that must not be imported before the arguments are parsed.
+DEFERRED_MODULES = ("sphinx", "starlette", "uvicorn", "watchfiles", "colorama")
+
+
+def _imported_modules(*args):
+    """Return the modules imported by running Python with *args*."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        check=False,
+        cwd=ROOT,
+        text=True,
+    )
+    return {
+        line.rpartition("|")[2].strip()
+        for line in process.stderr.splitlines()
+        if line.startswith("import time:")
+    }, process
+
+
+def test_parse_args_single_pass(tmp_path):
+    args, build_args = _parse_args([
+        str(ROOT / "docs"),
+        str(tmp_path),
+        "--port",
+        "0",
+        "--watch=src",
+        "-b",
+        "html",
+        "--fast-path",
+        "--debou",
+        "1.5",
+        "-W",
+    ])
+
+    assert args.port == 0
+    assert args.additional_watched_dirs == ["src"]
+    assert args.fast_path
+    assert args.debounce == 1.5
+    assert args.sourcedir == ROOT / "docs"
+    assert args.outdir == tmp_path
+    assert build_args == [str(ROOT / "docs"), str(tmp_path), "-b", "html", "-W"]
+
+
+def test_parse_args_hooks(tmp_path):
+    args, build_args = _parse_args([
+        str(ROOT / "docs"),
+        str(tmp_path),
+        "--pre-build-on",
+        "*.css,*.scss",
+        "make css",
+        "--post-build-on",
+        "*.svg",
+        "optimise-images",
+        "--hook-jobs",
+        "2",
+        "-W",
+    ])
+
+    assert args.pre_build_on == [["*.css,*.scss", "make css"]]
+    assert args.post_build_on == [["*.svg", "optimise-images"]]
+    assert args.hook_jobs == 2
+    assert build_args == [str(ROOT / "docs"), str(tmp_path), "-W"]
+
+
+@pytest.mark.parametrize(
+    "option", ["--warm-worker", "--cancel-superseded", "--atomic-output"]
+)
+def test_process_executor_rejects_stateful_options(tmp_path, option):
+    args, _ = _parse_args([str(ROOT / "docs"), str(tmp_path), "--executor=process"])
+    _check_args(args)
+
+    args, _ = _parse_args([
+        str(ROOT / "docs"),
+        str(tmp_path),
+        "--executor=process",
+        option,
+    ])
+    with pytest.raises(SystemExit, match=f"{option} cannot be used"):
+        _check_args(args)
+
+
+def test_build_prefix_rejects_warm_worker(tmp_path):
+    args, _ = _parse_args([
+        str(ROOT / "docs"),
+        str(tmp_path),
+        "--warm-worker",
+        "--build-prefix=nice",
+    ])
+    with pytest.raises(SystemExit, match="--build-prefix cannot be used"):
+        _check_args(args)
+
+
+def test_import_is_lazy():
+    modules, _ = _imported_modules("-c", "import sphinx_autobuild.__main__")
+
+    assert "sphinx_autobuild.__main__" in modules
+    for module in DEFERRED_MODULES:
+        assert module not in modules
+
+
+def test_version_is_fast():
+    modules, process = _imported_modules("-m", "sphinx_autobuild", "--version")
+
+    assert process.returncode == 0
+    assert process.stdout == f"sphinx-autobuild {__version__}\n"
+    assert "sphinx" not in modules
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["--no-such-option"]])
+def test_help_and_errors_skip_the_server(argv):
+    modules, _ = _imported_modules("-m", "sphinx_autobuild", *argv)
+
+    assert "sphinx.cmd.build" in modules
+    for module in ("starlette", "uvicorn", "watchfiles"):
+        assert module not in modules
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.__main__ import METRICS_PATH, _create_app
+from sphinx_autobuild.build import BuildResult
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.metrics import BuildMetrics, BuildRecord
+from sphinx_autobuild.server import RebuildServer
+
+
+def test_prometheus_and_log_file(tmp_path):
+    log_file = tmp_path / "builds.jsonl"
+    metrics = BuildMetrics(log_file)
+
+    record = BuildRecord([Path("/docs/index.rst")], queue_wait=0.5)
+    record.set_result(
+        BuildResult(returncode=0, timings={"pre_build": 0.25, "sphinx_build": 2.0})
+    )
+    record.finish(clients_notified=2)
+    metrics.add(record)
+    record = BuildRecord([], queue_wait=0.0)
+    record.finish(status="cancelled")
+    metrics.add(record)
+
+    text = metrics.prometheus()
+    assert 'sphinx_autobuild_builds_total{status="success"} 1\n' in text
+    assert 'sphinx_autobuild_builds_total{status="cancelled"} 1\n' in text
+    assert 'sphinx_autobuild_build_duration_seconds_bucket{le="0.1"} 2\n' in text
+    assert 'sphinx_autobuild_build_duration_seconds_bucket{le="+Inf"} 2\n' in text
+    assert 'sphinx_autobuild_build_phase_seconds_sum{phase="queue_wait"} 0.5\n' in text
+    assert (
+        'sphinx_autobuild_build_phase_seconds_count{phase="sphinx_build"} 1\n' in text
+    )
+    assert 'sphinx_autobuild_build_phase_seconds_count{phase="post_build"} 0\n' in text
+    assert "sphinx_autobuild_clients_notified_total 2\n" in text
+
+    first, second = map(json.loads, log_file.read_text().splitlines())
+    assert first["trigger"] == [str(Path("/docs/index.rst"))]
+    assert first["status"] == "success"
+    assert first["returncode"] == 0
+    assert first["sphinx_build"] == 2.0
+    assert first["post_build"] is None
+    assert first["clients_notified"] == 2
+    assert second["status"] == "cancelled"
+
+
+class _Metrics(BuildMetrics):
+    def __init__(self):
+        super().__init__()
+        self.added = threading.Event()
+
+    def add(self, record):
+        super().add(record)
+        self.added.set()
+
+
+def test_server_records_builds(tmp_path):
+    metrics = _Metrics()
+
+    def builder(**_kwargs):
+        time.sleep(0.1)
+        return BuildResult(returncode=1, timings={"sphinx_build": 0.1})
+
+    async def build():
+        server = RebuildServer(
+            [tmp_path], IgnoreFilter([], []), builder, metrics=metrics
+        )
+        async with server.lifespan(None):
+            server.hub.subscribe()
+            server.scheduler.submit([tmp_path / "index.rst"])
+            await asyncio.to_thread(metrics.added.wait, 10)
+
+    asyncio.run(build())
+
+    [record] = metrics.recent
+    assert record.status == "failure"
+    assert record.returncode == 1
+    assert record.trigger == [str(tmp_path / "index.rst")]
+    assert record.clients_notified == 1
+    assert record.duration >= 0.1
+    assert record.phases["queue_wait"] >= 0
+
+
+def test_metrics_route(tmp_path):
+    app = _create_app(
+        [tmp_path],
+        IgnoreFilter([], []),
+        lambda **_kwargs: None,
+        tmp_path,
+        "127.0.0.1:7777",
+        metrics=BuildMetrics(),
+        metrics_route=True,
+    )
+    client = TestClient(app)
+
+    response = client.get(METRICS_PATH)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "sphinx_autobuild_clients_notified_total 0" in response.text
@@ -0,0 +1,79 @@
+import gzip
+
+import pytest
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.middleware import JavascriptInjectorMiddleware
+
+SCRIPT = JavascriptInjectorMiddleware(None, "127.0.0.1:7777").script
+
+
+def _app(
+    chunks, *, content_type=b"text/html; charset=utf-8", encoding=None, length=True
+):
+    async def app(_scope, _receive, send):
+        headers = [(b"content-type", content_type)]
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding))
+        if length:
+            headers.append((b"content-length", str(sum(map(len, chunks))).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            more_body = i != len(chunks) - 1
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body,
+            })
+
+    return JavascriptInjectorMiddleware(app, "127.0.0.1:7777")
+
+
+@pytest.mark.parametrize("length", [True, False])
+@pytest.mark.parametrize("split", range(len("<p>text</p></body></html>") + 1))
+def test_inserted_before_body_end(split, length):
+    page = b"<p>text</p></BODY></html>"
+    client = TestClient(_app([page[:split], page[split:]], length=length))
+
+    response = client.get("/")
+    assert response.content == b"<p>text</p>" + SCRIPT + b"</BODY></html>"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert "Content-Length" not in response.headers
+
+
+@pytest.mark.parametrize("length", [True, False])
+def test_large_page(length):
+    page = b"<body>" + b"<p>text</p>" * 10_000 + b"</body></html>"
+    chunks = [page[i : i + 32_768] for i in range(0, len(page), 32_768)]
+    client = TestClient(_app(chunks, length=length))
+
+    content = client.get("/").content
+    assert content == page.replace(b"</body>", SCRIPT + b"</body>")
+
+
+def test_appended_without_body_end():
+    client = TestClient(_app([b"<p>text</p><", b"/bod"]))
+
+    assert client.get("/").content == b"<p>text</p></bod" + SCRIPT
+
+
+def test_compressed_response():
+    page = gzip.compress(b"<body><p>text</p></body>")
+    client = TestClient(_app([page[:10], page[10:]], encoding=b"gzip"))
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.content == b"<body><p>text</p>" + SCRIPT + b"</body>"
+
+
+def test_other_responses_unmodified():
+    css = b"body { color: red; }"
+    client = TestClient(_app([css], content_type=b"text/css"))
+    response = client.get("/")
+    assert response.content == css
+    assert response.headers["Content-Length"] == str(len(css))
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    client = TestClient(_app([b"<body></body>"], encoding=b"compress"))
+    assert client.get("/").content == b"<body></body>"
+    assert client.head("/").content == b""
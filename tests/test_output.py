@@ -0,0 +1,89 @@
+import json
+import os
+
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.cache import CachedResponse, ResponseCache
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.output import OutputTracker
+from sphinx_autobuild.server import RebuildServer, _message_type
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_changed_urls(tmp_path):
+    _write(tmp_path / "index.html", "index")
+    _write(tmp_path / "api" / "module.html", "module")
+    _write(tmp_path / "_static" / "theme.css", "body {}")
+    _write(tmp_path / ".doctrees" / "index.doctree", "doctree")
+
+    tracker = OutputTracker(tmp_path)
+    tracker.prime()
+    assert tracker.changed_urls() == []
+    tracker.fill_digests()
+
+    _write(tmp_path / "index.html", "index")  # rewritten, but identical
+    _write(tmp_path / "api" / "module.html", "changed")
+    _write(tmp_path / "new.html", "new")
+    (tmp_path / "_static" / "theme.css").unlink()
+    _write(tmp_path / ".doctrees" / "index.doctree", "changed")
+    assert tracker.changed_urls() == [
+        "/_static/theme.css",
+        "/api/module.html",
+        "/new.html",
+    ]
+    assert tracker.changed_urls() == []
+
+
+def test_changed_before_hashing(tmp_path):
+    _write(tmp_path / "index.html", "index")
+    tracker = OutputTracker(tmp_path)
+    tracker.prime()
+
+    # Rewritten by a build before the existing output was hashed.
+    os.utime(tmp_path / "index.html", ns=(0, 0))
+    tracker.fill_digests()
+    assert tracker.changed_urls() == ["/index.html"]
+    assert tracker.changed_urls() == []
+
+
+def test_notify_lists_changed_urls(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    _write(src_dir / "index.rst", "")
+    _write(out_dir / "index.html", "old")
+
+    def build(**_):
+        _write(out_dir / "index.html", "new")
+
+    cache = ResponseCache()
+    cache.put(("/", ""), CachedResponse(status=200, headers=[], body=b"old"), version=0)
+    server = RebuildServer(
+        [src_dir],
+        IgnoreFilter([], []),
+        change_callback=build,
+        out_dir=out_dir,
+        response_cache=cache,
+    )
+    app = Starlette(lifespan=server.lifespan)
+    with TestClient(app) as client:
+        subscription = server.hub.subscribe()
+        client.portal.call(server.rebuild, [src_dir / "index.rst"])
+        client.portal.call(server.notify)
+        message = client.portal.call(subscription.get)
+    assert json.loads(message) == {
+        "type": "page",
+        "changed": ["/index.html"],
+        "generation": 1,
+    }
+    assert cache.entries == {}
+
+
+def test_message_type():
+    assert _message_type(["/_static/style.css"]) == "css"
+    assert _message_type(["/_static/style.css", "/_images/logo.png"]) == "asset"
+    assert _message_type(["/_static/style.css", "/index.html"]) == "page"
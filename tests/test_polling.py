@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+from watchfiles import Change
+
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.polling import Polling, TreeScanner
+
+
+def test_scan(tmp_path):
+    (tmp_path / "index.rst").write_text("Index", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "ignored").mkdir()
+    (tmp_path / "ignored" / "file.txt").write_text("", encoding="utf-8")
+    scanner = TreeScanner([tmp_path], IgnoreFilter([tmp_path / "ignored"], []))
+
+    assert scanner.scan() == {(Change.added, str(tmp_path / "index.rst"))}
+    assert scanner.scan() == set()
+
+    (tmp_path / "index.rst").write_text("Changed", encoding="utf-8")
+    (tmp_path / "sub" / "page.rst").write_text("Page", encoding="utf-8")
+    (tmp_path / "ignored" / "other.txt").write_text("", encoding="utf-8")
+    assert scanner.scan() == {
+        (Change.modified, str(tmp_path / "index.rst")),
+        (Change.added, str(tmp_path / "sub" / "page.rst")),
+    }
+
+    (tmp_path / "sub" / "page.rst").unlink()
+    assert scanner.scan() == {(Change.deleted, str(tmp_path / "sub" / "page.rst"))}
+
+
+def test_unchanged_directories_are_not_listed(tmp_path):
+    sub_dir = tmp_path / "sub"
+    sub_dir.mkdir()
+    page = sub_dir / "page.rst"
+    page.write_text("Page", encoding="utf-8")
+    os.utime(sub_dir, ns=(0, 0))
+    scanner = TreeScanner([tmp_path], IgnoreFilter([], []))
+    scanner.scan()
+
+    # A file added without changing the directory's modification time
+    # is not seen, showing that the earlier listing was reused.
+    (sub_dir / "new.rst").write_text("New", encoding="utf-8")
+    os.utime(sub_dir, ns=(0, 0))
+    page.write_text("Changed", encoding="utf-8")
+    assert scanner.scan() == {(Change.modified, str(page))}
+
+    os.utime(sub_dir)
+    assert scanner.scan() == {(Change.added, str(sub_dir / "new.rst"))}
+
+
+def test_watch(tmp_path):
+    path = tmp_path / "index.rst"
+    path.write_text("Index", encoding="utf-8")
+    polling = Polling(0.01, 0.05)
+
+    async def main():
+        changes = polling.watch([tmp_path], IgnoreFilter([], []))
+        task = asyncio.create_task(anext(changes))
+        await asyncio.sleep(0.2)
+        path.write_text("Changed", encoding="utf-8")
+        try:
+            return await asyncio.wait_for(task, 5)
+        finally:
+            await changes.aclose()
+
+    assert asyncio.run(main()) == {(Change.modified, str(path))}
@@ -0,0 +1,86 @@
+import gzip
+import os
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.middleware import JavascriptInjectorMiddleware
+from sphinx_autobuild.precompress import (
+    CODECS,
+    PrecompressedStaticFiles,
+    Precompressor,
+    is_precompressed,
+)
+
+PAGE = "<html><body>" + "<p>text</p>" * 200 + "</body></html>"
+SCRIPT = "const index = [" + '"term", ' * 200 + "];"
+
+
+def _app(directory):
+    return Starlette(
+        routes=[Mount("/", app=PrecompressedStaticFiles(directory=directory))],
+        middleware=[Middleware(JavascriptInjectorMiddleware, ws_url="127.0.0.1:7777")],
+    )
+
+
+def test_compress(tmp_path):
+    script = tmp_path / "searchindex.js"
+    script.write_text(SCRIPT, encoding="utf-8")
+    small = tmp_path / "small.css"
+    small.write_text("body {}", encoding="utf-8")
+    image = tmp_path / "logo.png"
+    image.write_bytes(b"\x89PNG" * 1000)
+    page = tmp_path / "index.html"
+    page.write_text(PAGE, encoding="utf-8")
+    precompressor = Precompressor(codecs=[CODECS["gzip"]])
+
+    futures = precompressor.submit([script, small, image, page])
+    [future.result() for future in futures]
+    precompressor.shutdown()
+
+    sibling = tmp_path / "searchindex.js.gz"
+    assert gzip.decompress(sibling.read_bytes()).decode() == SCRIPT
+    assert sibling.stat().st_mtime_ns == script.stat().st_mtime_ns
+    assert not (tmp_path / "small.css.gz").exists()
+    assert not (tmp_path / "logo.png.gz").exists()
+    # The reload script is inserted into pages, so they are served plain.
+    assert not (tmp_path / "index.html.gz").exists()
+    assert precompressor.files_compressed == 1
+
+    script.unlink()
+    precompressor.compress(script)
+    assert not sibling.exists()
+
+
+def test_serve_precompressed(tmp_path):
+    script = tmp_path / "searchindex.js"
+    script.write_text(SCRIPT, encoding="utf-8")
+    Precompressor(codecs=[CODECS["gzip"]]).compress(script)
+    client = TestClient(_app(tmp_path))
+
+    response = client.get("/searchindex.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Content-Type"].startswith("text/javascript")
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.text == SCRIPT
+
+    response = client.get("/searchindex.js", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == SCRIPT
+
+    # A sibling from an earlier build is not served.
+    script.write_text("const index = [];", encoding="utf-8")
+    os.utime(script, ns=(0, 0))
+    response = client.get("/searchindex.js", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "const index = [];"
+
+
+def test_is_precompressed():
+    assert is_precompressed("searchindex.js.gz")
+    assert is_precompressed("_static/style.css.gz.tmp")
+    assert not is_precompressed("_downloads/archive.tar.gz")
+    assert not is_precompressed("index.html")
+    assert not is_precompressed("index.html.gz")
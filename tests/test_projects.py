@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import watchfiles
+from starlette.testclient import TestClient
+
+from sphinx_autobuild.__main__ import _create_projects_app, _parse_args
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.projects import (
+    ProjectConfigError,
+    ProjectGroup,
+    load_projects,
+)
+from sphinx_autobuild.server import RebuildServer
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_load_projects(tmp_path):
+    config = _write(
+        tmp_path / "projects.toml",
+        """
+[[project]]
+name = "guide"
+args = ["docs/guide", "build/guide"]
+
+[[project]]
+name = "api"
+prefix = "/reference/api/"
+args = ["docs/api", "build/api", "-W"]
+""",
+    )
+
+    guide, api = load_projects(config)
+
+    assert (guide.name, guide.prefix, guide.args) == (
+        "guide",
+        "/guide",
+        ["docs/guide", "build/guide"],
+    )
+    assert (api.prefix, api.args) == ("/reference/api", ["docs/api", "build/api", "-W"])
+
+
+@pytest.mark.parametrize(
+    ("projects", "error"),
+    [
+        ("", "at least one"),
+        ('[[project]]\nargs = ["a", "b"]', "has no name"),
+        ('[[project]]\nname = "a"', "needs args"),
+        ('[[project]]\nname = "a"\nprefix = "/"\nargs = []', "at '/'"),
+        (
+            '[[project]]\nname = "a"\nargs = []\n'
+            '[[project]]\nname = "b"\nprefix = "/a/b"\nargs = []',
+            "overlaps",
+        ),
+    ],
+)
+def test_load_projects_errors(tmp_path, projects, error):
+    config = _write(tmp_path / "projects.toml", projects)
+
+    with pytest.raises(ProjectConfigError, match=error):
+        load_projects(config)
+
+
+def test_serve_projects(tmp_path):
+    config_lines = []
+    for name in "guide", "api":
+        (tmp_path / name / "src").mkdir(parents=True)
+        (tmp_path / name / "out").mkdir()
+        _write(tmp_path / name / "out" / "index.html", f"<body>{name}</body>")
+        config_lines.append(
+            f'[[project]]\nname = "{name}"\n'
+            f'args = ["{tmp_path / name / "src"}", "{tmp_path / name / "out"}"]\n'
+        )
+    config = _write(tmp_path / "projects.toml", "\n".join(config_lines))
+    parsed = [
+        (project, *_parse_args(project.args)) for project in load_projects(config)
+    ]
+
+    builders, app = _create_projects_app(parsed, "127.0.0.1:7777")
+    client = TestClient(app)
+
+    assert len(builders) == 2
+    response = client.get("/")
+    assert '<a href="/guide/">guide</a>' in response.text
+    assert '<a href="/api/">api</a>' in response.text
+    response = client.get("/api/index.html")
+    assert response.text.startswith("<body>api")
+    assert "ws://127.0.0.1:7777/api/websocket-reload" in response.text
+    # The initial build has not run, so missing pages show the placeholder.
+    response = client.get("/guide/missing.html")
+    assert "Building the documentation" in response.text
+    assert "/guide/websocket-reload" in response.text
+    with client.websocket_connect("/guide/websocket-reload"):
+        pass
+
+
+def test_dispatch_changes(tmp_path):
+    guide = tmp_path / "guide"
+    api = tmp_path / "api"
+    guide.mkdir()
+    api.mkdir()
+
+    async def main():
+        servers = [
+            RebuildServer([guide], IgnoreFilter([], [r"\.tmp$"]), None),
+            RebuildServer([api], IgnoreFilter([], []), None),
+        ]
+        group = ProjectGroup(servers, [])
+        await group.dispatch({
+            (watchfiles.Change.modified, str(guide / "index.rst")),
+            (watchfiles.Change.modified, str(guide / "index.tmp")),
+            (watchfiles.Change.added, str(api / "module.rst")),
+        })
+        assert group.ignore(str(guide / "index.tmp"))
+        assert group.ignore(str(tmp_path / "elsewhere.rst"))
+        assert not group.ignore(str(api / "index.tmp"))
+        return [list(server.scheduler.pending) for server in servers]
+
+    assert asyncio.run(main()) == [[guide / "index.rst"], [api / "module.rst"]]
+
+
+def test_build_limit(tmp_path):
+    lock = threading.Lock()
+    running = 0
+    most = 0
+
+    def builder(**_kwargs):
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+        time.sleep(0.1)
+        with lock:
+            running -= 1
+
+    async def main():
+        limit = asyncio.Semaphore(1)
+        servers = [
+            RebuildServer(
+                [tmp_path],
+                IgnoreFilter([], []),
+                builder,
+                shared_watcher=True,
+                build_limit=limit,
+            )
+            for _ in range(3)
+        ]
+        async with ProjectGroup(servers, []).lifespan(None):
+            await asyncio.gather(*(server.rebuild([]) for server in servers))
+
+    asyncio.run(main())
+    assert most == 1
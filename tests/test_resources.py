@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import pytest
+
+from sphinx_autobuild.resources import MIB, BuildLimits, MemoryReporter, rss
+
+linux_only = pytest.mark.skipif(sys.platform != "linux", reason="uses /proc")
+
+
+@linux_only
+def test_rss():
+    assert rss() > MIB
+    assert rss(2**22 + 1) is None
+
+
+@linux_only
+def test_report():
+    assert MemoryReporter(1).report().startswith("Memory use: server ")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses setrlimit")
+def test_build_limits(tmp_path):
+    (tmp_path / "allocate.py").write_text(
+        "import sys\nbytearray(1024 * 1024 * 1024)\nsys.exit(int(sys.argv[1]))\n",
+        encoding="utf-8",
+    )
+
+    def run(limits):
+        args = limits.wrap(["-m", "allocate", "3"])
+        return subprocess.run([sys.executable, *args], cwd=tmp_path, check=False)
+
+    assert run(BuildLimits()).returncode == 3
+    assert run(BuildLimits(memory=512 * MIB)).returncode not in {0, 3}
@@ -0,0 +1,145 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from sphinx_autobuild.build import BuildCancelledError, Builder, BuildResult
+from sphinx_autobuild.scheduler import BuildScheduler
+
+
+class FakeBuild:
+    def __init__(self):
+        self.calls = []
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.cancelled = asyncio.Event()
+        self.completed = 0
+
+    async def __call__(self, changed_paths):
+        self.calls.append(changed_paths)
+        self.started.set()
+        release = asyncio.create_task(self.release.wait())
+        cancelled = asyncio.create_task(self.cancelled.wait())
+        await asyncio.wait({release, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+        release.cancel()
+        cancelled.cancel()
+        if self.cancelled.is_set():
+            self.cancelled.clear()
+            raise BuildCancelledError
+
+    def cancel(self):
+        self.cancelled.set()
+
+    async def on_complete(self):
+        self.completed += 1
+
+
+async def _run_until_idle(scheduler, build, *, builds):
+    while len(build.calls) < builds or scheduler.building or scheduler.pending:
+        build.release.set()
+        await asyncio.sleep(0.01)
+
+
+def test_merges_changes_during_build():
+    async def main():
+        build = FakeBuild()
+        scheduler = BuildScheduler(build, on_complete=build.on_complete)
+        task = asyncio.create_task(scheduler.run())
+
+        scheduler.submit([Path("a.rst")])
+        await build.started.wait()
+        scheduler.submit([Path("b.rst")])
+        scheduler.submit([Path("c.rst"), Path("b.rst")])
+        await _run_until_idle(scheduler, build, builds=2)
+        task.cancel()
+        return build, scheduler
+
+    build, scheduler = asyncio.run(main())
+    assert build.calls == [[Path("a.rst")], [Path("b.rst"), Path("c.rst")]]
+    assert build.completed == 2
+    assert scheduler.batches_merged == 1
+    assert scheduler.builds_cancelled == 0
+
+
+def test_cancels_superseded_build():
+    async def main():
+        build = FakeBuild()
+        scheduler = BuildScheduler(
+            build, on_complete=build.on_complete, cancel=build.cancel
+        )
+        task = asyncio.create_task(scheduler.run())
+
+        scheduler.submit([Path("a.rst")])
+        await build.started.wait()
+        scheduler.submit([Path("b.rst")])
+        await _run_until_idle(scheduler, build, builds=2)
+        task.cancel()
+        return build, scheduler
+
+    build, scheduler = asyncio.run(main())
+    assert build.calls == [[Path("a.rst")], [Path("a.rst"), Path("b.rst")]]
+    assert build.completed == 1
+    assert scheduler.builds_cancelled == 1
+
+
+def test_debounce():
+    async def main():
+        build = FakeBuild()
+        build.release.set()
+        scheduler = BuildScheduler(build, on_complete=build.on_complete, debounce=0.1)
+        task = asyncio.create_task(scheduler.run())
+
+        for name in "abc":
+            scheduler.submit([Path(f"{name}.rst")])
+            await asyncio.sleep(0.03)
+        assert not build.calls
+        await asyncio.sleep(0.2)
+        task.cancel()
+        return build, scheduler
+
+    build, scheduler = asyncio.run(main())
+    assert build.calls == [[Path("a.rst"), Path("b.rst"), Path("c.rst")]]
+    assert scheduler.batches_merged == 2
+
+
+def test_builder_cancel():
+    builder = Builder(
+        ["docs", "build"],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[[sys.executable, "-c", "import time; time.sleep(0.5)"]],
+        post_build_commands=[],
+    )
+    threading.Timer(0.1, builder.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(BuildCancelledError):
+        builder(changed_paths=())
+    assert time.monotonic() - start < 5
+
+
+def test_targeted_build_is_followed_by_full_build():
+    calls = []
+
+    async def run_build(changed_paths):
+        calls.append(changed_paths)
+        return BuildResult(returncode=0, targeted=bool(changed_paths))
+
+    async def main():
+        done = asyncio.Event()
+
+        async def on_complete():
+            if len(calls) == 2:
+                done.set()
+
+        scheduler = BuildScheduler(run_build, on_complete=on_complete)
+        task = asyncio.create_task(scheduler.run())
+        scheduler.submit([Path("a.rst")])
+        await asyncio.wait_for(done.wait(), timeout=5)
+        task.cancel()
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert calls == [[Path("a.rst")], []]
+    assert scheduler.builds_completed == 2
@@ -0,0 +1,90 @@
+import asyncio
+
+from sphinx_autobuild.build import BuildResult
+from sphinx_autobuild.filter import IgnoreFilter
+from sphinx_autobuild.server import RebuildServer
+from sphinx_autobuild.snapshot import SourceSnapshot
+
+
+def _snapshot(tmp_path, key=""):
+    return SourceSnapshot(
+        tmp_path / "doctrees" / "snapshot.json",
+        [tmp_path / "docs"],
+        IgnoreFilter([], []).is_ignored,
+        key=key,
+    )
+
+
+def test_changes(tmp_path):
+    src_dir = tmp_path / "docs"
+    src_dir.mkdir()
+    (src_dir / "index.rst").write_text("Index\n", encoding="utf-8")
+    (src_dir / "gone.rst").write_text("Gone\n", encoding="utf-8")
+
+    snapshot = _snapshot(tmp_path)
+    assert snapshot.changes() is None
+    snapshot.commit(snapshot.capture(()))
+
+    assert _snapshot(tmp_path).changes() == []
+    assert _snapshot(tmp_path, key="other options").changes() is None
+
+    (src_dir / "index.rst").write_text("Changed\n", encoding="utf-8")
+    (src_dir / "gone.rst").unlink()
+    (src_dir / "new.rst").write_text("New\n", encoding="utf-8")
+    assert sorted(_snapshot(tmp_path).changes()) == [
+        src_dir / "gone.rst",
+        src_dir / "index.rst",
+        src_dir / "new.rst",
+    ]
+
+    # Committing the state of some paths leaves the others outstanding.
+    snapshot = _snapshot(tmp_path)
+    snapshot.load()
+    snapshot.commit(snapshot.capture([src_dir / "gone.rst", src_dir / "new.rst"]))
+    assert _snapshot(tmp_path).changes() == [src_dir / "index.rst"]
+
+
+def test_resume(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    src_dir.mkdir()
+    out_dir.mkdir()
+    (src_dir / "index.rst").write_text("Index\n", encoding="utf-8")
+    builds = []
+    returncode = 0
+
+    def builder(*, changed_paths):
+        builds.append(changed_paths)
+        (out_dir / "index.html").write_text("", encoding="utf-8")
+        return BuildResult(returncode=returncode)
+
+    async def start_server():
+        server = RebuildServer(
+            [src_dir],
+            IgnoreFilter([out_dir], []),
+            builder,
+            executor="inline",
+            out_dir=out_dir,
+            initial_build=True,
+            snapshot=_snapshot(tmp_path),
+        )
+        async with server.lifespan(None):
+            await asyncio.wait_for(server.ready.wait(), 10)
+
+    asyncio.run(start_server())
+    assert builds == [[]]
+
+    asyncio.run(start_server())
+    assert builds == [[]]
+
+    (src_dir / "index.rst").write_text("Changed\n", encoding="utf-8")
+    returncode = 1
+    asyncio.run(start_server())
+    returncode = 0
+    asyncio.run(start_server())
+    assert builds == [[], [src_dir / "index.rst"], [src_dir / "index.rst"]]
+
+    # Deleting the output requires a full build.
+    (out_dir / "index.html").unlink()
+    asyncio.run(start_server())
+    assert builds[-1] == []
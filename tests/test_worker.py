@@ -0,0 +1,84 @@
+import shutil
+from pathlib import Path
+
+from sphinx_autobuild.build import Builder
+from sphinx_autobuild.worker import SphinxWorker
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_worker_is_reused(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    shutil.copytree(ROOT / "docs", src_dir)
+
+    worker = SphinxWorker()
+    try:
+        assert worker.build([str(src_dir), str(out_dir), "-q"]) == 0
+        pid = worker.pid
+        assert (out_dir / "index.html").is_file()
+
+        (src_dir / "index.rst").write_text("Changed\n=======\n", encoding="utf-8")
+        assert worker.build([str(src_dir), str(out_dir), "-q"]) == 0
+        assert worker.pid == pid
+        assert "Changed" in (out_dir / "index.html").read_text(encoding="utf-8")
+
+        worker.recycle()
+        assert not worker.is_alive
+        assert worker.build([str(src_dir), str(out_dir), "-q"]) == 0
+        assert worker.pid != pid
+    finally:
+        worker.stop()
+
+
+def test_builder_recycles_on_python_changes(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    shutil.copytree(ROOT / "docs", src_dir)
+
+    builder = Builder(
+        [str(src_dir), str(out_dir), "-q"],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        warm_worker=True,
+    )
+    try:
+        builder(changed_paths=())
+        pid = builder.worker.pid
+
+        builder(changed_paths=[src_dir / "index.rst"])
+        assert builder.worker.pid == pid
+
+        builder(changed_paths=[src_dir / "conf.py"])
+        assert builder.worker.pid != pid
+    finally:
+        builder.close()
+
+
+def test_builder_recycles_at_limits(tmp_path):
+    src_dir = tmp_path / "docs"
+    out_dir = tmp_path / "build"
+    shutil.copytree(ROOT / "docs", src_dir)
+
+    builder = Builder(
+        [str(src_dir), str(out_dir), "-q"],
+        url_host="127.0.0.1:7777",
+        pre_build_commands=[],
+        post_build_commands=[],
+        warm_worker=True,
+        max_worker_builds=2,
+    )
+    try:
+        builder(changed_paths=())
+        pid = builder.worker.pid
+        assert pid is not None
+        builder(changed_paths=[src_dir / "index.rst"])
+        assert not builder.worker.is_alive
+
+        builder.worker.max_builds = None
+        builder.worker.max_rss = 1
+        builder(changed_paths=[src_dir / "index.rst"])
+        assert not builder.worker.is_alive
+    finally:
+        builder.close()